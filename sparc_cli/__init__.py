@@ -1,8 +1,24 @@
+from importlib import import_module
+
 from .__version__ import __version__
-from .console.formatting import print_stage_header, print_task_header, print_error
-from .console.output import print_agent_output
-from .text.processing import truncate_output
-from .agent_utils import run_agent_with_retry
+
+# Public names and the modules defining them, imported on first access so that
+# importing the package (and running `sparc --help`) stays fast
+_LAZY_EXPORTS = {
+    'print_stage_header': 'sparc_cli.console.formatting',
+    'print_task_header': 'sparc_cli.console.formatting',
+    'print_error': 'sparc_cli.console.formatting',
+    'print_agent_output': 'sparc_cli.console.output',
+    'truncate_output': 'sparc_cli.text.processing',
+    'run_agent_with_retry': 'sparc_cli.agent_utils',
+}
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     'print_stage_header',
@@ -1,32 +1,29 @@
 import argparse
+import os
 import sys
 import uuid
+from typing import TYPE_CHECKING
+
 from rich.panel import Panel
 from rich.console import Console
-from sparc_cli.console.formatting import print_interrupt
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import create_react_agent
-from sparc_cli.env import validate_environment
-from sparc_cli.tools.memory import _global_memory, get_related_files, get_memory_value
-from sparc_cli.tools.human import ask_human
-from sparc_cli.console.formatting import print_stage_header, print_error
-from sparc_cli.agent_utils import (
-    run_agent_with_retry,
-    run_research_agent,
-    run_planning_agent
-)
-from sparc_cli.prompts import (
-    PLANNING_PROMPT,
-    CHAT_PROMPT,
-    EXPERT_PROMPT_SECTION_PLANNING,
-    HUMAN_PROMPT_SECTION_PLANNING,
+from sparc_cli.config import (
+    DEFAULT_CACHE_MAX_MB,
+    DEFAULT_HTTP_MAX_CONNECTIONS,
+    DEFAULT_MAX_PARALLEL_RESEARCH,
+    DEFAULT_MAX_PARALLEL_TASKS,
+    DEFAULT_MAX_TOOL_CONCURRENCY,
+    DEFAULT_MEMORY_MAX_TOKENS,
+    DEFAULT_MEMORY_TOP_K,
+    DEFAULT_SERVER_PORT,
+    DEFAULT_SERVER_WORKERS,
+    OUTPUT_MODES
 )
-from sparc_cli.llm import initialize_llm
+from sparc_cli.text.compaction import DEFAULT_MAX_PROMPT_TOKENS
 
-from sparc_cli.tool_configs import (
-    get_planning_tools,
-    get_chat_tools
-)
+# Everything else is imported once the arguments are parsed, so that --help and
+# usage errors return without loading langchain, the provider SDKs or the tools
+if TYPE_CHECKING:
+    from sparc_cli.checkpoint import SqliteCheckpointer
 
 def parse_arguments():
     parser = argparse.ArgumentParser(
@@ -36,12 +33,31 @@ def parse_arguments():
 Examples:
     sparc -m "Add error handling to the database module"
     sparc -m "Explain the authentication flow" --research-only
+    sparc --resume 0b7c1f3e-6f1d-4b9a-9a57-3f0c2e1d8a44
+    sparc batch tasks.jsonl --workers 4
         '''
     )
     parser.add_argument(
         '--non-interactive',
         action='store_true',
-        help='Run in non-interactive mode (for server deployments)'
+        help='Serve submitted tasks over HTTP on a pool of worker processes (for server deployments)'
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Interface the --non-interactive server listens on; other than loopback, SPARC_SERVER_TOKEN must be set (default: 127.0.0.1)'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=DEFAULT_SERVER_PORT,
+        help=f'Port the --non-interactive server listens on (default: {DEFAULT_SERVER_PORT})'
+    )
+    parser.add_argument(
+        '--server-workers',
+        type=int,
+        default=DEFAULT_SERVER_WORKERS,
+        help=f'Worker processes of the --non-interactive server, and so tasks run at a time (default: {DEFAULT_SERVER_WORKERS})'
     )
     parser.add_argument(
         '-m', '--message',
@@ -92,6 +108,110 @@ Examples:
         action='store_true',
         help='Enable chat mode with direct human interaction (implies --hil)'
     )
+    parser.add_argument(
+        '--max-prompt-tokens',
+        type=int,
+        default=DEFAULT_MAX_PROMPT_TOKENS,
+        help=f'Token budget for agent prompts; lower-priority memory is compacted to fit (default: {DEFAULT_MAX_PROMPT_TOKENS})'
+    )
+    parser.add_argument(
+        '--max-parallel-tasks',
+        type=int,
+        default=DEFAULT_MAX_PARALLEL_TASKS,
+        help=f'Maximum number of planned tasks implemented concurrently (default: {DEFAULT_MAX_PARALLEL_TASKS}, requires --cowboy-mode)'
+    )
+    parser.add_argument(
+        '--max-parallel-research',
+        type=int,
+        default=DEFAULT_MAX_PARALLEL_RESEARCH,
+        help=f'Maximum number of research agents run concurrently for a batch of research queries (default: {DEFAULT_MAX_PARALLEL_RESEARCH}, requires --cowboy-mode)'
+    )
+    parser.add_argument(
+        '--cache-responses',
+        type=str,
+        nargs='?',
+        const='all',
+        metavar='STAGES',
+        help='Replay identical LLM calls from an on-disk cache, for all stages or a comma-separated list of research, planning, implementation and expert'
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        metavar='SECONDS',
+        help='Expire cached LLM responses after this many seconds (default: never)'
+    )
+    parser.add_argument(
+        '--cache-max-mb',
+        type=float,
+        default=DEFAULT_CACHE_MAX_MB,
+        help=f'Size bound of the LLM response cache; least recently used responses are evicted first (default: {DEFAULT_CACHE_MAX_MB})'
+    )
+    parser.add_argument(
+        '--resume',
+        type=str,
+        metavar='SESSION_ID',
+        help='Resume an interrupted session from its last checkpoint, with its original settings'
+    )
+    parser.add_argument(
+        '--output-mode',
+        choices=OUTPUT_MODES,
+        help='How agent messages are shown: complete Markdown panels, tokens streamed as they arrive with the Markdown rendered once, '
+             'or plain streamed text without Rich rendering for headless runs (default: stream in chat mode, panels otherwise)'
+    )
+    parser.add_argument(
+        '--async-agents',
+        action='store_true',
+        help='Run agents on an asyncio event loop, streaming with astream'
+    )
+    parser.add_argument(
+        '--max-tool-concurrency',
+        type=int,
+        default=DEFAULT_MAX_TOOL_CONCURRENCY,
+        help=f'Maximum number of read-only tool calls from one model turn run concurrently (default: {DEFAULT_MAX_TOOL_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--http-max-connections',
+        type=int,
+        default=DEFAULT_HTTP_MAX_CONNECTIONS,
+        help=f'Maximum number of concurrent connections to LLM providers, shared by all agents (default: {DEFAULT_HTTP_MAX_CONNECTIONS})'
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='PATH',
+        help='Record a span for every agent run, LLM call and tool call to PATH as JSONL'
+    )
+    parser.add_argument(
+        '--chrome-trace',
+        metavar='PATH',
+        help='Write the trace to PATH in Chrome trace format at exit, for chrome://tracing or Perfetto'
+    )
+    parser.add_argument(
+        '--no-tool-cache',
+        action='store_true',
+        help='Always re-run file reads, searches and directory listings instead of reusing unchanged results'
+    )
+    parser.add_argument(
+        '--no-project-memory',
+        action='store_true',
+        help='Neither load nor save the key facts, snippets and related files kept in .sparc/project_memory.db across sessions'
+    )
+    parser.add_argument(
+        '--memory-top-k',
+        type=int,
+        default=DEFAULT_MEMORY_TOP_K,
+        help=f'Number of key facts, snippets and research notes most relevant to the task included in each agent prompt, 0 for all (default: {DEFAULT_MEMORY_TOP_K})'
+    )
+    parser.add_argument(
+        '--memory-max-tokens',
+        type=int,
+        default=DEFAULT_MEMORY_MAX_TOKENS,
+        help=f'Token budget of the relevant key facts, snippets and research notes per prompt section, 0 for none (default: {DEFAULT_MEMORY_MAX_TOKENS})'
+    )
+    parser.add_argument(
+        '--usage-json',
+        metavar='PATH',
+        help='Write the tokens and cost of every LLM call, and their totals per stage, sub-agent and model, to PATH as JSON at exit'
+    )
     
     args = parser.parse_args()
     
@@ -99,6 +219,21 @@ Examples:
     if args.chat:
         args.hil = True
     
+    from sparc_cli.llm_cache import parse_cache_stages
+    try:
+        args.cache_responses = parse_cache_stages(args.cache_responses) if args.cache_responses else ()
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.non_interactive:
+        from sparc_cli.server import is_loopback_host
+        if not is_loopback_host(args.host) and not os.environ.get('SPARC_SERVER_TOKEN'):
+            parser.error(f"--host {args.host} is reachable from other machines; set SPARC_SERVER_TOKEN to require a token")
+
+    # Settings of resumed sessions are restored from the session
+    if args.resume:
+        return args
+
     # Set default model for Anthropic, require model for other providers
     if args.provider == 'anthropic':
         if not args.model:
@@ -115,32 +250,106 @@ Examples:
 # Create console instance
 console = Console()
 
-# Create individual memory objects for each agent
-research_memory = MemorySaver()
-planning_memory = MemorySaver()
-implementation_memory = MemorySaver()
+# Settings restored into the command line arguments of a resumed session
+RESUMED_SETTINGS = (
+    'provider',
+    'model',
+    'expert_provider',
+    'expert_model',
+    'research_only',
+    'cowboy_mode',
+    'hil',
+    'max_prompt_tokens',
+    'max_parallel_tasks',
+    'max_parallel_research',
+    'memory_top_k',
+    'memory_max_tokens'
+)
+
+def restore_session(args, checkpointer: 'SqliteCheckpointer') -> str:
+    """Restore global memory and settings of the session named by --resume.
+
+    Args:
+        args: Parsed command line arguments, updated in place
+        checkpointer: Checkpointer holding the session
+
+    Returns:
+        The stage the session stopped at
+    """
+    from sparc_cli.console.formatting import print_error
+    from sparc_cli.tools.memory import _global_memory
+
+    session = checkpointer.get_session(args.resume)
+    if session is None:
+        print_error(f"No saved session with ID {args.resume}")
+        sys.exit(1)
+
+    if session['memory']:
+        _global_memory.update(session['memory'])
+    # The snapshot may have been taken inside a nested agent run
+    _global_memory['agent_depth'] = 0
+
+    saved_config = _global_memory.get('config', {})
+    for key in RESUMED_SETTINGS:
+        if key in saved_config:
+            setattr(args, key, saved_config[key])
+    args.message = session['base_task']
+    args.chat = False
+    return session['stage']
 
 
 def is_informational_query() -> bool:
     """Determine if the current query is informational based on implementation_requested state."""
+    from sparc_cli.tools.memory import _global_memory
     return _global_memory.get('config', {}).get('research_only', False) or not is_stage_requested('implementation')
 
 def is_stage_requested(stage: str) -> bool:
     """Check if a stage has been requested to proceed."""
+    from sparc_cli.tools.memory import _global_memory
     if stage == 'implementation':
         return _global_memory.get('implementation_requested', False)
     return False
 
 def main():
     """Main entry point for the sparc command line tool."""
-    try:
-        args = parse_arguments()
+    if sys.argv[1:2] == ['batch']:
+        from sparc_cli.batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+
+    args = parse_arguments()
+
+    from langgraph.checkpoint.memory import MemorySaver
+    from sparc_cli.agent_utils import create_agent, run_agent_with_retry, run_research_agent, run_planning_agent
+    from sparc_cli.checkpoint import open_checkpointer, activate_session, session_thread_id
+    from sparc_cli.console.formatting import print_interrupt, print_stage_header
+    from sparc_cli.env import validate_environment
+    from sparc_cli.ledger import get_ledger, print_usage_report
+    from sparc_cli.llm import configure_http_pool, get_llm, warm_connections
+    from sparc_cli.llm_cache import print_cache_report
+    from sparc_cli.project_memory import load_project_memory, save_project_memory
+    from sparc_cli.prompts import CHAT_PROMPT_INSTRUCTIONS, CHAT_PROMPT_CONTEXT
+    from sparc_cli.storage import ensure_sparc_dir
+    from sparc_cli.text.compaction import CompactablePrompt
+    from sparc_cli.tool_configs import get_chat_tools
+    from sparc_cli.tools.human import ask_human
+    from sparc_cli.tools.memory import _global_memory
+    from sparc_cli.tracing import get_tracer, write_chrome_trace
 
+    try:
         # Handle non-interactive mode
         if args.non_interactive:
             from sparc_cli.non_interactive import handle_non_interactive
-            handle_non_interactive()
+            handle_non_interactive(args)
             return
+
+        checkpointer = None
+        stage = 'research'
+        if args.resume:
+            checkpointer = open_checkpointer()
+            stage = restore_session(args, checkpointer)
+            if stage == 'done':
+                console.print(f"Session {args.resume} has already completed.")
+                return
         expert_enabled, expert_missing = validate_environment(args)  # Will exit if main env vars missing
         
         if expert_missing:
@@ -152,8 +361,20 @@ def main():
                 style="yellow"
             ))
         
-        # Create the base model after validation
-        model = initialize_llm(args.provider, args.model)
+        # Create the base model after validation, sharing one connection pool with all sub-agents
+        configure_http_pool(args.http_max_connections)
+        model = get_llm(args.provider, args.model)
+        models = [model]
+        if expert_enabled:
+            models.append(get_llm(args.expert_provider, args.expert_model or 'o1-preview', expert=True))
+        warm_connections(*models)
+
+        # Each run starts a fresh trace
+        trace_path = args.trace
+        if args.chrome_trace and not trace_path:
+            trace_path = os.path.join(ensure_sparc_dir(), 'trace.jsonl')
+        if trace_path:
+            open(trace_path, 'w').close()
 
         # If no message is provided, default to chat mode
         if not args.message:
@@ -167,32 +388,50 @@ def main():
             # Get initial request from user
             initial_request = ask_human.invoke({"question": "What would you like help with?"})
 
-            # Create chat agent with appropriate tools
-            chat_agent = create_react_agent(
-                model,
-                get_chat_tools(expert_enabled=expert_enabled),
-                checkpointer=MemorySaver()
-            )
-            
-            # Run chat agent with CHAT_PROMPT
+            # Run chat agent with the chat prompt
             config = {
                 "configurable": {"thread_id": uuid.uuid4()},
                 "recursion_limit": 100,
                 "chat_mode": True,
                 "cowboy_mode": args.cowboy_mode,
                 "hil": True,  # Always true in chat mode
+                "max_prompt_tokens": args.max_prompt_tokens,
+                "response_cache_stages": list(args.cache_responses),
+                "response_cache_ttl": args.cache_ttl,
+                "response_cache_max_mb": args.cache_max_mb,
+                "async_agents": args.async_agents,
+                "max_tool_concurrency": args.max_tool_concurrency,
+                "tool_cache": not args.no_tool_cache,
+                "output_mode": args.output_mode or 'stream',
+                "trace_path": trace_path,
+                "agent_name": "chat",
                 "initial_request": initial_request
             }
             
             # Store config in global memory
             _global_memory['config'] = config
+            _global_memory['config']['provider'] = args.provider
+            _global_memory['config']['model'] = args.model
             _global_memory['config']['expert_provider'] = args.expert_provider
             _global_memory['config']['expert_model'] = args.expert_model
+
+            # Create chat agent with appropriate tools
+            chat_agent = create_agent(
+                model,
+                get_chat_tools(expert_enabled=expert_enabled),
+                checkpointer=MemorySaver(),
+                config=config
+            )
             
             # Run chat agent in a loop
             while True:
                 try:
-                    run_agent_with_retry(chat_agent, CHAT_PROMPT.format(initial_request=initial_request), config)
+                    chat_prompt = CompactablePrompt(
+                        CHAT_PROMPT_CONTEXT,
+                        values={"initial_request": initial_request},
+                        prefix=CHAT_PROMPT_INSTRUCTIONS
+                    )
+                    run_agent_with_retry(chat_agent, chat_prompt, config)
                     # Get next request from user
                     initial_request = ask_human.invoke({"question": "What else would you like help with?"})
                 except KeyboardInterrupt:
@@ -200,11 +439,27 @@ def main():
                     return
             
         base_task = args.message
+        session_id = args.resume or str(uuid.uuid4())
         config = {
-            "configurable": {"thread_id": uuid.uuid4()},
+            "configurable": {"thread_id": session_id},
             "recursion_limit": 100,
             "research_only": args.research_only,
-            "cowboy_mode": args.cowboy_mode
+            "cowboy_mode": args.cowboy_mode,
+            "hil": args.hil,
+            "max_prompt_tokens": args.max_prompt_tokens,
+            "max_parallel_tasks": args.max_parallel_tasks,
+            "max_parallel_research": args.max_parallel_research,
+            "response_cache_stages": list(args.cache_responses),
+            "response_cache_ttl": args.cache_ttl,
+            "response_cache_max_mb": args.cache_max_mb,
+            "async_agents": args.async_agents,
+            "max_tool_concurrency": args.max_tool_concurrency,
+            "tool_cache": not args.no_tool_cache,
+            "project_memory": not args.no_project_memory,
+            "memory_top_k": args.memory_top_k,
+            "memory_max_tokens": args.memory_max_tokens,
+            "output_mode": args.output_mode or 'panels',
+            "trace_path": trace_path
         }
     
         # Store config in global memory for access by is_informational_query
@@ -217,35 +472,63 @@ def main():
         # Store expert provider and model in config
         _global_memory['config']['expert_provider'] = args.expert_provider
         _global_memory['config']['expert_model'] = args.expert_model
+        _global_memory['base_task'] = base_task
+
+        # Checkpoint every agent thread and global memory so the session can be resumed
+        if checkpointer is None:
+            checkpointer = open_checkpointer()
+            checkpointer.create_session(session_id, base_task)
+        activate_session(checkpointer, session_id)
+        checkpointer.set_session_stage(session_id, stage)
+        console.print(f"[dim]Session {session_id} (resume with: sparc --resume {session_id})[/dim]")
         
         # Run research stage
-        print_stage_header("Research Stage")
-        
-        run_research_agent(
-            base_task,
-            model,
-            expert_enabled=expert_enabled,
-            research_only=args.research_only,
-            hil=args.hil,
-            memory=research_memory,
-            config=config
-        )
+        if stage == 'research':
+            # A resumed session already has its memory; a new one starts from what earlier sessions learned
+            if not args.resume:
+                load_project_memory()
+            print_stage_header("Research Stage")
+
+            run_research_agent(
+                base_task,
+                model,
+                expert_enabled=expert_enabled,
+                research_only=args.research_only,
+                hil=args.hil,
+                memory=checkpointer,
+                config=config,
+                thread_id=session_thread_id('research')
+            )
+            # Saved before implementation changes files, so entries are hashed against the files they describe
+            save_project_memory()
+            stage = 'planning'
+            checkpointer.set_session_stage(session_id, stage)
         
         # Proceed with planning and implementation if not an informational query
-        if not is_informational_query():
+        if stage == 'planning' and not is_informational_query():
             # Run planning agent
             run_planning_agent(
                 base_task,
                 model,
                 expert_enabled=expert_enabled,
                 hil=args.hil,
-                memory=planning_memory,
-                config=config
+                memory=checkpointer,
+                config=config,
+                thread_id=session_thread_id('planning')
             )
 
+        checkpointer.set_session_stage(session_id, 'done')
+
     except KeyboardInterrupt:
         print_interrupt("Operation cancelled by user")
         sys.exit(1)
+    finally:
+        print_cache_report()
+        print_usage_report()
+        if args.usage_json:
+            get_ledger().write_json(args.usage_json)
+        if args.chrome_trace and get_tracer():
+            write_chrome_trace(get_tracer(), args.chrome_trace)
 
 if __name__ == "__main__":
     main()
@@ -1,58 +1,133 @@
 """Utility functions for working with agents."""
 
-import time
-import uuid
-from typing import Optional, Any, List
-
+import asyncio
+import contextvars
+import re
 import signal
 import threading
 import time
-from typing import Optional
+from collections import OrderedDict
+from typing import Optional, Any, Dict, List, Tuple, Union
 
 from langgraph.prebuilt import create_react_agent
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from sparc_cli.console.formatting import print_stage_header, print_error, print_interrupt
-from sparc_cli.console.output import print_agent_output
+from sparc_cli.console.output import AgentOutputRenderer
 from sparc_cli.tool_configs import (
     get_implementation_tools,
     get_research_tools,
     get_planning_tools
 )
 from sparc_cli.prompts import (
-    IMPLEMENTATION_PROMPT,
+    IMPLEMENTATION_PROMPT_INSTRUCTIONS,
+    IMPLEMENTATION_PROMPT_CONTEXT,
     EXPERT_PROMPT_SECTION_IMPLEMENTATION,
     HUMAN_PROMPT_SECTION_IMPLEMENTATION,
     EXPERT_PROMPT_SECTION_RESEARCH,
-    RESEARCH_PROMPT,
-    RESEARCH_ONLY_PROMPT,
+    RESEARCH_PROMPT_INSTRUCTIONS,
+    RESEARCH_PROMPT_CONTEXT,
+    RESEARCH_ONLY_PROMPT_INSTRUCTIONS,
+    RESEARCH_ONLY_PROMPT_CONTEXT,
     HUMAN_PROMPT_SECTION_RESEARCH,
-    PLANNING_PROMPT,
+    PLANNING_PROMPT_INSTRUCTIONS,
+    PLANNING_PROMPT_CONTEXT,
     EXPERT_PROMPT_SECTION_PLANNING,
     HUMAN_PROMPT_SECTION_PLANNING
 )
-from langgraph.checkpoint.memory import MemorySaver
 
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables.config import var_child_runnable_config
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_core.messages import BaseMessage
 from anthropic import APIError, APITimeoutError, RateLimitError, InternalServerError
+from openai import APIError as OpenAIAPIError
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.panel import Panel
 
 from sparc_cli.tools.memory import (
     _global_memory,
+    get_memory_items,
     get_memory_value,
     get_related_files,
+    get_relevant_memory_items,
 )
-from sparc_cli.tool_configs import get_research_tools
-from sparc_cli.prompts import (
-    RESEARCH_PROMPT,
-    RESEARCH_ONLY_PROMPT,
-    EXPERT_PROMPT_SECTION_RESEARCH,
-    HUMAN_PROMPT_SECTION_RESEARCH
+from sparc_cli.text.compaction import (
+    CompactablePrompt,
+    PromptSection,
+    DEFAULT_MAX_PROMPT_TOKENS,
+    estimate_tokens
 )
+from sparc_cli.checkpoint import finish_session_thread, get_checkpointer, session_thread_id
+from sparc_cli.llm import cacheable_prompt_content
+from sparc_cli.llm_cache import with_response_cache
+from sparc_cli.rate_limit import backoff_delay, retry_after_from_error
+from sparc_cli.session import current_session, use_session
+from sparc_cli.ledger import stage_scope
+from sparc_cli.tracing import agent_span, tracing_callbacks
+from sparc_cli.tool_configs import get_research_tools
+from sparc_cli.tool_node import ConcurrentToolNode
 
 console = Console()
 
+# Compiled agent graphs kept for reuse, least recently used dropped first
+MAX_COMPILED_AGENTS = 32
+
+# Share of its estimated size a prompt is compacted to when the provider rejects it
+# as too long without saying by how much
+UNKNOWN_OVERFLOW_COMPACTION = 0.7
+
+# Graphs by model, toolset and tool concurrency. Entries hold the model and tools
+# themselves, so the ids in their keys can't be reused by other objects.
+_compiled_agents: "OrderedDict[tuple, Tuple[Any, list, Any]]" = OrderedDict()
+_tool_schemas: Dict[int, Tuple[Any, dict]] = {}
+_compiled_agents_lock = threading.Lock()
+
+def tool_schema(tool) -> dict:
+    """Return a tool's schema in OpenAI format, derived once per tool."""
+    with _compiled_agents_lock:
+        entry = _tool_schemas.get(id(tool))
+    if entry is None:
+        entry = (tool, convert_to_openai_tool(tool))
+        with _compiled_agents_lock:
+            _tool_schemas[id(tool)] = entry
+    return entry[1]
+
+def _compile_agent(model, tools: list, max_concurrency: Optional[int]):
+    # Binding the precomputed schemas keeps the model from deriving them again
+    bound_model = model.bind_tools([tool_schema(tool) for tool in tools]) if tools else model
+    return create_react_agent(bound_model, ConcurrentToolNode(tools, max_concurrency=max_concurrency))
+
+def create_agent(model, tools: list, *, checkpointer: Any = None, config: Optional[dict] = None):
+    """Create a ReAct agent whose read-only tool calls run concurrently.
+
+    The graph is compiled once per model and toolset and reused by later agents,
+    each getting its own copy bound to its checkpointer. Threads are bound when
+    the agent is run, by the thread_id in its run configuration.
+
+    Args:
+        model: The LLM model to use
+        tools: Tools the agent can call
+        checkpointer: Checkpointer saving the agent's threads
+        config: Run configuration, read for the tool concurrency limit
+
+    Returns:
+        Compiled agent graph
+    """
+    max_concurrency = (config or {}).get('max_tool_concurrency') or _global_memory.get('config', {}).get('max_tool_concurrency')
+    key = (id(model), tuple(id(tool) for tool in tools), max_concurrency)
+    with _compiled_agents_lock:
+        entry = _compiled_agents.get(key)
+        if entry is not None:
+            _compiled_agents.move_to_end(key)
+    if entry is None:
+        entry = (model, list(tools), _compile_agent(model, tools, max_concurrency))
+        with _compiled_agents_lock:
+            _compiled_agents[key] = entry
+            while len(_compiled_agents) > MAX_COMPILED_AGENTS:
+                _compiled_agents.popitem(last=False)
+    return entry[2].copy(update={'checkpointer': checkpointer})
+
 def run_research_agent(
     base_task_or_query: str,
     model,
@@ -75,7 +150,7 @@ def run_research_agent(
         hil: Whether human-in-the-loop mode is enabled
         memory: Optional memory instance to use
         config: Optional configuration dictionary
-        thread_id: Optional thread ID (defaults to new UUID)
+        thread_id: Optional thread ID (defaults to one derived from the session and the input)
         console_message: Optional message to display before running
         
     Returns:
@@ -91,11 +166,14 @@ def run_research_agent(
     """
     # Initialize memory if not provided
     if memory is None:
-        memory = MemorySaver()
+        memory = get_checkpointer()
 
     # Set up thread ID
     if thread_id is None:
-        thread_id = str(uuid.uuid4())
+        thread_id = session_thread_id('research', base_task_or_query)
+
+    # Replay identical calls from the response cache if enabled
+    model = with_response_cache(model, 'research')
 
     # Configure tools
     tools = get_research_tools(
@@ -105,35 +183,38 @@ def run_research_agent(
     )
 
     # Create agent
-    agent = create_react_agent(model, tools, checkpointer=memory)
+    agent = create_agent(model, tools, checkpointer=memory, config=config)
 
     # Format prompt sections
     expert_section = EXPERT_PROMPT_SECTION_RESEARCH if expert_enabled else ""
     human_section = HUMAN_PROMPT_SECTION_RESEARCH if hil else ""
     
-    # Get research context from memory
-    key_facts = _global_memory.get("key_facts", "")
-    code_snippets = _global_memory.get("code_snippets", "")
-    related_files = _global_memory.get("related_files", "")
-    
-    # Build prompt
-    prompt = (RESEARCH_ONLY_PROMPT if research_only else RESEARCH_PROMPT).format(
-        base_task=base_task_or_query,
-        research_only_note='' if research_only else ' Only request implementation if the user explicitly asked for changes to be made.',
-        expert_section=expert_section,
-        human_section=human_section,
-        key_facts=key_facts,
-        code_snippets=code_snippets,
-        related_files=related_files
+    # Build prompt, with research context from memory as compactable sections
+    prompt = CompactablePrompt(
+        RESEARCH_ONLY_PROMPT_CONTEXT if research_only else RESEARCH_PROMPT_CONTEXT,
+        sections=_memory_prompt_sections(
+            base_task_or_query,
+            key_facts='key_facts',
+            code_snippets='key_snippets',
+            related_files='related_files'
+        ),
+        values={
+            'base_task': base_task_or_query,
+            'research_only_note': '' if research_only else ' Only request implementation if the user explicitly asked for changes to be made.',
+            'expert_section': expert_section,
+            'human_section': human_section
+        },
+        prefix=RESEARCH_ONLY_PROMPT_INSTRUCTIONS if research_only else RESEARCH_PROMPT_INSTRUCTIONS
     )
 
     # Set up configuration
     run_config = {
-         "configurable": {"thread_id": thread_id},
         "recursion_limit": 100
     }
     if config:
         run_config.update(config)
+    run_config["configurable"] = {**run_config.get("configurable", {}), "thread_id": thread_id}
+    run_config["agent_name"] = "research"
 
     # Display console message if provided
     if console_message:
@@ -161,48 +242,58 @@ def run_planning_agent(
         hil: Whether human-in-the-loop mode is enabled
         memory: Optional memory instance to use
         config: Optional configuration dictionary
-        thread_id: Optional thread ID (defaults to new UUID)
+        thread_id: Optional thread ID (defaults to one derived from the session and the input)
         
     Returns:
         Optional[str]: The completion message if planning completed successfully
     """
     # Initialize memory if not provided
     if memory is None:
-        memory = MemorySaver()
+        memory = get_checkpointer()
 
     # Set up thread ID
     if thread_id is None:
-        thread_id = str(uuid.uuid4())
+        thread_id = session_thread_id('planning', base_task)
+
+    # Replay identical calls from the response cache if enabled
+    model = with_response_cache(model, 'planning')
 
     # Configure tools
     tools = get_planning_tools(expert_enabled=expert_enabled)
 
     # Create agent
-    agent = create_react_agent(model, tools, checkpointer=memory)
+    agent = create_agent(model, tools, checkpointer=memory, config=config)
 
     # Format prompt sections
     expert_section = EXPERT_PROMPT_SECTION_PLANNING if expert_enabled else ""
     human_section = HUMAN_PROMPT_SECTION_PLANNING if hil else ""
     
     # Build prompt
-    planning_prompt = PLANNING_PROMPT.format(
-        expert_section=expert_section,
-        human_section=human_section,
-        base_task=base_task,
-        research_notes=get_memory_value('research_notes'),
-        related_files="\n".join(get_related_files()),
-        key_facts=get_memory_value('key_facts'),
-        key_snippets=get_memory_value('key_snippets'),
-        research_only_note='' if config.get('research_only') else ' Only request implementation if the user explicitly asked for changes to be made.'
+    planning_prompt = CompactablePrompt(
+        PLANNING_PROMPT_CONTEXT,
+        sections=_memory_prompt_sections(
+            base_task,
+            research_notes='research_notes',
+            related_files='related_files',
+            key_facts='key_facts',
+            key_snippets='key_snippets'
+        ),
+        values={
+            'expert_section': expert_section,
+            'human_section': human_section,
+            'base_task': base_task
+        },
+        prefix=PLANNING_PROMPT_INSTRUCTIONS
     )
 
     # Set up configuration
     run_config = {
-        "configurable": {"thread_id": thread_id},
         "recursion_limit": 100
     }
     if config:
         run_config.update(config)
+    run_config["configurable"] = {**run_config.get("configurable", {}), "thread_id": thread_id}
+    run_config["agent_name"] = "planning"
 
     # Run agent with retry logic
     print_stage_header("Planning Stage")
@@ -232,79 +323,243 @@ def run_task_implementation_agent(
         expert_enabled: Whether expert mode is enabled
         memory: Optional memory instance to use
         config: Optional configuration dictionary
-        thread_id: Optional thread ID (defaults to new UUID)
+        thread_id: Optional thread ID (defaults to one derived from the session and the input)
         
     Returns:
         Optional[str]: The completion message if task completed successfully
     """
     # Initialize memory if not provided
     if memory is None:
-        memory = MemorySaver()
+        memory = get_checkpointer()
 
     # Set up thread ID
     if thread_id is None:
-        thread_id = str(uuid.uuid4())
+        thread_id = session_thread_id('task', task)
+
+    # Replay identical calls from the response cache if enabled
+    model = with_response_cache(model, 'implementation')
 
     # Configure tools
     tools = get_implementation_tools(expert_enabled=expert_enabled)
 
     # Create agent
-    agent = create_react_agent(model, tools, checkpointer=memory)
+    agent = create_agent(model, tools, checkpointer=memory, config=config)
 
     # Build prompt
-    prompt = IMPLEMENTATION_PROMPT.format(
-        base_task=base_task,
-        task=task,
-        tasks=tasks,
-        plan=plan,
-        related_files=related_files,
-        key_facts=get_memory_value('key_facts'),
-        key_snippets=get_memory_value('key_snippets'),
-        expert_section=EXPERT_PROMPT_SECTION_IMPLEMENTATION if expert_enabled else "",
-        human_section=HUMAN_PROMPT_SECTION_IMPLEMENTATION if _global_memory.get('config', {}).get('hil', False) else ""
+    prompt = CompactablePrompt(
+        IMPLEMENTATION_PROMPT_CONTEXT,
+        sections=_memory_prompt_sections(
+            task,
+            key_facts='key_facts',
+            key_snippets='key_snippets'
+        ),
+        values={
+            'base_task': base_task,
+            'task': task,
+            'tasks': tasks,
+            'plan': plan,
+            'related_files': related_files,
+            'expert_section': EXPERT_PROMPT_SECTION_IMPLEMENTATION if expert_enabled else "",
+            'human_section': HUMAN_PROMPT_SECTION_IMPLEMENTATION if _global_memory.get('config', {}).get('hil', False) else ""
+        },
+        prefix=IMPLEMENTATION_PROMPT_INSTRUCTIONS
     )
 
     # Set up configuration
     run_config = {
-        "configurable": {"thread_id": thread_id},
         "recursion_limit": 100
     }
     if config:
         run_config.update(config)
+    run_config["configurable"] = {**run_config.get("configurable", {}), "thread_id": thread_id}
+    run_config["agent_name"] = "implementation"
 
     # Run agent with retry logic
     return run_agent_with_retry(agent, prompt, run_config)
 
-_CONTEXT_STACK = []
-_INTERRUPT_CONTEXT = None
+# Memory sections that are kept the longest when a prompt has to be compacted
+PROMPT_SECTION_PRIORITIES = {
+    'research_notes': 0,
+    'key_snippets': 1,
+    'key_facts': 2,
+    'related_files': 3
+}
+
+def _memory_prompt_sections(query: Optional[str] = None, **placeholders: str) -> List[PromptSection]:
+    """Build compactable prompt sections from memory collections.
+
+    Args:
+        query: Task or question of the prompt; if given, facts, snippets and research notes
+            are limited to the entries most relevant to it
+        **placeholders: Template placeholder name mapped to the memory key that fills it
+
+    Returns:
+        One PromptSection per placeholder
+    """
+    sections = []
+    for placeholder, key in placeholders.items():
+        items = get_relevant_memory_items(key, query) if query else get_memory_items(key)
+        sections.append(PromptSection(
+            name=placeholder,
+            entries=[text for text, _ in items],
+            entry_priorities=[priority for _, priority in items],
+            priority=PROMPT_SECTION_PRIORITIES.get(key, 0),
+            separator="\n" if key == 'related_files' else "\n\n"
+        ))
+    return sections
+
+def _parse_token_overflow(error_str: str) -> Optional[Tuple[int, int]]:
+    """Extract (prompt tokens, maximum tokens) from a provider's prompt-too-long error."""
+    match = re.search(r'(\d+)\s*tokens?\s*>\s*(\d+)\s*maximum', error_str)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    match = re.search(r'maximum context length is (\d+) tokens.*?resulted in (\d+) tokens', error_str)
+    if match:
+        return int(match.group(2)), int(match.group(1))
+    return None
+
+def _has_pending_run(agent, config: dict) -> bool:
+    """Check whether the agent's thread was checkpointed in the middle of a run."""
+    if not isinstance(getattr(agent, 'checkpointer', None), BaseCheckpointSaver):
+        return False
+    return bool(agent.get_state(config).next)
 
 def _request_interrupt(signum, frame):
-    global _INTERRUPT_CONTEXT
-    if _CONTEXT_STACK:
-        _INTERRUPT_CONTEXT = _CONTEXT_STACK[-1]
+    session = current_session()
+    if session.interruptible_sections:
+        session.interrupted_section = session.interruptible_sections[-1]
 
 class InterruptibleSection:
     def __enter__(self):
-        _CONTEXT_STACK.append(self)
+        # Kept by the session, so that sections of concurrent agents do not interrupt each other
+        self._session = current_session()
+        self._session.interruptible_sections.append(self)
         return self
     
     def __exit__(self, exc_type, exc_value, traceback):
-        _CONTEXT_STACK.remove(self)
+        self._session.interruptible_sections.remove(self)
+
+def _interrupt_requested() -> bool:
+    session = current_session()
+    sections = session.interruptible_sections
+    return bool(sections) and session.interrupted_section is sections[-1]
 
 def check_interrupt():
-    if _CONTEXT_STACK and _INTERRUPT_CONTEXT is _CONTEXT_STACK[-1]:
+    if _interrupt_requested():
         raise KeyboardInterrupt("Interrupt requested")
 
-def run_agent_with_retry(agent, prompt: str, config: dict) -> Optional[str]:
+# Event loop running all async agents of the process. Model clients open their async
+# connections on the first loop that uses them, so every run has to share one loop.
+_agent_loop: Optional[asyncio.AbstractEventLoop] = None
+_agent_loop_lock = threading.Lock()
+
+def run_on_agent_loop(coro) -> Any:
+    """Run a coroutine on the shared agent event loop and wait for its result.
+
+    Safe to call from tools, which run on the loop's executor threads, so sub-agents
+    started by a tool share the loop of their parent.
+    """
+    global _agent_loop
+    with _agent_loop_lock:
+        if _agent_loop is None:
+            _agent_loop = asyncio.new_event_loop()
+            threading.Thread(target=_agent_loop.run_forever, name="sparc-agent-loop", daemon=True).start()
+
+    # Tasks of the loop start from the loop thread's context, not the caller's
+    session = current_session()
+
+    async def in_session():
+        with use_session(session):
+            return await coro
+
+    return asyncio.run_coroutine_threadsafe(in_session(), _agent_loop).result()
+
+async def _astream_agent(agent, stream_input: Optional[dict], config: dict, renderer: AgentOutputRenderer) -> None:
+    """Stream an agent run with astream, stopping early if an interrupt was requested."""
+    try:
+        async for item in agent.astream(stream_input, config, stream_mode=renderer.stream_mode):
+            if _interrupt_requested():
+                return
+            renderer.render(item)
+    finally:
+        renderer.close()
+
+def _stream_agent(agent, stream_input: Optional[dict], config: dict, renderer: AgentOutputRenderer) -> None:
+    """Stream an agent run on the calling thread."""
+    try:
+        for item in agent.stream(stream_input, config, stream_mode=renderer.stream_mode):
+            check_interrupt()
+            renderer.render(item)
+    finally:
+        renderer.close()
+
+def _detached(func, *args) -> Any:
+    """Call func outside of the runnable that is currently executing.
+
+    Sub-agents are started from tools of their parent and would otherwise inherit the
+    parent's callbacks, which feed the parent's message stream with the sub-agent's tokens.
+    """
+    context = contextvars.copy_context()
+    context.run(var_child_runnable_config.set, None)
+    return context.run(func, *args)
+
+def run_agent_with_retry(agent, prompt: Union[str, CompactablePrompt], config: dict) -> Optional[str]:
+    """Run an agent until it completes, retrying transient provider errors.
+
+    The prompt is rendered within the configured token budget before it is sent. If the
+    provider still rejects it as too long, it is compacted further using the token counts
+    reported in the error instead of being cut off blindly.
+
+    If the agent's thread has a checkpoint with pending steps, for example after a crash or
+    a transient error, the run resumes from that checkpoint instead of sending the prompt again.
+
+    The prompt's static prefix is sent as a separate content block marked for caching where
+    the provider supports it.
+
+    Retries wait a capped, jittered exponential backoff, and at least as long as the
+    provider's retry-after, so agents failing together do not retry together.
+
+    The agent's output is shown according to the output_mode in the config, see
+    AgentOutputRenderer. With async_agents set in the config, the agent is streamed with
+    astream on the shared agent event loop instead of on the calling thread.
+
+    Args:
+        agent: Compiled agent graph to stream
+        prompt: Prompt text, or a CompactablePrompt whose sections can be condensed or dropped
+        config: Run configuration passed to the agent
+
+    Returns:
+        Optional[str]: Completion message, or None in chat mode
+    """
+    if isinstance(prompt, str):
+        prompt = CompactablePrompt("{prompt}", values={"prompt": prompt})
+    # Agents started from tools may get no config, or only part of it, so fall back to the run's
+    run_settings = _global_memory.get('config', {})
+    token_budget = config.get('max_prompt_tokens') or run_settings.get('max_prompt_tokens') or DEFAULT_MAX_PROMPT_TOKENS
+    prompt_prefix, prompt_body = prompt.render_parts(token_budget)
+    provider = config.get('provider') or run_settings.get('provider')
+
     original_handler = None
     if threading.current_thread() is threading.main_thread():
         original_handler = signal.getsignal(signal.SIGINT)
         signal.signal(signal.SIGINT, _request_interrupt)
 
     max_retries = 20
-    base_delay = 1
+    # Thread the run was started on; compaction moves it to fresh threads derived from it
+    thread_id = config.get('configurable', {}).get('thread_id')
+
+    # Trace the run's model and tool calls, and the run itself, if tracing is on
+    callbacks = tracing_callbacks()
+    if callbacks:
+        config = {**config, "callbacks": [*(config.get("callbacks") or []), *callbacks]}
+    span = agent_span(
+        config.get('agent_name', 'agent'),
+        depth=_global_memory.get('agent_depth', 0) + 1,
+        thread_id=thread_id
+    )
 
-    with InterruptibleSection():
+    # Root agents attribute their model usage to their stage
+    with InterruptibleSection(), span, stage_scope(config.get('agent_name', 'agent')):
         try:
             # Track agent execution depth
             current_depth = _global_memory.get('agent_depth', 0)
@@ -312,37 +567,62 @@ def run_agent_with_retry(agent, prompt: str, config: dict) -> Optional[str]:
             
             for attempt in range(max_retries):
                 check_interrupt()
+                if _has_pending_run(agent, config):
+                    stream_input = None
+                    if attempt == 0:
+                        console.print("[dim]Resuming agent from its last checkpoint...[/dim]")
+                else:
+                    content = cacheable_prompt_content(prompt_prefix, prompt_body, provider)
+                    stream_input = {"messages": [HumanMessage(content=content)]}
+                renderer = AgentOutputRenderer(config.get('output_mode') or run_settings.get('output_mode') or 'panels')
                 try:
-                    for chunk in agent.stream({"messages": [HumanMessage(content=prompt)]}, config):
+                    if config.get('async_agents', run_settings.get('async_agents')):
+                        _detached(run_on_agent_loop, _astream_agent(agent, stream_input, config, renderer))
                         check_interrupt()
-                        print_agent_output(chunk)
+                    elif renderer.streams_tokens:
+                        _detached(_stream_agent, agent, stream_input, config, renderer)
+                    else:
+                        _stream_agent(agent, stream_input, config, renderer)
+                    finish_session_thread(thread_id)
                     if not config.get('chat_mode'):
                         return "Agent run completed successfully"
                     return None
                 except KeyboardInterrupt:
                     raise
-                except (InternalServerError, APITimeoutError, RateLimitError, APIError) as e:
+                except (InternalServerError, APITimeoutError, RateLimitError, APIError, OpenAIAPIError) as e:
                     error_str = str(e).lower()
-                    if 'prompt is too long' in error_str or 'token limit exceeded' in error_str:
-                        # Extract current and max tokens from error message
-                        import re
-                        match = re.search(r'(\d+)\s*tokens?\s*>\s*(\d+)\s*maximum', error_str)
-                        if match:
-                            current_tokens = int(match.group(1))
-                            max_tokens = int(match.group(2))
-                            # Calculate reduction ratio to get under limit with 10% buffer
-                            reduction_ratio = (max_tokens * 0.9) / current_tokens
-                            # Truncate prompt
-                            words = prompt.split()
-                            new_length = int(len(words) * reduction_ratio)
-                            prompt = ' '.join(words[:new_length])
-                            print_error(f"Prompt truncated to fit within token limit. Continuing with shortened prompt...")
-                            continue
+                    if 'prompt is too long' in error_str or 'token limit exceeded' in error_str or 'maximum context length' in error_str:
+                        # An oversized prompt fails the same way every time, so it is compacted, never retried as is
+                        estimated = estimate_tokens(prompt_prefix + prompt_body)
+                        overflow = _parse_token_overflow(error_str)
+                        if overflow:
+                            current_tokens, max_tokens = overflow
+                            # Shrink the estimated prompt size by the reported overflow, and at least
+                            # proportionally, leaving a 10% buffer below the provider limit
+                            target = int(max_tokens * 0.9)
+                            token_budget = max(1, min(
+                                estimated - (current_tokens - target),
+                                int(estimated * target / current_tokens)
+                            ))
+                        else:
+                            # The provider did not say by how much it is over
+                            token_budget = max(1, int(estimated * UNKNOWN_OVERFLOW_COMPACTION))
+                        prompt_prefix, prompt_body = prompt.render_parts(token_budget)
+                        if stream_input is not None and estimate_tokens(prompt_prefix + prompt_body) >= estimated:
+                            raise RuntimeError(f"Prompt is too long and cannot be compacted further: {e}")
+                        # The rejected prompt is part of the thread's state, so start a fresh thread
+                        configurable = config.get("configurable", {})
+                        config = {**config, "configurable": {
+                            **configurable,
+                            "thread_id": f"{configurable.get('thread_id')}:compacted-{attempt + 1}"
+                        }}
+                        print_error(f"Prompt compacted to fit within token limit. Continuing with compacted prompt...")
+                        continue
 
                     if attempt == max_retries - 1:
                         raise RuntimeError(f"Max retries ({max_retries}) exceeded. Last error: {e}")
-                    delay = base_delay * (2 ** attempt)
-                    print_error(f"Encountered {e.__class__.__name__}: {e}. Retrying in {delay}s... (Attempt {attempt+1}/{max_retries})")
+                    delay = backoff_delay(attempt, retry_after=retry_after_from_error(e))
+                    print_error(f"Encountered {e.__class__.__name__}: {e}. Retrying in {delay:.1f}s... (Attempt {attempt+1}/{max_retries})")
                     start = time.monotonic()
                     while time.monotonic() - start < delay:
                         check_interrupt()
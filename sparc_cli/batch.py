@@ -0,0 +1,354 @@
+"""Headless batch runs of many tasks from a JSONL manifest.
+
+Usage:
+    sparc batch tasks.jsonl [--workers N] [--output PATH]
+
+Each manifest line is a JSON object describing one task:
+
+    {"id": "fix-auth", "repo": "../service", "message": "Fix the login timeout",
+     "mode": "full", "provider": "anthropic", "model": "claude-3-5-sonnet-20241022"}
+
+Only "message" is required. "id", made of letters, digits, ".", "_" and "-",
+defaults to the line number, "repo" to the manifest's directory (relative
+paths are resolved against it) and "mode" to "full"; "research-only" stops
+after research. Provider and model default as for `sparc`, and
+"expert_provider" and "expert_model" can be given too.
+
+Every task runs in a fresh worker process, so its global memory, tool cache,
+tracer and ledger are its own. Tasks run headless, without human-in-the-loop
+and in cowboy mode. A task's output goes to <output dir>/<id>.log and its trace
+to <output dir>/<id>.trace.jsonl. Each finished task appends one result line,
+with its outcome, timing and token costs, to the output JSONL.
+
+Runs are resumable: tasks whose ID already has a successful result in the
+output file are skipped, and an interrupted task continues from the last
+stage it completed, which is kept in its repository's session store
+(.sparc/checkpoints.db) under the session ID in <output dir>/<id>.session.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from rich.console import Console
+
+from sparc_cli.config import DEFAULT_BATCH_WORKERS
+
+TASK_MODES = ('full', 'research-only')
+
+DEFAULT_MODELS = {'anthropic': 'claude-3-5-sonnet-20241022'}
+
+# Task IDs name the task's artifact files and appear in server URLs
+TASK_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]+')
+
+console = Console()
+
+
+def parse_task(spec: Any, base_dir: str, default_id: str) -> Dict[str, Any]:
+    """Validate one task and fill in its defaults.
+
+    Args:
+        spec: Task as decoded from JSON
+        base_dir: Directory relative repository paths are resolved against
+        default_id: ID of the task if it has none
+
+    Returns:
+        Task with defaults filled in and an absolute repository path
+
+    Raises:
+        ValueError: If the task is invalid
+    """
+    if not isinstance(spec, dict) or not spec.get('message'):
+        raise ValueError("a task needs a message")
+    task = {
+        'id': str(spec.get('id', default_id)),
+        'repo': os.path.normpath(os.path.join(base_dir, spec.get('repo', '.'))),
+        'message': spec['message'],
+        'mode': spec.get('mode', 'full'),
+        'provider': spec.get('provider', 'anthropic'),
+        'model': spec.get('model'),
+        'expert_provider': spec.get('expert_provider', 'openai'),
+        'expert_model': spec.get('expert_model'),
+    }
+    if not TASK_ID_PATTERN.fullmatch(task['id']):
+        raise ValueError("an id may only contain letters, digits, '.', '_' and '-'")
+    if task['mode'] not in TASK_MODES:
+        raise ValueError(f"mode must be one of {', '.join(TASK_MODES)}")
+    task['model'] = task['model'] or DEFAULT_MODELS.get(task['provider'])
+    if not task['model']:
+        raise ValueError(f"a model is required for provider '{task['provider']}'")
+    return task
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """Read and validate the tasks of a manifest.
+
+    Args:
+        path: JSONL manifest, one task per line; blank lines are ignored
+
+    Returns:
+        Tasks with defaults filled in and absolute repository paths
+
+    Raises:
+        ValueError: If a line is not a valid task or two tasks share an ID
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    tasks = []
+    seen = set()
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                task = parse_task(json.loads(line), base_dir, str(line_number))
+            except ValueError as e:
+                # JSONDecodeError is a ValueError too
+                raise ValueError(f"{path}:{line_number}: {e}")
+            if task['id'] in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate task ID {task['id']}")
+            seen.add(task['id'])
+            tasks.append(task)
+    return tasks
+
+
+def completed_task_ids(output_path: str) -> set:
+    """Return the IDs of tasks with a successful result in an output file."""
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run
+                continue
+            if result.get('success'):
+                done.add(result['id'])
+    return done
+
+
+def run_task(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one task in its repository, with output going to its log.
+
+    Args:
+        job: The task, and the paths of its log, trace and session ID files
+
+    Returns:
+        Result of the task, with the usage of the model calls it made
+    """
+    import contextlib
+    import uuid
+    from types import SimpleNamespace
+
+    from sparc_cli.ledger import UsageLedger, get_ledger
+
+    task = job['task']
+    result = {'id': task['id'], 'repo': task['repo'], 'mode': task['mode'], 'success': False, 'error': None,
+              'stage': None, 'completion_message': None, 'log': job['log_path'], 'trace': job['trace_path']}
+    start = time.perf_counter()
+    # Worker processes may be reused, so only report the usage of this task
+    usage_start = len(get_ledger().entries)
+    with open(job['log_path'], 'a', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        from sparc_cli.agent_utils import run_planning_agent, run_research_agent
+        from sparc_cli.checkpoint import activate_session, open_checkpointer, session_thread_id
+        from sparc_cli.env import validate_environment
+        from sparc_cli.llm import get_llm
+        from sparc_cli.project_memory import load_project_memory, save_project_memory
+        from sparc_cli.tools.memory import _global_memory
+
+        try:
+            os.chdir(task['repo'])
+            research_only = task['mode'] == 'research-only'
+            expert_enabled, _ = validate_environment(SimpleNamespace(
+                provider=task['provider'], expert_provider=task['expert_provider']
+            ))
+            model = get_llm(task['provider'], task['model'])
+
+            # The session of an earlier, interrupted run of the task, if any
+            checkpointer = open_checkpointer()
+            session_id = session = None
+            if os.path.exists(job['session_path']):
+                with open(job['session_path'], encoding='utf-8') as f:
+                    session_id = f.read().strip()
+                session = checkpointer.get_session(session_id)
+            stage = 'research'
+            new_session = session is None
+            if new_session:
+                session_id = f"batch-{task['id']}-{uuid.uuid4()}"
+                checkpointer.create_session(session_id, task['message'])
+                with open(job['session_path'], 'w', encoding='utf-8') as f:
+                    f.write(session_id)
+            else:
+                stage = session['stage']
+                _global_memory.update(session['memory'] or {})
+                _global_memory['agent_depth'] = 0
+
+            config = {
+                "configurable": {"thread_id": session_id},
+                "recursion_limit": 100,
+                "research_only": research_only,
+                "cowboy_mode": True,
+                "hil": False,
+                "provider": task['provider'],
+                "model": task['model'],
+                "expert_provider": task['expert_provider'],
+                "expert_model": task['expert_model'],
+                "project_memory": True,
+                "output_mode": 'plain',
+                "trace_path": job['trace_path']
+            }
+            _global_memory['config'] = config
+            _global_memory['base_task'] = task['message']
+            activate_session(checkpointer, session_id)
+
+            if stage == 'research':
+                result['stage'] = stage
+                if new_session:
+                    load_project_memory()
+                run_research_agent(
+                    task['message'],
+                    model,
+                    expert_enabled=expert_enabled,
+                    research_only=research_only,
+                    hil=False,
+                    memory=checkpointer,
+                    config=config,
+                    thread_id=session_thread_id('research')
+                )
+                save_project_memory()
+                stage = 'planning'
+                checkpointer.set_session_stage(session_id, stage)
+
+            if stage == 'planning' and not research_only and _global_memory.get('implementation_requested'):
+                result['stage'] = stage
+                run_planning_agent(
+                    task['message'],
+                    model,
+                    expert_enabled=expert_enabled,
+                    hil=False,
+                    memory=checkpointer,
+                    config=config,
+                    thread_id=session_thread_id('planning')
+                )
+
+            checkpointer.set_session_stage(session_id, 'done')
+            result['stage'] = 'done'
+            result['success'] = True
+            result['completion_message'] = _global_memory.get('completion_message') or None
+        except SystemExit:
+            result['error'] = "environment is not configured for the task's provider; see the task's log"
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+
+    usage = UsageLedger()
+    usage.merge(get_ledger().entries[usage_start:])
+    result['duration_seconds'] = time.perf_counter() - start
+    result['usage'] = usage.summary()
+    return result
+
+
+def run_batch(
+    tasks: List[Dict[str, Any]],
+    output_path: str,
+    *,
+    workers: int = DEFAULT_BATCH_WORKERS,
+    worker: Callable[[Dict[str, Any]], Dict[str, Any]] = run_task
+) -> List[Dict[str, Any]]:
+    """Run tasks concurrently, each in a fresh worker process, appending their results to output_path.
+
+    Tasks that already have a successful result in output_path are skipped.
+
+    Args:
+        tasks: Tasks as returned by load_manifest
+        output_path: JSONL file results are appended to
+        workers: Upper bound on concurrently running tasks
+        worker: Function executed in the worker processes for each task
+
+    Returns:
+        Results of the tasks run now, in order of completion
+    """
+    done = completed_task_ids(output_path)
+    pending = [task for task in tasks if task['id'] not in done]
+    if done:
+        console.print(f"[dim]Skipping {len(tasks) - len(pending)} completed task(s)[/dim]")
+    if not pending:
+        return []
+
+    artifacts_dir = os.path.splitext(os.path.abspath(output_path))[0]
+    os.makedirs(artifacts_dir, exist_ok=True)
+    jobs = [{
+        'task': task,
+        'log_path': os.path.join(artifacts_dir, f"{task['id']}.log"),
+        'trace_path': os.path.join(artifacts_dir, f"{task['id']}.trace.jsonl"),
+        'session_path': os.path.join(artifacts_dir, f"{task['id']}.session"),
+    } for task in pending]
+
+    results = []
+    # Spawned, single-use workers give every task a clean interpreter: no global
+    # memory, caches, tracer or ledger carried over from another task
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs))), mp_context=context,
+                             max_tasks_per_child=1) as executor, \
+            open(output_path, 'a', encoding='utf-8') as output:
+        futures = {executor.submit(worker, job): job for job in jobs}
+        for future in as_completed(futures):
+            task = futures[future]['task']
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself failed, for instance by being killed
+                result = {'id': task['id'], 'repo': task['repo'], 'mode': task['mode'], 'success': False,
+                          'error': f"{type(e).__name__}: {e}"}
+            output.write(json.dumps(result, default=str) + '\n')
+            output.flush()
+            results.append(result)
+            status = "[green]done[/green]" if result['success'] else f"[red]failed[/red] ({result['error']})"
+            console.print(f"{task['id']}: {status}")
+    return results
+
+
+def parse_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='sparc batch',
+        description='Run the tasks of a JSONL manifest headless, each in its own process'
+    )
+    parser.add_argument('manifest', help='JSONL file with one task per line')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_BATCH_WORKERS,
+        help=f'Maximum number of tasks run concurrently (default: {DEFAULT_BATCH_WORKERS})'
+    )
+    parser.add_argument(
+        '--output',
+        metavar='PATH',
+        help='JSONL file results are appended to (default: the manifest name with .results.jsonl)'
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of `sparc batch`; returns the exit status."""
+    args = parse_arguments(argv)
+    try:
+        tasks = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]{e}[/red]")
+        return 2
+    output_path = args.output or f"{os.path.splitext(args.manifest)[0]}.results.jsonl"
+    results = run_batch(tasks, output_path, workers=args.workers)
+    failed = sum(1 for result in results if not result['success'])
+    cost = sum(result.get('usage', {}).get('total', {}).get('cost_usd', 0.0) for result in results)
+    console.print(f"{len(results) - failed} succeeded, {failed} failed, ${cost:.4f}; results in {output_path}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
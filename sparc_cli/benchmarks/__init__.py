@@ -0,0 +1 @@
+"""Offline benchmarks of sparc's own overhead, run against scripted models."""
@@ -0,0 +1,287 @@
+"""End-to-end benchmark of the agent loop's own overhead.
+
+Runs the research, planning and implementation agents against a generated
+fixture repository, with scripted models in place of a provider. Each stage
+reads files, lists directories and records facts, snippets, plans and tasks
+in memory like a real run does, so the measured time is spent in langgraph
+steps, prompt and memory formatting, Rich rendering and tool dispatch. The
+scripted latency per model call is subtracted to report the overhead.
+
+Usage:
+    python -m sparc_cli.benchmarks.agent_loop [--repeat N] [--latency SECONDS]
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+from rich.console import Console
+from rich.table import Table
+
+from sparc_cli.benchmarks.scripted_model import ScriptedChatModel, scripted_turn, tool_call
+from sparc_cli.console.output import OUTPUT_MODES
+from sparc_cli.tool_cache import invalidate_tool_cache
+from sparc_cli.tools.memory import _global_memory
+
+STAGES = ('research', 'planning', 'implementation')
+
+DEFAULT_REPEAT = 5
+DEFAULT_FIXTURE_MODULES = 20
+
+console = Console()
+
+
+def create_fixture_repo(root: str, modules: int = DEFAULT_FIXTURE_MODULES) -> str:
+    """Write a small Python project to benchmark against.
+
+    Args:
+        root: Directory to create the project in
+        modules: Number of modules in the project's package
+
+    Returns:
+        The project's root directory
+    """
+    package = os.path.join(root, 'app')
+    os.makedirs(package, exist_ok=True)
+    os.makedirs(os.path.join(root, 'tests'), exist_ok=True)
+    with open(os.path.join(root, 'README.md'), 'w', encoding='utf-8') as f:
+        f.write("# app\n\nA fixture project for benchmarking.\n")
+    with open(os.path.join(package, '__init__.py'), 'w', encoding='utf-8') as f:
+        f.write('"""Fixture package."""\n')
+    for index in range(modules):
+        with open(os.path.join(package, f'module_{index}.py'), 'w', encoding='utf-8') as f:
+            f.write(f'"""Module {index}."""\n\n')
+            for function in range(10):
+                f.write(f"def function_{function}(value):\n    return value * {function} + {index}\n\n")
+        with open(os.path.join(root, 'tests', f'test_module_{index}.py'), 'w', encoding='utf-8') as f:
+            f.write(f"from app.module_{index} import function_1\n\n"
+                    f"def test_function_1():\n    assert function_1(1) == {1 + index}\n")
+    return root
+
+
+def research_script(modules: int = DEFAULT_FIXTURE_MODULES) -> List[AIMessage]:
+    """Return responses of a research agent exploring the fixture repository."""
+    files = [f'app/module_{index}.py' for index in range(min(modules, 3))]
+    return [
+        scripted_turn(tool_call('list_directory_tree', path='.', max_depth=2)),
+        scripted_turn(*[tool_call('read_file_tool', filepath=path) for path in files]),
+        scripted_turn(
+            tool_call('emit_related_files', files=files),
+            tool_call('emit_key_facts', facts=[f"{path} defines function_0 to function_9" for path in files]),
+            tool_call('emit_key_snippets', snippets=[{
+                'filepath': files[0],
+                'line_number': 3,
+                'snippet': "def function_0(value):\n    return value * 0 + 0",
+                'description': "Simplest function"
+            }])
+        ),
+        scripted_turn(tool_call('emit_research_notes', notes="Functions follow one pattern: value * n + module index.")),
+        AIMessage(content="Research complete. The project is a package of similar modules with one test each.")
+    ]
+
+
+def planning_script(modules: int = DEFAULT_FIXTURE_MODULES) -> List[AIMessage]:
+    """Return responses of a planning agent splitting the change into two tasks."""
+    return [
+        scripted_turn(tool_call('read_file_tool', filepath='app/module_0.py')),
+        scripted_turn(tool_call('emit_plan', plan="Add type hints to module_0, then document it in the README.")),
+        scripted_turn(
+            tool_call('emit_task', task="Add type hints to app/module_0.py", files=['app/module_0.py']),
+            tool_call('emit_task', task="Document module_0 in README.md", files=['README.md'], depends_on=[1])
+        ),
+        AIMessage(content="Planning complete.")
+    ]
+
+
+def implementation_script(modules: int = DEFAULT_FIXTURE_MODULES) -> List[AIMessage]:
+    """Return responses of an implementation agent working on one task."""
+    return [
+        scripted_turn(tool_call('read_file_tool', filepath='app/module_0.py'),
+                      tool_call('read_file_tool', filepath='tests/test_module_0.py')),
+        scripted_turn(tool_call('emit_key_facts', facts=["module_0 is covered by tests/test_module_0.py"])),
+        scripted_turn(tool_call('task_completed', message="Type hints added.")),
+        AIMessage(content="Task complete.")
+    ]
+
+
+SCRIPTS: Dict[str, Callable[[int], List[AIMessage]]] = {
+    'research': research_script,
+    'planning': planning_script,
+    'implementation': implementation_script,
+}
+
+
+def run_stage(stage: str, model: ScriptedChatModel, config: Dict[str, Any]) -> None:
+    """Run one stage's agent with the given model, in the current directory."""
+    from sparc_cli.agent_utils import run_planning_agent, run_research_agent, run_task_implementation_agent
+
+    base_task = "Add type hints to module_0 and document it"
+    if stage == 'research':
+        run_research_agent(base_task, model, expert_enabled=False, research_only=True, hil=False, config=config)
+    elif stage == 'planning':
+        run_planning_agent(base_task, model, expert_enabled=False, hil=False, config=config)
+    else:
+        tasks = list(_global_memory['tasks'].values()) or ["Add type hints to app/module_0.py"]
+        run_task_implementation_agent(
+            base_task,
+            tasks,
+            tasks[0],
+            "\n".join(_global_memory['plans']),
+            list(_global_memory['related_files'].values()),
+            model,
+            expert_enabled=False,
+            config=config
+        )
+
+
+@dataclass
+class StageResult:
+    """Timings of one stage over all repetitions."""
+    stage: str
+    seconds: List[float] = field(default_factory=list)
+    model_calls: int = 0
+    latency: float = 0.0
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.seconds)
+
+    @property
+    def overhead(self) -> float:
+        """Median time per run not spent waiting for the model."""
+        return self.median - self.model_calls * self.latency
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.stage,
+            'runs': len(self.seconds),
+            'model_calls': self.model_calls,
+            'median_seconds': self.median,
+            'min_seconds': min(self.seconds),
+            'overhead_seconds': self.overhead,
+            'seconds': self.seconds,
+        }
+
+
+def run_agent_benchmark(
+    repo: str,
+    *,
+    repeat: int = DEFAULT_REPEAT,
+    latency: float = 0.0,
+    modules: int = DEFAULT_FIXTURE_MODULES,
+    output_mode: str = 'panels',
+    show_output: bool = False
+) -> Dict[str, StageResult]:
+    """Run every stage repeatedly against the fixture repository and time it.
+
+    Each repetition starts from empty memory and an empty tool result cache, so
+    it does the work of a fresh session.
+
+    Args:
+        repo: Fixture repository created by create_fixture_repo
+        repeat: Number of runs of each stage
+        latency: Scripted latency of every model call, in seconds
+        modules: Number of modules the fixture repository was created with
+        output_mode: One of OUTPUT_MODES
+        show_output: Whether to show the agents' output instead of rendering it to a buffer
+
+    Returns:
+        Timings per stage
+    """
+    config = {
+        'provider': 'scripted',
+        'model': 'scripted',
+        'expert_provider': None,
+        'expert_model': None,
+        'cowboy_mode': True,
+        'hil': False,
+        'output_mode': output_mode,
+        'recursion_limit': 100,
+    }
+    results = {stage: StageResult(stage, latency=latency) for stage in STAGES}
+    saved_memory = copy.deepcopy(_global_memory)
+    cwd = os.getcwd()
+    # Rich renders to stdout; a buffer keeps the rendering work but not the terminal's
+    output = contextlib.nullcontext() if show_output else contextlib.redirect_stdout(io.StringIO())
+    try:
+        os.chdir(repo)
+        with output:
+            for _ in range(repeat):
+                _global_memory.clear()
+                _global_memory.update(copy.deepcopy(saved_memory))
+                _global_memory.update({
+                    'research_notes': [], 'plans': [], 'tasks': {}, 'task_files': {}, 'task_dependencies': {},
+                    'task_id_counter': 1, 'key_facts': {}, 'key_fact_id_counter': 1, 'key_snippets': {},
+                    'key_snippet_id_counter': 1, 'related_files': {}, 'related_file_id_counter': 1,
+                    'agent_depth': 0, 'work_log': [], 'config': dict(config)
+                })
+                invalidate_tool_cache()
+                for stage in STAGES:
+                    model = ScriptedChatModel(script=SCRIPTS[stage](modules), latency=latency)
+                    start = time.perf_counter()
+                    run_stage(stage, model, config)
+                    results[stage].seconds.append(time.perf_counter() - start)
+                    results[stage].model_calls = model.calls
+    finally:
+        os.chdir(cwd)
+        _global_memory.clear()
+        _global_memory.update(saved_memory)
+    return results
+
+
+def print_results(results: Dict[str, StageResult]) -> None:
+    """Print the timings of each stage as a table."""
+    table = Table(title="Agent Loop Overhead")
+    table.add_column("Stage")
+    for column in ("Runs", "Model calls", "Median", "Min", "Overhead"):
+        table.add_column(column, justify="right")
+    for result in results.values():
+        table.add_row(
+            result.stage,
+            str(len(result.seconds)),
+            str(result.model_calls),
+            f"{result.median * 1000:.1f} ms",
+            f"{min(result.seconds) * 1000:.1f} ms",
+            f"{result.overhead * 1000:.1f} ms"
+        )
+    console.print(table)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'Runs of each stage (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latency of every model call in seconds (default: 0)')
+    parser.add_argument('--modules', type=int, default=DEFAULT_FIXTURE_MODULES,
+                        help=f'Modules in the fixture repository (default: {DEFAULT_FIXTURE_MODULES})')
+    parser.add_argument('--output-mode', choices=OUTPUT_MODES, default='panels', help='How agent output is rendered')
+    parser.add_argument('--show-output', action='store_true', help='Show agent output instead of rendering it to a buffer')
+    parser.add_argument('--json', metavar='PATH', help='Also write the timings to PATH as JSON')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='sparc_bench_') as root:
+        repo = create_fixture_repo(root, args.modules)
+        results = run_agent_benchmark(
+            repo,
+            repeat=args.repeat,
+            latency=args.latency,
+            modules=args.modules,
+            output_mode=args.output_mode,
+            show_output=args.show_output
+        )
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([result.to_dict() for result in results.values()], f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
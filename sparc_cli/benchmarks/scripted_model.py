@@ -0,0 +1,125 @@
+"""Deterministic chat model that replays a script of responses.
+
+The model answers each call with the next message of its script, after a
+configurable latency, and reports configurable token usage. Scripts consist of
+tool-calling turns and final answers, so agents can be driven end-to-end
+without a provider.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+
+def tool_call(name: str, **args: Any) -> Dict[str, Any]:
+    """Return a tool call of the named tool with the given arguments, for use in a scripted turn."""
+    return {"name": name, "args": args}
+
+
+def scripted_turn(*calls: Dict[str, Any], content: str = "") -> AIMessage:
+    """Return a scripted response making the given tool calls.
+
+    Args:
+        *calls: Tool calls, as returned by tool_call
+        content: Text of the response
+
+    Returns:
+        Response message; without calls it ends the agent's run
+    """
+    return AIMessage(content=content, tool_calls=[{**call, "id": ""} for call in calls])
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers the n-th call with the n-th message of its script.
+
+    Tool call IDs are assigned on replay, so a script can be replayed by
+    several models. Token usage is reported as configured, or estimated from
+    the length of the prompt and the response.
+    """
+
+    script: List[AIMessage]
+    latency: float = 0.0
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    model_name: str = "scripted"
+
+    _position: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    @property
+    def calls(self) -> int:
+        """Number of responses given so far."""
+        return self._position
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any):
+        params = super()._get_ls_params(stop=stop, **kwargs)
+        params["ls_provider"] = "scripted"
+        return params
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+        # The script decides which tools are called
+        return self
+
+    def _next_response(self, messages: List[BaseMessage]) -> ChatResult:
+        with self._lock:
+            position = self._position
+            if position >= len(self.script):
+                raise RuntimeError(f"Scripted model called {position + 1} times, but its script has {len(self.script)} responses")
+            self._position += 1
+        scripted = self.script[position]
+        tool_calls = [{**call, "id": f"call_{position}_{index}"} for index, call in enumerate(scripted.tool_calls)]
+        input_tokens = self.input_tokens
+        if input_tokens is None:
+            input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = self.output_tokens
+        if output_tokens is None:
+            output_tokens = (len(str(scripted.content)) + len(json.dumps([call["args"] for call in tool_calls]))) // 4
+        message = AIMessage(
+            content=scripted.content,
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens
+            },
+            response_metadata={"model_name": self.model_name}
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._next_response(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._next_response(messages)
@@ -0,0 +1,62 @@
+"""Generator of large synthetic repositories.
+
+Creates a balanced tree of packages with source files spread evenly over its
+leaf directories, optionally staged in a git index, to benchmark tools that
+walk or search whole repositories at sizes real projects reach.
+"""
+
+import os
+from typing import List
+
+from git import Repo
+
+DEFAULT_SYNTHETIC_FILES = 100_000
+DEFAULT_SYNTHETIC_DEPTH = 4
+DEFAULT_SYNTHETIC_FANOUT = 10
+
+_EXTENSIONS = ('py', 'js', 'ts', 'md', 'json', 'go', 'rs', 'txt')
+
+
+def _leaf_directories(root: str, depth: int, fanout: int) -> List[str]:
+    directories = [root]
+    for level in range(depth):
+        directories = [
+            os.path.join(directory, f"{'pkg' if level == 0 else 'mod'}_{index}")
+            for directory in directories
+            for index in range(fanout)
+        ]
+    return directories
+
+
+def create_synthetic_repo(
+    root: str,
+    *,
+    files: int = DEFAULT_SYNTHETIC_FILES,
+    depth: int = DEFAULT_SYNTHETIC_DEPTH,
+    fanout: int = DEFAULT_SYNTHETIC_FANOUT,
+    git: bool = True
+) -> str:
+    """Write a repository of files spread over a directory tree.
+
+    Args:
+        root: Directory to create the repository in
+        files: Total number of files
+        depth: Depth of the directory tree below root
+        fanout: Subdirectories per directory
+        git: Whether to initialize a git repository and stage all files
+
+    Returns:
+        The repository's root directory
+    """
+    leaves = _leaf_directories(root, depth, fanout)
+    for directory in leaves:
+        os.makedirs(directory, exist_ok=True)
+    for index in range(files):
+        directory = leaves[index % len(leaves)]
+        extension = _EXTENSIONS[index % len(_EXTENSIONS)]
+        with open(os.path.join(directory, f"file_{index}.{extension}"), 'w', encoding='utf-8') as f:
+            f.write(f"# file {index}\nvalue_{index} = {index}\n")
+    if git:
+        repo = Repo.init(root)
+        repo.git.add('-A')
+    return root
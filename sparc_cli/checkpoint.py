@@ -0,0 +1,548 @@
+"""Disk-backed agent checkpoints for resumable sessions.
+
+Agent threads are checkpointed to a SQLite database in WAL mode under the
+project's .sparc directory, so readers never block the writer and a session
+survives crashes and interrupts. A session groups the threads of one sparc run
+and also stores a snapshot of global memory, written in the same transaction as
+every checkpoint so the two can be restored consistently with --resume.
+
+Checkpoints, pending writes and memory snapshots are stored zlib-compressed.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from sparc_cli.memory_store import MemoryStore
+from sparc_cli.session import current_session
+from sparc_cli.storage import ensure_sparc_dir
+
+CHECKPOINT_DB_NAME = 'checkpoints.db'
+
+# zlib level; checkpoints are mostly message text, which compresses well at modest levels
+COMPRESSION_LEVEL = 6
+
+# Session stages, in the order main runs them
+SESSION_STAGES = ('research', 'planning', 'done')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    base_task TEXT,
+    stage TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    memory_type TEXT,
+    memory BLOB
+);
+"""
+
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """Checkpoint saver storing compressed checkpoints in a SQLite WAL database.
+
+    Safe to share between threads: every thread reads through its own connection,
+    and writes are serialized. Other processes may read the database while it is
+    being written.
+    """
+
+    def __init__(self, path: str, *, serde: Optional[Any] = None):
+        """Open or create the checkpoint database.
+
+        Args:
+            path: Path of the SQLite database file
+            serde: Optional serializer, defaults to langgraph's serializer
+        """
+        super().__init__(serde=serde)
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.RLock()
+        # Memory snapshot saved alongside every checkpoint: (session_id, memory dict)
+        self._tracked: Optional[Tuple[str, Dict[str, Any]]] = None
+        self._last_memory: Optional[bytes] = None
+        # Version of the tracked MemoryStore when it was last saved
+        self._last_memory_version: Optional[int] = None
+        # executescript manages its own transaction
+        with self._lock:
+            self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        with self._lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def close(self) -> None:
+        """Close every connection opened by this checkpointer."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        return type_, zlib.compress(data, COMPRESSION_LEVEL)
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        return self.serde.loads_typed((type_, zlib.decompress(data)))
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get the checkpoint named in config, or the latest checkpoint of its thread.
+
+        Args:
+            config: Config holding a thread ID and optionally a checkpoint ID
+
+        Returns:
+            The checkpoint tuple, or None if the thread has no matching checkpoint
+        """
+        configurable = {'checkpoint_ns': '', **config['configurable']}
+        return next(self.list({**config, 'configurable': configurable}, limit=1), None)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints, newest first.
+
+        Args:
+            config: Config restricting the thread, namespace and checkpoint ID
+            filter: Metadata values the checkpoints must match
+            before: Only list checkpoints created before this checkpoint
+            limit: Maximum number of checkpoints to return
+
+        Yields:
+            Matching checkpoint tuples
+        """
+        clauses = []
+        params: List[Any] = []
+        if config:
+            configurable = config['configurable']
+            clauses.append('thread_id = ?')
+            params.append(configurable['thread_id'])
+            if configurable.get('checkpoint_ns') is not None:
+                clauses.append('checkpoint_ns = ?')
+                params.append(configurable['checkpoint_ns'])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append('checkpoint_id = ?')
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append('checkpoint_id < ?')
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        # Metadata filters are applied after decoding, so the limit cannot go into SQL
+        sql_limit = f'LIMIT {int(limit)}' if limit is not None and not filter else ''
+
+        rows = self._connection().execute(
+            f"""SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint,
+                      metadata_type, metadata
+                FROM checkpoints {where} ORDER BY checkpoint_id DESC {sql_limit}""",
+            params
+        ).fetchall()
+
+        for thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata in rows:
+            if limit is not None and limit <= 0:
+                break
+            metadata = self._load(metadata_type, metadata)
+            if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+
+            writes = self._connection().execute(
+                """SELECT task_id, channel, type, value FROM writes
+                   WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+                   ORDER BY task_id, idx""",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchall()
+
+            yield CheckpointTuple(
+                config={
+                    'configurable': {
+                        'thread_id': thread_id,
+                        'checkpoint_ns': checkpoint_ns,
+                        'checkpoint_id': checkpoint_id,
+                    }
+                },
+                checkpoint=self._load(type_, checkpoint),
+                metadata=metadata,
+                parent_config=(
+                    {
+                        'configurable': {
+                            'thread_id': thread_id,
+                            'checkpoint_ns': checkpoint_ns,
+                            'checkpoint_id': parent_id,
+                        }
+                    }
+                    if parent_id
+                    else None
+                ),
+                pending_writes=[
+                    (task_id, channel, self._load(value_type, value))
+                    for task_id, channel, value_type, value in writes
+                ],
+            )
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        """Save a checkpoint, together with the tracked memory snapshot if any.
+
+        Args:
+            config: Config of the parent checkpoint
+            checkpoint: Checkpoint to save
+            metadata: Checkpoint metadata
+            new_versions: Channel versions written by this checkpoint
+
+        Returns:
+            Config pointing at the saved checkpoint
+        """
+        configurable = config['configurable']
+        thread_id = configurable['thread_id']
+        checkpoint_ns = configurable.get('checkpoint_ns', '')
+        type_, data = self._dump(checkpoint)
+        metadata_type, metadata_data = self._dump(get_checkpoint_metadata(config, metadata))
+        memory = self._dump_tracked_memory()
+
+        with self._transaction() as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO checkpoints
+                   (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                    type, checkpoint, metadata_type, metadata)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (thread_id, checkpoint_ns, checkpoint['id'], configurable.get('checkpoint_id'),
+                 type_, data, metadata_type, metadata_data)
+            )
+            if memory:
+                self._write_memory(conn, *memory)
+
+        return {
+            'configurable': {
+                'thread_id': thread_id,
+                'checkpoint_ns': checkpoint_ns,
+                'checkpoint_id': checkpoint['id'],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ''
+    ) -> None:
+        """Save the pending writes of a task for the checkpoint in config.
+
+        Args:
+            config: Config of the checkpoint the writes belong to
+            writes: (channel, value) pairs
+            task_id: Task that produced the writes
+            task_path: Path of the task
+        """
+        configurable = config['configurable']
+        # Special channels overwrite their previous value, regular writes are kept once
+        verb = 'INSERT OR REPLACE' if all(channel in WRITES_IDX_MAP for channel, _ in writes) else 'INSERT OR IGNORE'
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dump(value)
+            rows.append((
+                configurable['thread_id'],
+                configurable.get('checkpoint_ns', ''),
+                configurable['checkpoint_id'],
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                type_,
+                data,
+                task_path,
+            ))
+        with self._transaction() as conn:
+            conn.executemany(
+                f"""{verb} INTO writes
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and write of a thread."""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM checkpoints WHERE thread_id = ?', (thread_id,))
+            conn.execute('DELETE FROM writes WHERE thread_id = ?', (thread_id,))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ''
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    def create_session(self, session_id: str, base_task: str) -> None:
+        """Record a new session, starting at the research stage."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """INSERT INTO sessions (session_id, base_task, stage, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (session_id, base_task, SESSION_STAGES[0], now, now)
+            )
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Load a session.
+
+        Args:
+            session_id: Session to load
+
+        Returns:
+            Dict with base_task, stage, created_at, updated_at and the memory snapshot
+            (None if none was saved), or None if the session does not exist
+        """
+        row = self._connection().execute(
+            """SELECT base_task, stage, created_at, updated_at, memory_type, memory
+               FROM sessions WHERE session_id = ?""",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        base_task, stage, created_at, updated_at, memory_type, memory = row
+        return {
+            'session_id': session_id,
+            'base_task': base_task,
+            'stage': stage,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'memory': self._load(memory_type, memory) if memory is not None else None,
+        }
+
+    def set_session_stage(self, session_id: str, stage: str) -> None:
+        """Record the stage a session is at, saving the tracked memory with it."""
+        memory = self._dump_tracked_memory(force=True)
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE sessions SET stage = ?, updated_at = ? WHERE session_id = ?',
+                (stage, time.time(), session_id)
+            )
+            if memory:
+                self._write_memory(conn, *memory)
+
+    def track_memory(self, session_id: str, memory: Dict[str, Any]) -> None:
+        """Save a snapshot of memory with every checkpoint written from now on.
+
+        Args:
+            session_id: Session the snapshots belong to
+            memory: Live memory dict to snapshot
+        """
+        self._tracked = (session_id, memory)
+        self._last_memory = None
+        self._last_memory_version = None
+
+    def save_memory(self) -> None:
+        """Save the tracked memory snapshot now, if memory changed since it was last saved."""
+        memory = self._dump_tracked_memory()
+        if memory:
+            with self._transaction() as conn:
+                self._write_memory(conn, *memory)
+
+    def _dump_tracked_memory(self, force: bool = False) -> Optional[Tuple[str, str, bytes]]:
+        if self._tracked is None:
+            return None
+        session_id, memory = self._tracked
+        # A MemoryStore counts its changes, so an unchanged one is not serialized again
+        version = memory.version if isinstance(memory, MemoryStore) else None
+        if version is not None and version == self._last_memory_version and not force:
+            return None
+        # Tools running in other threads may mutate memory while it is copied
+        for _ in range(3):
+            try:
+                # Global memory is a MemoryStore, whose records the serializer does not know
+                snapshot = memory.to_dict() if isinstance(memory, MemoryStore) else dict(memory)
+                type_, data = self._dump(snapshot)
+                break
+            except RuntimeError:
+                continue
+        else:
+            return None
+        # The version from before the copy, so changes made while copying are saved the next time
+        self._last_memory_version = version
+        if data == self._last_memory and not force:
+            return None
+        self._last_memory = data
+        return session_id, type_, data
+
+    def _write_memory(self, conn: sqlite3.Connection, session_id: str, type_: str, data: bytes) -> None:
+        conn.execute(
+            'UPDATE sessions SET memory_type = ?, memory = ?, updated_at = ? WHERE session_id = ?',
+            (type_, data, time.time(), session_id)
+        )
+
+
+def open_checkpointer(root: str = '.') -> SqliteCheckpointer:
+    """Open the checkpoint database of the project at root."""
+    return SqliteCheckpointer(os.path.join(ensure_sparc_dir(root), CHECKPOINT_DB_NAME))
+
+
+# Checkpointer and ID of the session this process is running, if any
+_active_session: Optional[Tuple[SqliteCheckpointer, str]] = None
+
+
+def activate_session(checkpointer: SqliteCheckpointer, session_id: str) -> None:
+    """Make agents of this process checkpoint into a session and snapshot global memory.
+
+    Args:
+        checkpointer: Checkpointer of the session
+        session_id: Session ID
+    """
+    global _active_session
+    _active_session = (checkpointer, session_id)
+    # The current session's memory itself, which snapshots may be taken of from other contexts
+    checkpointer.track_memory(session_id, current_session().memory)
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """Return the active session's checkpointer, or a fresh in-memory one."""
+    if _active_session is not None:
+        return _active_session[0]
+    return MemorySaver()
+
+
+def session_thread_id(kind: str, key: Optional[str] = None) -> str:
+    """Return a thread ID for an agent run.
+
+    Within a session, IDs are derived from the agent kind and its input, so a resumed
+    session finds the threads of the interrupted run again. Once a run on a thread has
+    finished, later runs with the same input get a thread of their own, numbered
+    ':run-N', rather than continuing the finished conversation. Outside a session every
+    run gets a fresh ID.
+
+    Args:
+        kind: Kind of agent, such as 'research' or 'task'
+        key: Input distinguishing runs of the same kind, such as the query
+
+    Returns:
+        Thread ID
+    """
+    if _active_session is None:
+        return str(uuid.uuid4())
+    thread_id = f"{_active_session[1]}:{kind}"
+    if key is not None:
+        thread_id += ':' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    finished = current_session().memory.get('finished_threads', ())
+    candidate, run = thread_id, 1
+    while candidate in finished:
+        run += 1
+        candidate = f"{thread_id}:run-{run}"
+    return candidate
+
+
+def finish_session_thread(thread_id: Optional[str]) -> None:
+    """Record that an agent run on a session thread completed.
+
+    Kept in the memory of the session, which is saved right away, so that a
+    resumed session also knows the thread is finished.
+
+    Args:
+        thread_id: Thread the run used, as returned by session_thread_id
+    """
+    if _active_session is None or thread_id is None:
+        return
+    memory = current_session().memory
+    finished = memory.get('finished_threads', [])
+    if thread_id not in finished:
+        memory['finished_threads'] = [*finished, thread_id]
+        _active_session[0].save_memory()
@@ -1 +1,32 @@
-"""Configuration utilities."""
+"""Configuration utilities.
+
+Defaults of the command line options live here rather than in the modules
+using them, so that the argument parser can be built, and `sparc --help`
+answered, without importing langchain, the provider SDKs or the tools.
+"""
+
+# How agent output is shown: complete messages as Markdown panels, tokens streamed
+# live with the Markdown rendered once per message, or tokens as plain text
+OUTPUT_MODES = ('panels', 'stream', 'plain')
+
+DEFAULT_HTTP_MAX_CONNECTIONS = 20
+
+DEFAULT_CACHE_MAX_MB = 512
+
+DEFAULT_MAX_PARALLEL_TASKS = 4
+
+DEFAULT_MAX_PARALLEL_RESEARCH = 4
+
+DEFAULT_MAX_TOOL_CONCURRENCY = 4
+
+DEFAULT_BATCH_WORKERS = 4
+
+DEFAULT_SERVER_PORT = 8080
+
+DEFAULT_SERVER_WORKERS = 2
+
+# Memory entries included in a prompt, ranked by relevance to its task, and
+# their token budget per memory section
+DEFAULT_MEMORY_TOP_K = 20
+
+DEFAULT_MEMORY_MAX_TOKENS = 8000
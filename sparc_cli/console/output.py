@@ -1,8 +1,13 @@
-from typing import Any, Dict
+import sys
+from typing import Any, Dict, List, Optional, Union
 from rich.console import Console
+from rich.live import Live
 from rich.panel import Panel
 from rich.markdown import Markdown
-from langchain_core.messages import AIMessage
+from rich.text import Text
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from sparc_cli.config import OUTPUT_MODES
 
 # Import shared console instance
 from .formatting import console
@@ -28,4 +33,110 @@ def print_agent_output(chunk: Dict[str, Any]) -> None:
     elif 'tools' in chunk and 'messages' in chunk['tools']:
         for msg in chunk['tools']['messages']:
             if msg.status == 'error' and msg.content:
-                console.print(Panel(Markdown(msg.content.strip()), title="❌ Tool Error", border_style="red bold"))
\ No newline at end of file
+                console.print(Panel(Markdown(msg.content.strip()), title="❌ Tool Error", border_style="red bold"))
+
+def message_text(content: Union[str, List[Any]]) -> str:
+    """Return the text of message content, skipping tool use and other non-text blocks."""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get('text', '') for block in content
+        if isinstance(block, dict) and block.get('type') == 'text'
+    )
+
+class AgentOutputRenderer:
+    """Renders the stream of one agent run in one of OUTPUT_MODES.
+
+    In the streaming modes, the agent's tokens are shown as they arrive. 'stream'
+    shows them as plain text in a live panel, which is replaced by the message
+    rendered as Markdown once it is complete. 'plain' writes them straight to
+    stdout without any Rich rendering, for headless runs.
+    """
+
+    def __init__(self, mode: str = 'panels', output=None):
+        """Create a renderer.
+
+        Args:
+            mode: One of OUTPUT_MODES
+            output: Stream written to in plain mode, defaults to stdout
+        """
+        self.mode = mode
+        self.output = output
+        self._text = ""
+        self._live: Optional[Live] = None
+
+    @property
+    def streams_tokens(self) -> bool:
+        return self.mode != 'panels'
+
+    @property
+    def stream_mode(self) -> Union[str, List[str]]:
+        """The stream_mode to pass to the agent's stream."""
+        return ["messages", "updates"] if self.streams_tokens else "updates"
+
+    def render(self, item: Any) -> None:
+        """Render one item yielded by the agent's stream."""
+        if not self.streams_tokens:
+            print_agent_output(item)
+            return
+        kind, data = item
+        if kind == "messages":
+            message, metadata = data
+            if isinstance(message, (AIMessage, AIMessageChunk)) and metadata.get('langgraph_node') == 'agent':
+                self._on_token(message_text(message.content))
+        elif 'agent' in data:
+            self._finish_message(data['agent'].get('messages', []))
+        elif 'tools' in data:
+            for msg in data['tools'].get('messages', []):
+                if msg.status == 'error' and msg.content:
+                    self._print_error(msg.content.strip())
+
+    def close(self) -> None:
+        """Stop live output left over from an interrupted run."""
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+        if self._text and self.mode == 'plain':
+            self._write("\n")
+        self._text = ""
+
+    def _write(self, text: str) -> None:
+        output = self.output or sys.stdout
+        output.write(text)
+        output.flush()
+
+    def _on_token(self, text: str) -> None:
+        if not text:
+            return
+        self._text += text
+        if self.mode == 'plain':
+            self._write(text)
+            return
+        if self._live is None:
+            self._live = Live(console=console, transient=True, refresh_per_second=8, auto_refresh=True)
+            self._live.start()
+        # Only the tail fits on screen; rendering it alone keeps long answers cheap
+        height = max(1, console.height - 4)
+        lines = self._text[-height * console.width:].splitlines()[-height:]
+        self._live.update(Panel(Text("\n".join(lines)), title="🤖 Assistant"))
+
+    def _finish_message(self, messages: List[Any]) -> None:
+        streamed = self._text
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+        self._text = ""
+        text = "".join(message_text(msg.content) for msg in messages if isinstance(msg, AIMessage)).strip()
+        if self.mode == 'plain':
+            if streamed:
+                self._write("\n")
+            elif text:
+                self._write(text + "\n")
+        elif text:
+            console.print(Panel(Markdown(text), title="🤖 Assistant"))
+
+    def _print_error(self, text: str) -> None:
+        if self.mode == 'plain':
+            self._write(f"Tool error: {text}\n")
+        else:
+            console.print(Panel(Markdown(text), title="❌ Tool Error", border_style="red bold"))
@@ -0,0 +1,299 @@
+"""Ledger of the tokens used and their cost.
+
+Every model response is recorded with its input, output and cached tokens and
+its cost, priced per provider and model. Each record is attributed to a scope:
+the stage it ran in, followed by the tools that spawned the sub-agents or
+called the expert model it ran under, e.g. 'research > request_research >
+ask_expert'. The ledger is summarized per stage, scope and model at exit.
+
+Responses replayed from the response cache are counted, but not billed.
+"""
+
+import contextvars
+import json
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from rich.console import Console
+from rich.table import Table
+
+# USD per million tokens: (input, output, cache read, cache write), by model name prefix
+MODEL_PRICES: Dict[str, Tuple[float, float, float, float]] = {
+    'claude-3-5-sonnet': (3.0, 15.0, 0.30, 3.75),
+    'claude-3-5-haiku': (0.80, 4.0, 0.08, 1.0),
+    'claude-3-opus': (15.0, 75.0, 1.50, 18.75),
+    'claude-3-sonnet': (3.0, 15.0, 0.30, 3.75),
+    'claude-3-haiku': (0.25, 1.25, 0.03, 0.30),
+    'gpt-4o-mini': (0.15, 0.60, 0.075, 0.15),
+    'gpt-4o': (2.50, 10.0, 1.25, 2.50),
+    'gpt-4-turbo': (10.0, 30.0, 10.0, 10.0),
+    'o1-mini': (3.0, 12.0, 1.50, 3.0),
+    'o1-preview': (15.0, 60.0, 7.50, 15.0),
+    'o1': (15.0, 60.0, 7.50, 15.0),
+}
+
+SCOPE_SEPARATOR = ' > '
+
+# Stage and tools the code running in the current context is attributed to
+_scope: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar('sparc_usage_scope', default=())
+
+console = Console()
+
+
+def model_price(model: str) -> Optional[Tuple[float, float, float, float]]:
+    """Return the prices of a model, matching the longest known prefix of its name.
+
+    Vendor prefixes such as 'anthropic/' in OpenRouter model names are ignored.
+    """
+    name = model.rsplit('/', 1)[-1].replace('.', '-').lower()
+    matches = [prefix for prefix in MODEL_PRICES if name.startswith(prefix)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def response_usage(response: Any) -> Dict[str, int]:
+    """Sum the token usage reported in an LLM result.
+
+    Returns:
+        Input, output, cache read and cache write tokens, and the number of
+        generations that were replayed from a cache
+    """
+    usage = {'input_tokens': 0, 'output_tokens': 0, 'cache_read_tokens': 0, 'cache_write_tokens': 0, 'replayed': 0}
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+            if not metadata:
+                continue
+            # Langchain zeroes the cost of responses it takes from a cache
+            if metadata.get('total_cost') == 0:
+                usage['replayed'] += 1
+                continue
+            details = metadata.get('input_token_details') or {}
+            usage['input_tokens'] += metadata.get('input_tokens', 0)
+            usage['output_tokens'] += metadata.get('output_tokens', 0)
+            usage['cache_read_tokens'] += details.get('cache_read', 0) or 0
+            usage['cache_write_tokens'] += details.get('cache_creation', 0) or 0
+    return usage
+
+
+@dataclass
+class UsageEntry:
+    """Usage of one model call."""
+    scope: Tuple[str, ...]
+    provider: str
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    replayed: bool = False
+    cost: Optional[float] = None
+
+    @property
+    def stage(self) -> str:
+        return self.scope[0] if self.scope else 'other'
+
+
+def usage_cost(model: str, input_tokens: int, output_tokens: int, cache_read_tokens: int = 0,
+               cache_write_tokens: int = 0) -> Optional[float]:
+    """Return the cost of a call in USD, or None if the model's prices are unknown.
+
+    Input tokens include the cache reads and writes, which are priced separately.
+    """
+    prices = model_price(model)
+    if prices is None:
+        return None
+    input_price, output_price, cache_read_price, cache_write_price = prices
+    uncached = max(0, input_tokens - cache_read_tokens - cache_write_tokens)
+    return (uncached * input_price + output_tokens * output_price + cache_read_tokens * cache_read_price
+            + cache_write_tokens * cache_write_price) / 1_000_000
+
+
+def _totals(entries: Iterable[UsageEntry]) -> Dict[str, Any]:
+    totals = {'calls': 0, 'replayed_calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'cache_read_tokens': 0,
+              'cache_write_tokens': 0, 'cost_usd': 0.0, 'unpriced_calls': 0}
+    for entry in entries:
+        if entry.replayed:
+            totals['replayed_calls'] += 1
+            continue
+        totals['calls'] += 1
+        totals['input_tokens'] += entry.input_tokens
+        totals['output_tokens'] += entry.output_tokens
+        totals['cache_read_tokens'] += entry.cache_read_tokens
+        totals['cache_write_tokens'] += entry.cache_write_tokens
+        if entry.cost is None:
+            totals['unpriced_calls'] += 1
+        else:
+            totals['cost_usd'] += entry.cost
+    return totals
+
+
+def _group(entries: List[UsageEntry], key) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[str, List[UsageEntry]] = {}
+    for entry in entries:
+        groups.setdefault(key(entry), []).append(entry)
+    return {name: _totals(group) for name, group in sorted(groups.items())}
+
+
+class UsageLedger:
+    """Thread-safe record of the usage of every model call in the process."""
+
+    def __init__(self):
+        self._entries: List[UsageEntry] = []
+        self._lock = threading.Lock()
+
+    @property
+    def entries(self) -> List[UsageEntry]:
+        with self._lock:
+            return list(self._entries)
+
+    def record(self, provider: str, model: str, usage: Dict[str, int],
+               scope: Optional[Tuple[str, ...]] = None) -> None:
+        """Record the usage of a model call.
+
+        Args:
+            provider: Provider the call was sent to
+            model: Name of the model
+            usage: Token counts as returned by response_usage
+            scope: Scope to attribute the call to, defaults to the current scope
+        """
+        scope = _scope.get() if scope is None else scope
+        entries = [UsageEntry(scope, provider, model, replayed=True) for _ in range(usage.get('replayed', 0))]
+        tokens = {name: usage.get(name, 0) for name in
+                  ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens')}
+        if any(tokens.values()) or not entries:
+            entries.append(UsageEntry(scope, provider, model, cost=usage_cost(model, **tokens), **tokens))
+        with self._lock:
+            self._entries.extend(entries)
+
+    def merge(self, entries: Iterable[UsageEntry]) -> None:
+        """Add entries recorded by another process, such as a parallel research or task worker."""
+        with self._lock:
+            self._entries.extend(entries)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the totals overall and per stage, scope and model."""
+        entries = self.entries
+        return {
+            'total': _totals(entries),
+            'by_stage': _group(entries, lambda entry: entry.stage),
+            'by_scope': _group(entries, lambda entry: SCOPE_SEPARATOR.join(entry.scope) or 'other'),
+            'by_model': _group(entries, lambda entry: f"{entry.provider}/{entry.model}"),
+        }
+
+    def write_json(self, path: str) -> None:
+        """Write the summary and all entries to path as JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({**self.summary(), 'entries': [asdict(entry) for entry in self.entries]}, f, indent=2)
+
+
+_ledger = UsageLedger()
+
+
+def get_ledger() -> UsageLedger:
+    """Return the ledger shared by all agents of the process."""
+    return _ledger
+
+
+def current_scope() -> Tuple[str, ...]:
+    """Return the scope model calls made now are attributed to."""
+    return _scope.get()
+
+
+@contextmanager
+def usage_scope(name: str) -> Iterator[Tuple[str, ...]]:
+    """Attribute the model calls made within the block, or decorated function, to a nested scope.
+
+    Args:
+        name: Name of the stage or tool, appended to the current scope
+    """
+    token = _scope.set(_scope.get() + (name,))
+    try:
+        yield _scope.get()
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def stage_scope(name: str) -> Iterator[Tuple[str, ...]]:
+    """Attribute the model calls made within the block to a stage, unless already attributed."""
+    if _scope.get():
+        yield _scope.get()
+        return
+    with usage_scope(name) as scope:
+        yield scope
+
+
+@contextmanager
+def restored_scope(scope: Tuple[str, ...]) -> Iterator[Tuple[str, ...]]:
+    """Attribute the model calls made within the block to a scope carried over from another process."""
+    token = _scope.set(tuple(scope))
+    try:
+        yield _scope.get()
+    finally:
+        _scope.reset(token)
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Records the usage of a model's calls in the process's ledger."""
+
+    def __init__(self, provider: str, model: str):
+        """Create a handler for a model.
+
+        Args:
+            provider: Provider the model's calls are sent to
+            model: Name of the model
+        """
+        self.provider = provider
+        self.model = model
+        self._scopes: Dict[UUID, Tuple[str, ...]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._scopes[run_id] = _scope.get()
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        get_ledger().record(self.provider, self.model, response_usage(response), self._scopes.pop(run_id, None))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._scopes.pop(run_id, None)
+
+
+def _format_cost(totals: Dict[str, Any]) -> str:
+    cost = f"${totals['cost_usd']:.4f}"
+    return f"{cost}+" if totals['unpriced_calls'] else cost
+
+
+def print_usage_report(ledger: Optional[UsageLedger] = None) -> None:
+    """Print tokens and cost per stage and scope, and per model, if any model was called.
+
+    Costs followed by '+' exclude calls to models without known prices.
+
+    Args:
+        ledger: Ledger to report, defaults to the process's ledger
+    """
+    ledger = get_ledger() if ledger is None else ledger
+    summary = ledger.summary()
+    if not summary['total']['calls'] + summary['total']['replayed_calls']:
+        return
+
+    def add_row(table: Table, name: str, totals: Dict[str, Any], **kwargs: Any) -> None:
+        table.add_row(name, str(totals['calls']), str(totals['replayed_calls']), f"{totals['input_tokens']:,}",
+                      f"{totals['cache_read_tokens']:,}", f"{totals['output_tokens']:,}", _format_cost(totals), **kwargs)
+
+    for title, first_column, rows in (("LLM Usage", "Stage / scope", 'by_stage'), ("LLM Usage by Model", "Model", 'by_model')):
+        table = Table(title=title)
+        table.add_column(first_column)
+        for column in ("Calls", "Replayed", "Input", "Cached", "Output", "Cost"):
+            table.add_column(column, justify="right")
+        for name, totals in summary[rows].items():
+            add_row(table, name, totals, style="bold" if rows == 'by_stage' else None)
+            if rows == 'by_stage':
+                # The stage's sub-agents and expert calls
+                for scope, scope_totals in summary['by_scope'].items():
+                    if scope.startswith(name + SCOPE_SEPARATOR):
+                        add_row(table, "  " + scope[len(name + SCOPE_SEPARATOR):], scope_totals)
+        add_row(table, "total", summary['total'], style="bold")
+        console.print(table)
@@ -1,8 +1,118 @@
+import importlib.util
 import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import anthropic
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_core.language_models import BaseChatModel
 
+from sparc_cli.config import DEFAULT_HTTP_MAX_CONNECTIONS
+from sparc_cli.ledger import UsageCallbackHandler
+from sparc_cli.rate_limit import ConnectionFailureCallbackHandler, HostRateLimiter, get_rate_limiter
+
+# Idle connections are kept open this long, in seconds, so consecutive agent calls skip the TLS handshake
+HTTP_KEEPALIVE_EXPIRY = 120.0
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+_http_limits = httpx.Limits(
+    max_connections=DEFAULT_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=DEFAULT_HTTP_MAX_CONNECTIONS,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+)
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_http_client_lock = threading.Lock()
+
+# Models shared by all agents of the process, keyed by role, provider, model and base URL
+_model_registry: Dict[Tuple[str, str, str, Optional[str]], BaseChatModel] = {}
+_model_registry_lock = threading.Lock()
+
+def configure_http_pool(max_connections: int = DEFAULT_HTTP_MAX_CONNECTIONS) -> None:
+    """Set the connection limits of the shared HTTP pools, sync and async.
+
+    Must be called before the first model client is created to take effect.
+
+    Args:
+        max_connections: Maximum number of concurrent connections to LLM providers
+    """
+    global _http_limits
+    _http_limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+
+def _observe_rate_limits(response: httpx.Response) -> None:
+    host = response.request.url.host
+    get_rate_limiter().update_from_headers(host, response.headers)
+    get_rate_limiter().record_response(host, response.status_code)
+
+async def _aobserve_rate_limits(response: httpx.Response) -> None:
+    _observe_rate_limits(response)
+
+def _http_client_options() -> Dict[str, Any]:
+    return {
+        "limits": _http_limits,
+        "http2": importlib.util.find_spec("h2") is not None,
+        "timeout": httpx.Timeout(600.0, connect=10.0),
+        "follow_redirects": True,
+    }
+
+def get_http_client() -> httpx.Client:
+    """Return the keep-alive HTTP client shared by all model clients of the process.
+
+    HTTP/2 is used when the h2 package is installed, multiplexing concurrent agent
+    calls over a single connection per provider. The rate limit headers and status
+    of every response are fed to the process-wide rate limit scheduler.
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(**_http_client_options(), event_hooks={"response": [_observe_rate_limits]})
+        return _http_client
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the async counterpart of get_http_client, used by agents run with --async-agents.
+
+    It has the same connection limits and feeds the rate limit scheduler the same
+    way. Its connections belong to the event loop they were opened on, which is the
+    shared agent loop of sparc_cli.agent_utils.
+    """
+    global _async_http_client
+    with _http_client_lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(
+                **_http_client_options(), event_hooks={"response": [_aobserve_rate_limits]}
+            )
+        return _async_http_client
+
+# Providers that only cache prompt prefixes marked with cache_control. OpenAI caches
+# long stable prefixes automatically, so its content is sent as plain text.
+CACHE_CONTROL_PROVIDERS = ('anthropic', 'openrouter')
+
+def cacheable_prompt_content(prefix: str, body: str, provider: Optional[str]) -> Union[str, List[Dict[str, Any]]]:
+    """Build message content whose static prefix can be cached by the provider.
+
+    Args:
+        prefix: Static instructions shared by many requests
+        body: Request-specific remainder of the prompt
+        provider: The LLM provider the message is sent to
+
+    Returns:
+        Content blocks with a cache_control marker after the prefix for providers that
+        need one, otherwise the plain prompt text
+    """
+    if not prefix or provider not in CACHE_CONTROL_PROVIDERS:
+        return prefix + body
+    return [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": body},
+    ]
+
 def initialize_llm(provider: str, model_name: str) -> BaseChatModel:
     """Initialize a language model client based on the specified provider and model.
 
@@ -23,6 +133,10 @@ def initialize_llm(provider: str, model_name: str) -> BaseChatModel:
         return ChatOpenAI(
             api_key=os.getenv("OPENAI_API_KEY"),
             model=model_name,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            # A custom http_client turns off langchain_openai's usage reporting when streaming
+            stream_usage=True,
         )
     elif provider == "anthropic":
         return ChatAnthropic(
@@ -32,14 +146,22 @@ def initialize_llm(provider: str, model_name: str) -> BaseChatModel:
     elif provider == "openrouter":
         return ChatOpenAI(
             api_key=os.getenv("OPENROUTER_API_KEY"),
-            base_url="https://openrouter.ai/api/v1",
+            base_url=OPENROUTER_BASE_URL,
             model=model_name,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            # A custom http_client turns off langchain_openai's usage reporting when streaming
+            stream_usage=True,
         )
     elif provider == "openai-compatible":
         return ChatOpenAI(
             api_key=os.getenv("OPENAI_API_KEY"),
             base_url=os.getenv("OPENAI_API_BASE"),
             model=model_name,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            # A custom http_client turns off langchain_openai's usage reporting when streaming
+            stream_usage=True,
         )
     else:
         raise ValueError(f"Unsupported provider: {provider}")
@@ -65,6 +187,10 @@ def initialize_expert_llm(provider: str = "openai", model_name: str = "o1-previe
         return ChatOpenAI(
             api_key=os.getenv("EXPERT_OPENAI_API_KEY"),
             model=model_name,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            # A custom http_client turns off langchain_openai's usage reporting when streaming
+            stream_usage=True,
         )
     elif provider == "anthropic":
         return ChatAnthropic(
@@ -74,14 +200,107 @@ def initialize_expert_llm(provider: str = "openai", model_name: str = "o1-previe
     elif provider == "openrouter":
         return ChatOpenAI(
             api_key=os.getenv("EXPERT_OPENROUTER_API_KEY"),
-            base_url="https://openrouter.ai/api/v1",
+            base_url=OPENROUTER_BASE_URL,
             model=model_name,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            # A custom http_client turns off langchain_openai's usage reporting when streaming
+            stream_usage=True,
         )
     elif provider == "openai-compatible":
         return ChatOpenAI(
             api_key=os.getenv("EXPERT_OPENAI_API_KEY"),
             base_url=os.getenv("EXPERT_OPENAI_API_BASE"),
             model=model_name,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            # A custom http_client turns off langchain_openai's usage reporting when streaming
+            stream_usage=True,
         )
     else:
         raise ValueError(f"Unsupported provider: {provider}")
+
+def _provider_base_url(provider: str, expert: bool = False) -> Optional[str]:
+    """Return the base URL a provider's client connects to, None for the SDK default."""
+    if provider == "openrouter":
+        return OPENROUTER_BASE_URL
+    if provider == "openai-compatible":
+        return os.getenv("EXPERT_OPENAI_API_BASE" if expert else "OPENAI_API_BASE")
+    return None
+
+def get_llm(provider: str, model_name: str, *, expert: bool = False) -> BaseChatModel:
+    """Return the process-wide model client for a provider and model, creating it once.
+
+    Sub-agents share these clients instead of each initializing its own, so they reuse
+    the same SDK client and the shared keep-alive connection pool. Their calls are
+    admitted by the process-wide rate limit scheduler and their usage is recorded in
+    the process-wide ledger.
+
+    Args:
+        provider: The LLM provider to use
+        model_name: Name of the model to use
+        expert: Whether to use the expert credentials and endpoints
+
+    Returns:
+        BaseChatModel: Shared language model client
+
+    Raises:
+        ValueError: If the provider is not supported
+    """
+    key = ("expert" if expert else "agent", provider, model_name, _provider_base_url(provider, expert))
+    with _model_registry_lock:
+        model = _model_registry.get(key)
+        if model is None:
+            model = (initialize_expert_llm if expert else initialize_llm)(provider, model_name)
+            if isinstance(model, ChatAnthropic):
+                _share_anthropic_clients(model)
+            base_url = _model_base_url(model)
+            callbacks = [UsageCallbackHandler(provider, model_name)]
+            if base_url:
+                host = httpx.URL(base_url).host
+                # Applied after the response cache, so cache hits are not rate limited
+                model.rate_limiter = HostRateLimiter(host)
+                callbacks.insert(0, ConnectionFailureCallbackHandler(host))
+            model.callbacks = callbacks
+            _model_registry[key] = model
+        return model
+
+def _share_anthropic_clients(model: ChatAnthropic) -> None:
+    """Make a ChatAnthropic model send its requests through the shared connection pools.
+
+    ChatAnthropic takes no HTTP client and creates its SDK clients lazily in the
+    cached properties _client and _async_client, so they are set up front.
+    test_llm checks that the model uses them, in case langchain_anthropic changes.
+    """
+    model.__dict__["_client"] = anthropic.Client(**model._client_params, http_client=get_http_client())
+    model.__dict__["_async_client"] = anthropic.AsyncClient(
+        **model._client_params, http_client=get_async_http_client()
+    )
+
+def _model_base_url(model: BaseChatModel) -> Optional[str]:
+    if isinstance(model, ChatAnthropic):
+        return model.anthropic_api_url
+    if isinstance(model, ChatOpenAI):
+        return model.openai_api_base or "https://api.openai.com/v1"
+    return None
+
+def warm_connections(*models: BaseChatModel) -> None:
+    """Open pooled connections to the models' endpoints in the background.
+
+    The TLS handshake then happens while the first prompt is being built, not on the
+    first model call. Failures are ignored; the first real request reconnects.
+
+    Args:
+        *models: Models whose endpoints to connect to
+    """
+    client = get_http_client()
+
+    def connect(url: str) -> None:
+        try:
+            client.head(url, timeout=10.0)
+        except httpx.HTTPError:
+            pass
+
+    for url in {_model_base_url(model) for model in models} - {None}:
+        threading.Thread(target=connect, args=(url,), daemon=True).start()
+
@@ -0,0 +1,264 @@
+"""Content-addressed cache of LLM responses.
+
+Responses are stored in a SQLite database under the project's .sparc directory,
+keyed by a hash of the model's serialized settings (provider, model name and
+parameters), the bound tool schemas and the prompt messages. Re-running a task on
+an unchanged repository replays identical calls from disk instead of billing and
+waiting for them again. The store is bounded in size by evicting the least
+recently used responses, and entries can optionally expire after a TTL.
+
+Caching is opt-in and enabled per stage through the run configuration.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps, loads
+from rich.console import Console
+from rich.table import Table
+
+from sparc_cli.config import DEFAULT_CACHE_MAX_MB
+from sparc_cli.storage import ensure_sparc_dir
+from sparc_cli.tools.memory import _global_memory
+
+CACHE_DB_NAME = 'llm_cache.db'
+
+# Stages caching can be enabled for
+CACHE_STAGES = ('research', 'planning', 'implementation', 'expert')
+
+# Eviction trims the store to this fraction of its size bound, so that it does
+# not run again on the very next insert
+EVICTION_TARGET_RATIO = 0.9
+
+# Message fields that vary between otherwise identical calls and are never sent
+# to the provider
+_VOLATILE_MESSAGE_FIELDS = ('id', 'response_metadata', 'usage_metadata')
+
+console = Console()
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Hash a serialized prompt and model description into a cache key.
+
+    Message IDs and response metadata are left out, since they differ between
+    runs of the same conversation.
+
+    Args:
+        prompt: Messages serialized by langchain
+        llm_string: Model settings and call options serialized by langchain
+
+    Returns:
+        Hex digest identifying the call
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        normalized = prompt
+    else:
+        for message in messages if isinstance(messages, list) else []:
+            kwargs = message.get('kwargs') if isinstance(message, dict) else None
+            if isinstance(kwargs, dict):
+                for field in _VOLATILE_MESSAGE_FIELDS:
+                    kwargs.pop(field, None)
+        normalized = json.dumps(messages, sort_keys=True)
+    return hashlib.sha256(f"{llm_string}\0{normalized}".encode('utf-8')).hexdigest()
+
+
+class ResponseCache(BaseCache):
+    """LLM cache backed by a size-bounded SQLite store with LRU eviction.
+
+    Counts hits and misses so the hit rate can be reported at the end of a run.
+    """
+
+    def __init__(self, path: str, *, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024, ttl: Optional[float] = None):
+        """Open or create the response store.
+
+        Args:
+            path: Path of the SQLite database file
+            max_bytes: Upper bound on the total size of stored responses
+            ttl: Seconds after which responses expire, or None to keep them until evicted
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+        """)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Return the cached generations for a call, or None on a miss."""
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+        return loads(zlib.decompress(row[0]).decode('utf-8'), allowed_objects='core')
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store the generations of a call, evicting old responses if the store is full."""
+        value = zlib.compress(dumps(list(return_val)).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (cache_key(prompt, llm_string), value, len(value), now, now)
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * EVICTION_TARGET_RATIO)
+        removed = 0
+        keys = []
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            if removed >= excess:
+                break
+            keys.append((key,))
+            removed += size
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', keys)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove every stored response."""
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+# One cache per stage, so hit rates can be reported per stage
+_stage_caches: Dict[str, ResponseCache] = {}
+
+
+def get_response_cache(stage: str) -> Optional[ResponseCache]:
+    """Return the response cache for a stage, or None if caching is off for it.
+
+    Args:
+        stage: One of CACHE_STAGES
+
+    Returns:
+        The stage's cache, opened on first use
+    """
+    config = _global_memory.get('config', {})
+    if stage not in (config.get('response_cache_stages') or ()):
+        return None
+    if stage not in _stage_caches:
+        max_mb = config.get('response_cache_max_mb') or DEFAULT_CACHE_MAX_MB
+        _stage_caches[stage] = ResponseCache(
+            os.path.join(ensure_sparc_dir(), CACHE_DB_NAME),
+            max_bytes=int(max_mb * 1024 * 1024),
+            ttl=config.get('response_cache_ttl')
+        )
+    return _stage_caches[stage]
+
+
+# (ID of the model, ID of the cache) to the model, the cache and the copy of the model using it
+_cached_models: Dict[Tuple[int, int], Tuple[Any, ResponseCache, Any]] = {}
+
+
+def with_response_cache(model: Any, stage: str) -> Any:
+    """Return a copy of model that caches its responses, if enabled for the stage.
+
+    The copy is made once per model and cache, so agents of the same model and
+    stage share it, along with their compiled graph.
+
+    Args:
+        model: Chat model to wrap
+        stage: Stage the model is used in
+
+    Returns:
+        A copy of the model using the stage's cache, or the model itself
+    """
+    cache = get_response_cache(stage)
+    if cache is None or not isinstance(model, BaseChatModel):
+        return model
+    key = (id(model), id(cache))
+    entry = _cached_models.get(key)
+    # The entry holds on to the model and cache, so their IDs cannot be reused while it exists
+    if entry is None or entry[0] is not model or entry[1] is not cache:
+        entry = (model, cache, model.model_copy(update={'cache': cache}))
+        _cached_models[key] = entry
+    return entry[2]
+
+
+def parse_cache_stages(value: str) -> Tuple[str, ...]:
+    """Parse a comma-separated list of stages, where 'all' selects every stage.
+
+    Raises:
+        ValueError: If a stage is unknown
+    """
+    stages = tuple(stage.strip() for stage in value.split(',') if stage.strip())
+    if 'all' in stages:
+        return CACHE_STAGES
+    unknown = [stage for stage in stages if stage not in CACHE_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown cache stage(s): {', '.join(unknown)} (choose from {', '.join(CACHE_STAGES)} or all)")
+    return stages
+
+
+def get_cache_stats() -> Dict[str, Tuple[int, int]]:
+    """Return (hits, misses) per stage for the caches used in this process."""
+    return {stage: (cache.hits, cache.misses) for stage, cache in _stage_caches.items()}
+
+
+def print_cache_report(stats: Optional[Dict[str, Tuple[int, int]]] = None) -> None:
+    """Print the response cache hit rate per stage, if any cache was used.
+
+    Args:
+        stats: (hits, misses) per stage, defaults to this process's caches
+    """
+    stats = get_cache_stats() if stats is None else stats
+    if not any(hits + misses for hits, misses in stats.values()):
+        return
+    table = Table(title="LLM Response Cache")
+    table.add_column("Stage")
+    table.add_column("Hits", justify="right")
+    table.add_column("Misses", justify="right")
+    table.add_column("Hit rate", justify="right")
+    total_hits = total_misses = 0
+    for stage in CACHE_STAGES:
+        if stage not in stats:
+            continue
+        hits, misses = stats[stage]
+        total_hits += hits
+        total_misses += misses
+        table.add_row(stage, str(hits), str(misses), f"{hits / max(1, hits + misses):.0%}")
+    table.add_row("total", str(total_hits), str(total_misses),
+                  f"{total_hits / max(1, total_hits + total_misses):.0%}", style="bold")
+    console.print(table)
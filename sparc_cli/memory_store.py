@@ -0,0 +1,451 @@
+"""Indexed store behind global memory.
+
+Key facts, key snippets and related files are kept in collections of compact
+records, each with its own ID counter, and related files are indexed by path
+so that emitting a file that is already known is a dictionary lookup rather
+than a scan of all files. Everything else (tasks, plans, flags, config) is
+kept as plain values.
+
+MemoryStore is also a mutable mapping with the keys global memory has always
+had: store['key_facts'] is the live collection, store['key_fact_id_counter'] its
+next ID, and assigning a dict of entries to a collection key replaces its
+contents. Existing code that reads, updates, copies or snapshots global memory
+as a dict keeps working.
+"""
+
+import heapq
+import operator
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
+
+
+class MemoryRecord(Mapping):
+    """Base class of the records of a collection, read-only dict compatible through their field names."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_mapping(cls, value: Any) -> 'MemoryRecord':
+        """Return value as a record of this type, converting dicts; missing fields are None."""
+        # Exact type check: isinstance against an ABC subclass is several times slower
+        if type(value) is cls:
+            return value
+        # The fields of a record type are its constructor's arguments, in order
+        try:
+            return cls(*cls._fields_getter(value))
+        except KeyError:
+            return cls(*map(value.get, cls.__slots__))
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields_getter = operator.itemgetter(*cls.__slots__)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class Fact(MemoryRecord):
+    """A key fact."""
+
+    __slots__ = ('content', 'priority', 'timestamp')
+
+    def __init__(self, content: str, priority: int, timestamp: Any):
+        self.content = content
+        self.priority = priority
+        self.timestamp = timestamp
+
+
+class Snippet(MemoryRecord):
+    """A key source code snippet."""
+
+    __slots__ = ('filepath', 'line_number', 'snippet', 'description', 'priority', 'timestamp')
+
+    def __init__(
+        self,
+        filepath: str,
+        line_number: int,
+        snippet: str,
+        description: Optional[str],
+        priority: int,
+        timestamp: Any
+    ):
+        self.filepath = filepath
+        self.line_number = line_number
+        self.snippet = snippet
+        self.description = description
+        self.priority = priority
+        self.timestamp = timestamp
+
+
+class MemoryCollection(MutableMapping):
+    """Entries keyed by ID, with the counter new IDs are taken from.
+
+    Values assigned are converted to the collection's record type, if it has one.
+    Records are also kept in a heap ordered by (priority, timestamp), so that
+    evicting the lowest priority, oldest records costs O(log n) per record.
+    Deleted and replaced records are dropped from the heap lazily, as they
+    reach its top, and after a bulk replace the heap is only built once
+    records are evicted.
+
+    The version counts changes to the entries, so that derived values such as
+    rendered prompt sections can be reused while it stays the same. Formatted
+    entries are cached too, and only entries changed since the last call are
+    formatted again.
+    """
+
+    __slots__ = (
+        '_entries', 'next_id', '_record_type', '_heap', '_sequence',
+        'version', '_formatted', '_dirty', '_rendered', '_rendered_text'
+    )
+
+    def __init__(self, record_type: Optional[Type[MemoryRecord]] = None):
+        self._entries: Dict[int, Any] = {}
+        self.next_id = 1
+        self._record_type = record_type
+        # (priority, timestamp, insertion sequence, ID, record); the sequence breaks ties.
+        # None until built
+        self._heap: Optional[List[Tuple[Any, Any, int, int, MemoryRecord]]] = []
+        self._sequence = 0
+        self.version = 0
+        # Formatted text of each entry, and the IDs of entries changed since they were formatted
+        self._formatted: Dict[int, str] = {}
+        self._dirty: Set[int] = set()
+        # (version, (ID, record, text) of every entry in ID order) and (version, separator, joined text)
+        self._rendered: Optional[Tuple[int, List[Tuple[int, Any, str]]]] = None
+        self._rendered_text: Optional[Tuple[int, str, str]] = None
+
+    def add(self, value: Any) -> int:
+        """Store a value under the next free ID and return the ID."""
+        entry_id = self.next_id
+        self.next_id += 1
+        self[entry_id] = value
+        return entry_id
+
+    def replace(self, entries: Mapping) -> None:
+        """Replace all entries, keeping the ID counter."""
+        if entries is self:
+            return
+        if self._record_type is not None:
+            from_mapping = self._record_type.from_mapping
+            entries = {entry_id: from_mapping(value) for entry_id, value in entries.items()}
+        else:
+            entries = dict(entries)
+        self.clear()
+        self._entries.update(entries)
+        self._dirty.update(entries)
+        self._heap = None
+
+    def evict(self, limit: int) -> List[Tuple[int, Any]]:
+        """Remove the lowest priority, oldest records until at most limit remain.
+
+        Returns:
+            The removed (ID, record) pairs
+        """
+        excess = len(self._entries) - limit
+        if excess <= 0:
+            return []
+        if excess > limit:
+            # Bulk trim, e.g. of restored memory: select the survivors in one pass instead
+            keep = heapq.nlargest(limit, self._heap_entries())
+            kept_ids = {entry[3] for entry in keep}
+            evicted = [(entry_id, record) for entry_id, record in self._entries.items() if entry_id not in kept_ids]
+            for entry_id, _ in evicted:
+                del self._entries[entry_id]
+                self._changed(entry_id)
+            heapq.heapify(keep)
+            self._heap = keep
+            return evicted
+        if self._heap is None:
+            self._rebuild_heap()
+        evicted = []
+        heap = self._heap
+        while len(self._entries) > limit and heap:
+            entry_id, record = heapq.heappop(heap)[3:]
+            if self._entries.get(entry_id) is record:
+                del self._entries[entry_id]
+                self._changed(entry_id)
+                evicted.append((entry_id, record))
+        if len(heap) > 2 * len(self._entries) + 32:
+            # Mostly stale entries of deleted records
+            self._rebuild_heap()
+        return evicted
+
+    def rendered(self, formatter: Callable[[int, Any], str]) -> List[Tuple[int, Any, str]]:
+        """Return the ID, record and formatted text of every entry, in ID order.
+
+        Only entries changed since the last call are formatted; while the version
+        is unchanged, the list of the last call is returned as is.
+
+        Args:
+            formatter: Formats an entry from its ID and record; must be the same on every call
+
+        Returns:
+            (ID, record, text) of every entry
+        """
+        rendered = self._rendered
+        if rendered is not None and rendered[0] == self.version:
+            return rendered[1]
+        formatted = self._formatted
+        for entry_id in self._dirty:
+            if entry_id in self._entries:
+                formatted[entry_id] = formatter(entry_id, self._entries[entry_id])
+        self._dirty.clear()
+        entries = [(entry_id, self._entries[entry_id], formatted[entry_id]) for entry_id in sorted(self._entries)]
+        self._rendered = (self.version, entries)
+        return entries
+
+    def rendered_text(self, formatter: Callable[[int, Any], str], separator: str) -> str:
+        """Return the formatted entries in ID order joined by separator, reused while the version is unchanged."""
+        rendered_text = self._rendered_text
+        if rendered_text is not None and rendered_text[0] == self.version and rendered_text[1] == separator:
+            return rendered_text[2]
+        text = separator.join(entry_text for _, _, entry_text in self.rendered(formatter))
+        self._rendered_text = (self.version, separator, text)
+        return text
+
+    def _changed(self, entry_id: int) -> None:
+        self.version += 1
+        self._formatted.pop(entry_id, None)
+        self._dirty.add(entry_id)
+
+    def _heap_entries(self) -> List[Tuple[Any, Any, int, int, MemoryRecord]]:
+        """Return one heap entry per record, in insertion order."""
+        sequence = self._sequence
+        self._sequence += len(self._entries)
+        return [
+            (record.priority, record.timestamp, sequence + offset, entry_id, record)
+            for offset, (entry_id, record) in enumerate(self._entries.items(), 1)
+        ]
+
+    def _rebuild_heap(self) -> None:
+        self._heap = self._heap_entries()
+        heapq.heapify(self._heap)
+
+    def __getitem__(self, entry_id: int) -> Any:
+        return self._entries[entry_id]
+
+    def __setitem__(self, entry_id: int, value: Any) -> None:
+        if self._record_type is not None:
+            value = self._record_type.from_mapping(value)
+            if self._heap is not None:
+                self._sequence += 1
+                heapq.heappush(self._heap, (value.priority, value.timestamp, self._sequence, entry_id, value))
+        self._entries[entry_id] = value
+        self._changed(entry_id)
+
+    def __delitem__(self, entry_id: int) -> None:
+        del self._entries[entry_id]
+        self._changed(entry_id)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, entry_id: object) -> bool:
+        return entry_id in self._entries
+
+    # Views of the underlying dict, rather than the mixins' item by item lookups
+
+    def keys(self):
+        return self._entries.keys()
+
+    def values(self):
+        return self._entries.values()
+
+    def items(self):
+        return self._entries.items()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._heap = []
+        self.version += 1
+        self._formatted.clear()
+        self._dirty.clear()
+
+    def __repr__(self) -> str:
+        return repr(self._entries)
+
+
+class RelatedFiles(MemoryCollection):
+    """File paths keyed by ID, indexed by path."""
+
+    __slots__ = ('_ids_by_path',)
+
+    def __init__(self):
+        super().__init__()
+        # Path to the IDs it is stored under, lowest first
+        self._ids_by_path: Dict[str, List[int]] = {}
+
+    def id_of(self, path: str) -> Optional[int]:
+        """Return the ID a path is stored under, or None."""
+        ids = self._ids_by_path.get(path)
+        return ids[0] if ids else None
+
+    def add_path(self, path: str) -> Tuple[int, bool]:
+        """Store a path unless it is already known.
+
+        Returns:
+            The path's ID, and whether it was added
+        """
+        file_id = self.id_of(path)
+        if file_id is not None:
+            return file_id, False
+        return self.add(path), True
+
+    def replace(self, entries: Mapping) -> None:
+        super().replace(entries)
+        self._ids_by_path.clear()
+        for file_id, path in sorted(self._entries.items()):
+            self._ids_by_path.setdefault(path, []).append(file_id)
+
+    def __setitem__(self, file_id: int, path: str) -> None:
+        if file_id in self._entries:
+            del self[file_id]
+        super().__setitem__(file_id, path)
+        ids = self._ids_by_path.setdefault(path, [])
+        ids.append(file_id)
+        ids.sort()
+
+    def __delitem__(self, file_id: int) -> None:
+        path = self._entries.pop(file_id)
+        self._changed(file_id)
+        ids = self._ids_by_path[path]
+        ids.remove(file_id)
+        if not ids:
+            del self._ids_by_path[path]
+
+    def clear(self) -> None:
+        super().clear()
+        self._ids_by_path.clear()
+
+
+# Keys of the ID counters, and the collections they count for
+COUNTER_KEYS = {
+    'key_fact_id_counter': 'key_facts',
+    'key_snippet_id_counter': 'key_snippets',
+    'related_file_id_counter': 'related_files',
+}
+
+
+class MemoryStore(MutableMapping):
+    """Global memory: indexed collections of facts, snippets and related files, and plain values for the rest.
+
+    The version counts changes to the whole store, so that snapshots of it are
+    only taken again once it changed. Plain values changed in place, such as a
+    note appended to research_notes, are counted through mark_changed.
+    """
+
+    __slots__ = ('key_facts', 'key_snippets', 'related_files', '_collections', '_values', '_values_version')
+
+    def __init__(self, initial: Optional[Mapping] = None):
+        """
+        Args:
+            initial: Entries to start with, keyed like global memory
+        """
+        self.key_facts = MemoryCollection(Fact)
+        self.key_snippets = MemoryCollection(Snippet)
+        self.related_files = RelatedFiles()
+        self._collections: Dict[str, MemoryCollection] = {
+            'key_facts': self.key_facts,
+            'key_snippets': self.key_snippets,
+            'related_files': self.related_files,
+        }
+        self._values: Dict[str, Any] = {}
+        self._values_version = 0
+        if initial:
+            self.update(initial)
+
+    @property
+    def version(self) -> int:
+        return self._values_version + sum(collection.version for collection in self._collections.values())
+
+    def mark_changed(self) -> None:
+        """Record a change made in place to a plain value, such as a list or dict of the store."""
+        self._values_version += 1
+
+    def __getitem__(self, key: str) -> Any:
+        collection = self._collections.get(key)
+        if collection is not None:
+            return collection
+        counted = COUNTER_KEYS.get(key)
+        if counted is not None:
+            return self._collections[counted].next_id
+        return self._values[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # Called on every tool call and model request, so avoid Mapping.get's exception handling
+        if key in self._values:
+            return self._values[key]
+        return self[key] if key in self._collections or key in COUNTER_KEYS else default
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        collection = self._collections.get(key)
+        if collection is not None:
+            collection.replace(value)
+            return
+        self._values_version += 1
+        counted = COUNTER_KEYS.get(key)
+        if counted is not None:
+            self._collections[counted].next_id = value
+            return
+        self._values[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        """Delete a plain value; collections are emptied and their counters reset instead."""
+        collection = self._collections.get(key)
+        if collection is not None:
+            collection.clear()
+            return
+        self._values_version += 1
+        counted = COUNTER_KEYS.get(key)
+        if counted is not None:
+            self._collections[counted].next_id = 1
+            return
+        del self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._collections
+        yield from COUNTER_KEYS
+        yield from self._values
+
+    def __len__(self) -> int:
+        return len(self._collections) + len(COUNTER_KEYS) + len(self._values)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._collections or key in COUNTER_KEYS or key in self._values
+
+    def clear(self) -> None:
+        for collection in self._collections.values():
+            collection.clear()
+            collection.next_id = 1
+        self._values.clear()
+        self._values_version += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a copy of the store made only of plain dicts, lists and values, for serializers."""
+        snapshot: Dict[str, Any] = {}
+        for key, collection in self._collections.items():
+            snapshot[key] = {
+                entry_id: dict(value) if isinstance(value, MemoryRecord) else value
+                for entry_id, value in collection.items()
+            }
+        for key, counted in COUNTER_KEYS.items():
+            snapshot[key] = self._collections[counted].next_id
+        snapshot.update(self._values)
+        return snapshot
+
+    def __repr__(self) -> str:
+        return f"MemoryStore({self.to_dict()!r})"
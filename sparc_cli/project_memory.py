@@ -0,0 +1,232 @@
+"""Knowledge about a project kept across sessions.
+
+The key facts, key snippets and related files found by research are saved to
+a SQLite database under the project's .sparc directory, each with the git
+commit it was observed at and content hashes of the files it was derived
+from:
+
+- a snippet depends on its file
+- a related file depends on itself
+- a fact depends on the related files it mentions, or on all related files
+  of its session if it mentions none, or, if the session has none, on the
+  commit it was observed at
+
+A new session on the same project starts with the saved entries whose files
+are unchanged, so research does not rediscover them. Entries whose files
+changed or disappeared are dropped when found stale, and so are entries the
+session loaded or saved and then deleted from its memory.
+
+Enabled by default; turned off through the run configuration.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from git import Repo
+from git.exc import InvalidGitRepositoryError, NoSuchPathError
+from rich.console import Console
+
+from sparc_cli.storage import ensure_sparc_dir
+
+PROJECT_MEMORY_DB_NAME = 'project_memory.db'
+
+# Memory collections kept across sessions
+PROJECT_MEMORY_KINDS = ('key_facts', 'key_snippets', 'related_files')
+
+console = Console()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """Return the SHA-256 of a file's content, or None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def current_commit(root: str = '.') -> Optional[str]:
+    """Return the commit checked out in the repository containing root, if any."""
+    try:
+        return Repo(root, search_parent_directories=True).head.commit.hexsha
+    except (InvalidGitRepositoryError, NoSuchPathError, ValueError):
+        # ValueError: a repository without commits
+        return None
+
+
+def _entry_key(kind: str, value: Any) -> str:
+    if kind == 'key_facts':
+        return value['content']
+    if kind == 'key_snippets':
+        snippet_hash = hashlib.sha256(value['snippet'].encode('utf-8')).hexdigest()
+        return f"{value['filepath']}:{value['line_number']}:{snippet_hash}"
+    return value
+
+
+class ProjectMemory:
+    """Store of facts, snippets and related files, validated against file content hashes on load."""
+
+    def __init__(self, path: str, root: str = '.'):
+        """
+        Args:
+            path: Path of the SQLite database file
+            root: Project directory relative file paths are resolved against
+        """
+        self.path = path
+        self.root = root
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                commit_sha TEXT,
+                files TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            );
+        """)
+
+    def _digests(self, paths: List[str], cache: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+        for path in paths:
+            if path not in cache:
+                cache[path] = file_digest(os.path.join(self.root, path))
+        return {path: cache[path] for path in paths}
+
+    def save(self, memory: Dict[str, Any]) -> int:
+        """Save the facts, snippets and related files of a memory, replacing earlier versions.
+
+        Entries listed in the memory's project_memory_keys, those it was loaded
+        with or saved before, that it no longer holds are deleted; the list is
+        then set to the entries saved now.
+
+        Args:
+            memory: Global memory, or a dict keyed like it
+
+        Returns:
+            Number of entries saved
+        """
+        related_files = list(memory.get('related_files', {}).values())
+        commit = current_commit(self.root)
+        now = time.time()
+        digests: Dict[str, Optional[str]] = {}
+        rows = []
+        for kind in PROJECT_MEMORY_KINDS:
+            for value in memory.get(kind, {}).values():
+                if kind == 'key_facts':
+                    mentioned = [path for path in related_files if path in value['content']]
+                    data, files = dict(value), mentioned or related_files
+                    if not files and commit is None:
+                        # Nothing to tell later sessions whether the fact still holds
+                        continue
+                elif kind == 'key_snippets':
+                    data, files = dict(value), [value['filepath']]
+                else:
+                    data, files = {'path': value}, [value]
+                rows.append((kind, _entry_key(kind, value), json.dumps(data), commit,
+                             json.dumps(self._digests(files, digests)), now))
+        saved = [[kind, key] for kind, key, *_ in rows]
+        removed = {tuple(entry) for entry in memory.get('project_memory_keys', [])} - {tuple(entry) for entry in saved}
+        with self._conn:
+            self._conn.executemany('DELETE FROM entries WHERE kind = ? AND key = ?', sorted(removed))
+            self._conn.executemany(
+                """INSERT OR REPLACE INTO entries (kind, key, data, commit_sha, files, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+        memory['project_memory_keys'] = saved
+        return len(rows)
+
+    def load(self) -> Dict[str, Dict[int, Any]]:
+        """Return the entries whose files are unchanged, and delete the others.
+
+        Returns:
+            Entries per memory collection, keyed by consecutive IDs in the order they were saved,
+            as taken by merge_memory_entries
+        """
+        entries: Dict[str, Dict[int, Any]] = {kind: {} for kind in PROJECT_MEMORY_KINDS}
+        stale: List[Tuple[str, str]] = []
+        digests: Dict[str, Optional[str]] = {}
+        commit = current_commit(self.root)
+        rows = self._conn.execute(
+            'SELECT kind, key, data, commit_sha, files FROM entries ORDER BY updated_at, rowid'
+        ).fetchall()
+        for kind, key, data, commit_sha, files in rows:
+            files = json.loads(files)
+            if (kind not in entries or self._digests(list(files), digests) != files or None in files.values()
+                    or (not files and commit_sha != commit)):
+                stale.append((kind, key))
+                continue
+            value = json.loads(data)
+            collection = entries[kind]
+            collection[len(collection) + 1] = value['path'] if kind == 'related_files' else value
+        if stale:
+            with self._conn:
+                self._conn.executemany('DELETE FROM entries WHERE kind = ? AND key = ?', stale)
+        return entries
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _enabled() -> bool:
+    from sparc_cli.tools.memory import _global_memory
+    return _global_memory.get('config', {}).get('project_memory', True)
+
+
+def open_project_memory(root: str = '.') -> ProjectMemory:
+    """Open the project memory of the project at root."""
+    return ProjectMemory(os.path.join(ensure_sparc_dir(root), PROJECT_MEMORY_DB_NAME), root)
+
+
+def load_project_memory(root: str = '.') -> Dict[str, int]:
+    """Seed global memory with the still valid entries saved by earlier sessions, if enabled.
+
+    Returns:
+        Number of entries added per memory collection
+    """
+    from sparc_cli.tools.memory import _global_memory, merge_memory_entries
+
+    if not _enabled():
+        return {}
+    store = open_project_memory(root)
+    try:
+        entries = store.load()
+    finally:
+        store.close()
+    added = merge_memory_entries(**entries)
+    # Entries the session deletes from its memory are deleted from the store when it is saved
+    _global_memory['project_memory_keys'] = [
+        [kind, _entry_key(kind, value)] for kind, collection in entries.items() for value in collection.values()
+    ]
+    if any(added.values()):
+        console.print(
+            f"[dim]Loaded {added['key_facts']} key fact(s), {added['key_snippets']} snippet(s) and "
+            f"{added['related_files']} related file(s) from project memory[/dim]"
+        )
+    return added
+
+
+def save_project_memory(root: str = '.') -> int:
+    """Save global memory's facts, snippets and related files for later sessions, if enabled.
+
+    Returns:
+        Number of entries saved
+    """
+    from sparc_cli.tools.memory import _global_memory
+
+    if not _enabled():
+        return 0
+    store = open_project_memory(root)
+    try:
+        return store.save(_global_memory)
+    finally:
+        store.close()
@@ -4,6 +4,11 @@ Stage-specific prompts for the AI agent system.
 Each prompt constant uses str.format() style template substitution for variable replacement.
 The prompts guide the agent through different stages of task execution.
 
+Agent prompts are split into static instructions and a context template holding
+the per-task values. The instructions come first and are identical across agents
+of a run, so providers can cache them as a prompt prefix; the full prompt is the
+instructions followed by the context.
+
 These updated prompts include instructions to scale complexity:
 - For simpler requests, keep the scope minimal and avoid unnecessary complexity.
 - For more complex requests, still provide detailed planning and thorough steps.
@@ -69,19 +74,7 @@ Human Interaction:
 """
 
 # Research stage prompt - guides initial codebase analysis
-RESEARCH_PROMPT = """User query: {base_task} --keep it simple
-
-Context from Previous Research (if available):
-Key Facts:
-{key_facts}
-
-Relevant Code Snippets:
-{code_snippets}
-
-Related Files:
-{related_files}
-
-Be very thorough in your research and emit lots of snippets, key facts. If you take more than a few steps, be eager to emit research subtasks.{research_only_note}
+RESEARCH_PROMPT_INSTRUCTIONS = """Be very thorough in your research and emit lots of snippets, key facts. If you take more than a few steps, be eager to emit research subtasks.{research_only_note}
 
 Objective
     Investigate and understand the codebase as it relates to the query.
@@ -391,8 +384,8 @@ After processing directives, introduce yourself:
 NEVER ANNOUNCE WHAT YOU ARE DOING, JUST DO IT!
 """
 
-# Research-only prompt - similar to research prompt but without implementation references
-RESEARCH_ONLY_PROMPT = """User query: {base_task} --keep it simple
+RESEARCH_PROMPT_CONTEXT = """
+User query: {base_task} --keep it simple
 
 Context from Previous Research (if available):
 Key Facts:
@@ -403,8 +396,12 @@ Relevant Code Snippets:
 
 Related Files:
 {related_files}
+"""
+
+RESEARCH_PROMPT = RESEARCH_PROMPT_INSTRUCTIONS + RESEARCH_PROMPT_CONTEXT
 
-Be very thorough in your research and emit lots of snippets, key facts. If you take more than a few steps, be eager to emit research subtasks.
+# Research-only prompt - similar to research prompt but without implementation references
+RESEARCH_ONLY_PROMPT_INSTRUCTIONS = """Be very thorough in your research and emit lots of snippets, key facts. If you take more than a few steps, be eager to emit research subtasks.
 
 Objective
     Investigate and understand the codebase as it relates to the query.
@@ -494,26 +491,13 @@ You have often been criticized for:
 NEVER ANNOUNCE WHAT YOU ARE DOING, JUST DO IT!
 """
 
-# Planning stage prompt - guides task breakdown and implementation planning
-# Includes a directive to scale complexity with request size and consult the expert (if available) for logic verification and debugging.
-PLANNING_PROMPT = """Base Task:
-{base_task} --keep it simple
-
-Research Notes:
-<notes>
-{research_notes}
-</notes>
-
-Relevant Files:
-{related_files}
-
-Key Facts:
-{key_facts}
+RESEARCH_ONLY_PROMPT_CONTEXT = RESEARCH_PROMPT_CONTEXT
 
-Key Snippets:
-{key_snippets}
+RESEARCH_ONLY_PROMPT = RESEARCH_ONLY_PROMPT_INSTRUCTIONS + RESEARCH_ONLY_PROMPT_CONTEXT
 
-Fact Management:
+# Planning stage prompt - guides task breakdown and implementation planning
+# Includes a directive to scale complexity with request size and consult the expert (if available) for logic verification and debugging.
+PLANNING_PROMPT_INSTRUCTIONS = """Fact Management:
     Each fact is identified with [Fact ID: X].
     Facts may be deleted if they become outdated, irrelevant, or duplicates.
     Use delete_key_facts([id1, id2, ...]) with a list of numeric Fact IDs to remove unnecessary facts.
@@ -553,9 +537,11 @@ Guidelines:
         Use emit_plan to store the high-level implementation plan.
         For each sub-task, use emit_task to store a step-by-step description.
             The description should be only as detailed as warranted by the complexity of the request.
+            Pass the files the task will create or modify, and the IDs of tasks it depends on, so independent tasks can run in parallel.
         You may use delete_tasks or swap_task_order to adjust the task list/order as you plan.
 
-    Once you are absolutely sure you are completed planning, you may begin to call request_task_implementation one-by-one for each task to implement the plan.
+    Once you are absolutely sure you are completed planning, either call request_planned_tasks_implementation once to implement every task (independent tasks run in parallel),
+      or call request_task_implementation one-by-one for each task to implement the plan.
     If you have any doubt about the correctness or thoroughness of the plan, consult the expert (if expert is available) for verification.
 
 {expert_section}
@@ -569,24 +555,30 @@ You have often been criticized for:
 NEVER ANNOUNCE WHAT YOU ARE DOING, JUST DO IT!
 """
 
-# Implementation stage prompt - guides specific task implementation
-# Added instruction to adjust complexity of implementation to match request, and consult the expert (if available) for correctness, debugging.
-IMPLEMENTATION_PROMPT = """Base-level task (for reference only):
+PLANNING_PROMPT_CONTEXT = """
+Base Task:
 {base_task} --keep it simple
 
-Plan Overview (for reference only, remember you are only implementing your specific task):
-{plan}
+Research Notes:
+<notes>
+{research_notes}
+</notes>
+
+Relevant Files:
+{related_files}
 
 Key Facts:
 {key_facts}
 
 Key Snippets:
 {key_snippets}
+"""
 
-Relevant Files:
-{related_files}
+PLANNING_PROMPT = PLANNING_PROMPT_INSTRUCTIONS + PLANNING_PROMPT_CONTEXT
 
-Important Notes:
+# Implementation stage prompt - guides specific task implementation
+# Added instruction to adjust complexity of implementation to match request, and consult the expert (if available) for correctness, debugging.
+IMPLEMENTATION_PROMPT_INSTRUCTIONS = """Important Notes:
 - Focus solely on the given task and implement it as described.
 - Scale the complexity of your solution to the complexity of the request. For simple requests, keep it straightforward and minimal. For complex requests, maintain the previously planned depth.
 - Use delete_key_facts to remove facts that become outdated, irrelevant, or duplicated.
@@ -594,10 +586,7 @@ Important Notes:
 - Regularly remove outdated snippets with delete_key_snippets.
 Instructions:
 1. Review the provided base task, plan, and key facts.
-2. Implement only the specified task:
-<task definition>
-{task}
-</task definition>
+2. Implement only the task given in the task definition below.
 
 3. Work incrementally, validating as you go. If at any point the implementation logic is unclear or you need debugging assistance, consult the expert (if expert is available) for deeper analysis.
 4. Use delete_key_facts to remove any key facts that no longer apply.
@@ -629,8 +618,32 @@ You have often been criticized for:
 NEVER ANNOUNCE WHAT YOU ARE DOING, JUST DO IT!
 """
 
+IMPLEMENTATION_PROMPT_CONTEXT = """
+Base-level task (for reference only):
+{base_task} --keep it simple
+
+Plan Overview (for reference only, remember you are only implementing your specific task):
+{plan}
+
+Key Facts:
+{key_facts}
+
+Key Snippets:
+{key_snippets}
+
+Relevant Files:
+{related_files}
+
+Your task:
+<task definition>
+{task}
+</task definition>
+"""
+
+IMPLEMENTATION_PROMPT = IMPLEMENTATION_PROMPT_INSTRUCTIONS + IMPLEMENTATION_PROMPT_CONTEXT
+
 # New agentic chat prompt for interactive mode
-CHAT_PROMPT = """
+CHAT_PROMPT_INSTRUCTIONS = """
 Agentic Chat Mode Instructions:
 ---------------------------------------------------------------------------------------------------
 PROMPT START
@@ -884,9 +897,13 @@ Additionally:
 [END INVOCATION PROMPT]
 Introduce yourself with a unique name and a brief explaination of your existence, SPARC as a advanced coding entity. Include some of your capabilities and how you will be assisting the user..
 
+NEVER ANNOUNCE WHAT YOU ARE DOING, JUST DO IT!
+"""
+
+CHAT_PROMPT_CONTEXT = """
 <initial request>
 {initial_request}
 </initial request>
-
-NEVER ANNOUNCE WHAT YOU ARE DOING, JUST DO IT!
 """
+
+CHAT_PROMPT = CHAT_PROMPT_INSTRUCTIONS + CHAT_PROMPT_CONTEXT
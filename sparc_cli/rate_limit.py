@@ -0,0 +1,383 @@
+"""Process-wide scheduling of LLM requests.
+
+Every model call of every agent in the process that is not answered from the
+response cache passes through one scheduler before it is sent. Per provider
+host the scheduler keeps:
+
+- a token bucket of requests, refilled from the rate limit headers the
+  provider returns with each response,
+- a circuit breaker that holds back requests after repeated transient
+  failures, letting a single probe through once it cools down. It is fed
+  by the responses the provider actually sends, not by replayed ones.
+
+When several agents wait for the same provider, the shallowest agent goes
+first, so the root agent is not starved by its own sub-agents. Retries use
+capped, jittered exponential backoff so that agents hit by the same 429 do
+not retry in lockstep.
+"""
+
+import asyncio
+import functools
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+
+BACKOFF_BASE_DELAY = 1.0
+BACKOFF_MAX_DELAY = 60.0
+
+# Consecutive transient failures that open a provider's circuit
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN = 15.0
+CIRCUIT_MAX_COOLDOWN = 240.0
+
+# Providers express request limits per minute
+RATE_LIMIT_WINDOW = 60.0
+
+# HTTP statuses of failures that are worth retrying and count against the circuit
+TRANSIENT_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+# Header names per provider family: (limit, remaining, reset) for requests, (remaining, reset) for tokens
+_REQUEST_HEADERS = (
+    ('anthropic-ratelimit-requests-limit', 'anthropic-ratelimit-requests-remaining', 'anthropic-ratelimit-requests-reset'),
+    ('x-ratelimit-limit-requests', 'x-ratelimit-remaining-requests', 'x-ratelimit-reset-requests'),
+)
+_TOKEN_HEADERS = (
+    ('anthropic-ratelimit-tokens-remaining', 'anthropic-ratelimit-tokens-reset'),
+    ('x-ratelimit-remaining-tokens', 'x-ratelimit-reset-tokens'),
+)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+def backoff_delay(
+    attempt: int,
+    *,
+    base: float = BACKOFF_BASE_DELAY,
+    cap: float = BACKOFF_MAX_DELAY,
+    retry_after: Optional[float] = None
+) -> float:
+    """Return how long to wait before retry number attempt + 1.
+
+    Uses full jitter: a uniformly random delay up to the capped exponential
+    backoff, so concurrent agents spread their retries out. A retry-after given
+    by the provider is a lower bound.
+
+    Args:
+        attempt: Zero-based number of the failed attempt
+        base: Delay bound of the first retry, in seconds
+        cap: Upper bound of the delay, in seconds
+        retry_after: Delay requested by the provider, in seconds
+
+    Returns:
+        Delay in seconds
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** min(attempt, 32)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+def _parse_reset(value: str, now: float) -> Optional[float]:
+    """Parse a reset header, either a duration like '6m0s' or an RFC 3339 time, into a timestamp."""
+    value = value.strip()
+    parts = _DURATION_PART.findall(value)
+    if parts and ''.join(number + unit for number, unit in parts) == value:
+        return now + sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Return the retry-after delay in seconds from response headers, if given."""
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+@dataclass
+class TokenBucket:
+    """Bucket of request tokens, refilled continuously up to its capacity.
+
+    Starts unlimited until the provider reports its limits.
+    """
+    capacity: Optional[float] = None
+    tokens: float = 0.0
+    updated: float = field(default_factory=time.monotonic)
+
+    def _refill(self, now: float) -> None:
+        if self.capacity is not None:
+            rate = self.capacity / RATE_LIMIT_WINDOW
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available."""
+        if self.capacity is None:
+            return 0.0
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * RATE_LIMIT_WINDOW / self.capacity
+
+    def take(self, now: float) -> None:
+        """Consume a token."""
+        if self.capacity is not None:
+            self._refill(now)
+            self.tokens -= 1
+
+    def set_limits(self, limit: float, remaining: float, now: float) -> None:
+        """Adopt the limit and remaining requests reported by the provider."""
+        self.capacity = max(1.0, limit)
+        self.tokens = min(self.capacity, remaining)
+        self.updated = now
+
+
+@dataclass
+class CircuitBreaker:
+    """Per-provider circuit breaker.
+
+    Closed, requests flow. After CIRCUIT_FAILURE_THRESHOLD consecutive transient
+    failures it opens and holds requests back for a cooldown, then lets one probe
+    request through. A successful probe closes it; a failed one reopens it with a
+    doubled cooldown.
+    """
+    failures: int = 0
+    cooldown: float = CIRCUIT_COOLDOWN
+    open_until: Optional[float] = None
+    probe_started: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.open_until is not None
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a request may be sent."""
+        if self.open_until is None:
+            return 0.0
+        if now < self.open_until:
+            return self.open_until - now
+        if self.probe_started is not None and now - self.probe_started < self.cooldown:
+            # A probe is in flight; wait for its outcome
+            return self.probe_started + self.cooldown - now
+        return 0.0
+
+    def on_send(self, now: float) -> None:
+        if self.open_until is not None:
+            self.probe_started = now
+
+    def on_success(self) -> None:
+        self.failures = 0
+        self.cooldown = CIRCUIT_COOLDOWN
+        self.open_until = None
+        self.probe_started = None
+
+    def on_failure(self, now: float) -> None:
+        self.failures += 1
+        if self.open_until is not None:
+            self.cooldown = min(CIRCUIT_MAX_COOLDOWN, self.cooldown * 2)
+        elif self.failures < CIRCUIT_FAILURE_THRESHOLD:
+            return
+        self.open_until = now + self.cooldown
+        self.probe_started = None
+
+
+@dataclass
+class _HostState:
+    bucket: TokenBucket = field(default_factory=TokenBucket)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    # No requests before this time, set from retry-after and exhausted token limits
+    blocked_until: float = 0.0
+    waiters: List[Tuple[int, int]] = field(default_factory=list)
+
+
+class RateLimitScheduler:
+    """Admits LLM requests per provider host, in order of agent depth."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._hosts: Dict[str, _HostState] = {}
+        self._sequence = itertools.count()
+
+    def _state(self, host: str) -> _HostState:
+        if host not in self._hosts:
+            self._hosts[host] = _HostState()
+        return self._hosts[host]
+
+    def _wait_time(self, state: _HostState, now: float) -> float:
+        return max(state.blocked_until - now, state.breaker.wait_time(now), state.bucket.wait_time(now))
+
+    def acquire(self, host: str, priority: int = 0) -> float:
+        """Block until a request to host may be sent.
+
+        Args:
+            host: Provider host the request goes to
+            priority: Agent depth of the caller; lower values are admitted first
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        with self._condition:
+            state = self._state(host)
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(state.waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(state, now)
+                    if state.waiters[0] == ticket and wait <= 0:
+                        break
+                    self._condition.wait(timeout=wait if wait > 0 else None)
+                state.bucket.take(now)
+                state.breaker.on_send(now)
+            finally:
+                state.waiters.remove(ticket)
+                heapq.heapify(state.waiters)
+                self._condition.notify_all()
+        return time.monotonic() - start
+
+    def try_acquire(self, host: str, priority: int = 0) -> bool:
+        """Take a request slot for host if one is free now, without waiting.
+
+        Args:
+            host: Provider host the request goes to
+            priority: Agent depth of the caller; lower values are admitted first
+
+        Returns:
+            Whether the request may be sent
+        """
+        with self._condition:
+            state = self._state(host)
+            now = time.monotonic()
+            if self._wait_time(state, now) > 0 or (state.waiters and state.waiters[0][0] <= priority):
+                return False
+            state.bucket.take(now)
+            state.breaker.on_send(now)
+            return True
+
+    def update_from_headers(self, host: str, headers: Mapping[str, str]) -> None:
+        """Feed the rate limit headers of a provider response into the host's bucket."""
+        now = time.monotonic()
+        wall_now = time.time()
+        with self._condition:
+            state = self._state(host)
+            for limit_name, remaining_name, _ in _REQUEST_HEADERS:
+                if limit_name in headers and remaining_name in headers:
+                    try:
+                        state.bucket.set_limits(float(headers[limit_name]), float(headers[remaining_name]), now)
+                    except ValueError:
+                        pass
+                    break
+            for remaining_name, reset_name in _TOKEN_HEADERS:
+                if headers.get(remaining_name) == '0' and reset_name in headers:
+                    reset = _parse_reset(headers[reset_name], wall_now)
+                    if reset is not None:
+                        state.blocked_until = max(state.blocked_until, now + reset - wall_now)
+            retry_after = parse_retry_after(headers)
+            if retry_after is not None:
+                state.blocked_until = max(state.blocked_until, now + retry_after)
+            self._condition.notify_all()
+
+    def record_response(self, host: str, status_code: int) -> None:
+        """Record the status of a provider response; transient failures count towards opening the circuit."""
+        with self._condition:
+            breaker = self._state(host).breaker
+            if status_code in TRANSIENT_STATUS_CODES:
+                breaker.on_failure(time.monotonic())
+            else:
+                breaker.on_success()
+            self._condition.notify_all()
+
+    def record_failure(self, host: str, error: BaseException) -> None:
+        """Record a failed request; transient failures count towards opening the circuit."""
+        if not is_transient_error(error):
+            return
+        with self._condition:
+            self._state(host).breaker.on_failure(time.monotonic())
+            self._condition.notify_all()
+
+    def is_circuit_open(self, host: str) -> bool:
+        with self._condition:
+            return host in self._hosts and self._hosts[host].breaker.is_open
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Check whether a provider error is a rate limit, overload, timeout or connection failure."""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in TRANSIENT_STATUS_CODES
+    # Timeouts and connection errors of the provider SDKs carry no status
+    return type(error).__name__ in ('APITimeoutError', 'APIConnectionError')
+
+
+def retry_after_from_error(error: BaseException) -> Optional[float]:
+    """Return the retry-after delay attached to a provider error's response, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    return parse_retry_after(headers) if headers is not None else None
+
+
+_scheduler = RateLimitScheduler()
+
+
+def get_rate_limiter() -> RateLimitScheduler:
+    """Return the scheduler shared by all agents of the process."""
+    return _scheduler
+
+
+class HostRateLimiter(BaseRateLimiter):
+    """Admits a model's requests to a provider host through the process-wide scheduler.
+
+    Set as the model's rate_limiter, which langchain consults only after a miss
+    in the response cache, so replayed responses neither take a token nor wait
+    for an open circuit.
+    """
+
+    def __init__(self, host: str):
+        """Create a limiter for a model sending requests to host."""
+        self.host = host
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        from sparc_cli.tools.memory import _global_memory
+        depth = _global_memory.get('agent_depth', 0)
+        if not blocking:
+            return get_rate_limiter().try_acquire(self.host, depth)
+        get_rate_limiter().acquire(self.host, depth)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        # The scheduler waits on a thread condition, so wait in a worker thread; it
+        # copies the caller's context and with it the agent's session
+        return await asyncio.to_thread(functools.partial(self.acquire, blocking=blocking))
+
+
+class ConnectionFailureCallbackHandler(BaseCallbackHandler):
+    """Counts provider timeouts and connection failures against the host's circuit.
+
+    These produce no HTTP response, so the response hook of the shared HTTP
+    clients, which records all other outcomes, never sees them.
+    """
+
+    def __init__(self, host: str):
+        """Create a handler for a model sending requests to host."""
+        self.host = host
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        if getattr(error, 'status_code', None) is None:
+            get_rate_limiter().record_failure(self.host, error)
@@ -0,0 +1,88 @@
+"""Parallel fan-out of independent research queries.
+
+Each query is researched by its own research-only agent in a separate process.
+Workers start from a snapshot of the parent's global memory, so they see what
+is already known but cannot see or overwrite each other's findings. Their new
+facts, snippets, related files and notes are sent back and merged into the
+parent afterwards, and so is their model usage, attributed to the scope the
+batch was started in.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from sparc_cli.config import DEFAULT_MAX_PARALLEL_RESEARCH
+from sparc_cli.ledger import current_scope, get_ledger
+
+
+def _run_research_in_worker(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker entry point: research one query with memory seeded from the parent's snapshot."""
+    from sparc_cli.tools.memory import _global_memory, memory_entries_since
+    from sparc_cli.llm import get_llm
+    from sparc_cli.agent_utils import run_research_agent
+    from sparc_cli.ledger import get_ledger, restored_scope
+
+    _global_memory.update(job['memory'])
+    config = _global_memory.get('config', {})
+
+    # Pool processes are reused, so only report the usage of this job
+    usage_start = len(get_ledger().entries)
+    success = True
+    reason = None
+    try:
+        model = get_llm(
+            config.get('provider', 'anthropic'),
+            config.get('model', 'claude-3-5-sonnet-20241022')
+        )
+        with restored_scope(job['usage_scope']):
+            run_research_agent(
+                job['query'],
+                model,
+                expert_enabled=True,
+                research_only=True,
+                hil=False,
+                config=config
+            )
+    except Exception as e:
+        success = False
+        reason = f"error: {str(e)}"
+
+    return {
+        'query': job['query'],
+        'success': success,
+        'reason': reason,
+        'completion_message': _global_memory.get('completion_message', ''),
+        'usage': get_ledger().entries[usage_start:],
+        **memory_entries_since(job['memory']),
+    }
+
+
+def run_research_batch(
+    queries: List[str],
+    memory: Dict[str, Any],
+    *,
+    max_workers: int = DEFAULT_MAX_PARALLEL_RESEARCH,
+    worker: Callable[[Dict[str, Any]], Dict[str, Any]] = _run_research_in_worker
+) -> List[Dict[str, Any]]:
+    """Research several queries concurrently, each in its own worker process.
+
+    Args:
+        queries: Independent research queries
+        memory: Picklable snapshot of global memory to seed each worker with
+        max_workers: Upper bound on concurrently running research agents
+        worker: Function executed in the worker processes for each query
+
+    Returns:
+        One result dict per query, in query order, holding the worker's new memory entries
+    """
+    scope = current_scope()
+    jobs = [{'query': query, 'memory': memory, 'usage_scope': scope} for query in queries]
+    # Spawned workers start from a clean interpreter rather than a fork of a
+    # process that owns console, HTTP and signal handling state.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))), mp_context=context) as executor:
+        results = list(executor.map(worker, jobs))
+    for result in results:
+        get_ledger().merge(result.pop('usage', ()))
+    return results
@@ -0,0 +1,210 @@
+"""Relevance ranking of memory entries for prompts.
+
+Key facts, key snippets and research notes are indexed in a local inverted
+index and scored against the task or question of a prompt with BM25, so that
+prompt builders can include the entries relevant to it rather than all of
+memory. No embedding model or service is involved.
+
+Terms are lowercased words and numbers; identifiers are split at underscores,
+dots and camelCase humps and also indexed whole, so that 'get_memory_value'
+matches both 'memory' and 'get_memory_value'.
+
+The index of a memory is kept in step with it incrementally: on every search,
+entries whose record changed since the last one are re-indexed and removed
+entries are dropped, so the cost of keeping it current is proportional to
+what changed rather than to the size of memory. Collections with a version
+are not even scanned while their version is unchanged.
+"""
+
+import heapq
+import math
+import re
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z0-9_.]+")
+_PART_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+# Words too common in tasks and findings to tell entries apart
+STOP_WORDS = frozenset("""
+a an and are as at be but by can do does for from has have how if in into is it its
+not of on or so that the their then there these this to was were what when where which
+while who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index terms."""
+    terms = []
+    for identifier in _IDENTIFIER_PATTERN.findall(text):
+        parts = [part.lower() for part in _PART_PATTERN.findall(identifier)]
+        terms.extend(part for part in parts if len(part) > 1 and part not in STOP_WORDS)
+        if len(parts) > 1:
+            terms.append(identifier.strip('._').lower())
+    return terms
+
+
+class BM25Index:
+    """Inverted index of documents, scored against queries with BM25."""
+
+    def __init__(self):
+        # Term to the documents containing it and its frequency in each
+        self._postings: Dict[str, Dict[Hashable, int]] = {}
+        # Document to its terms and their frequencies, for removal
+        self._documents: Dict[Hashable, Dict[str, int]] = {}
+        self._lengths: Dict[Hashable, int] = {}
+        self._total_length = 0
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index a document, replacing an earlier version under the same key."""
+        if key in self._documents:
+            self.remove(key)
+        frequencies: Dict[str, int] = {}
+        terms = tokenize(text)
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, {})[key] = frequency
+        self._documents[key] = frequencies
+        self._lengths[key] = len(terms)
+        self._total_length += len(terms)
+
+    def remove(self, key: Hashable) -> None:
+        """Drop a document from the index, if present."""
+        frequencies = self._documents.pop(key, None)
+        if frequencies is None:
+            return
+        for term in frequencies:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(key)
+
+    def scores(self, query: str) -> Dict[Hashable, float]:
+        """Return the BM25 score of every document sharing a term with the query."""
+        count = len(self._documents)
+        if not count:
+            return {}
+        average_length = self._total_length / count or 1.0
+        scores: Dict[Hashable, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[key] / average_length)
+                scores[key] = scores.get(key, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query: str, k: int) -> List[Tuple[Hashable, float]]:
+        """Return the k best matching documents and their scores, best first."""
+        return heapq.nlargest(k, self.scores(query).items(), key=lambda item: item[1])
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._documents
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+
+class MemoryIndex:
+    """BM25 indexes of the collections of a memory, brought up to date on every search."""
+
+    def __init__(self):
+        self._indexes: Dict[str, BM25Index] = {}
+        # Collection to the record each of its entries was indexed from
+        self._indexed: Dict[str, Dict[Hashable, Any]] = {}
+        # Collection to the version of it last indexed, for collections that have one
+        self._versions: Dict[str, Tuple[Any, int]] = {}
+        # Collection to the last selection made from it, with what it was made for
+        self.selections: Dict[str, Tuple[Any, Hashable, List[Tuple[str, int]]]] = {}
+
+    def scores(
+        self,
+        collection: str,
+        entries: Mapping[Hashable, Any],
+        text_of: Callable[[Any], str],
+        query: str,
+        version: Optional[int] = None
+    ) -> Dict[Hashable, float]:
+        """Score the entries of a collection against a query.
+
+        Args:
+            collection: Name of the collection, such as 'key_facts'
+            entries: Current entries of the collection, keyed by ID
+            text_of: Returns the text to index of a record
+            query: Task or question to rank the entries for
+            version: Version of the entries, if they have one; the index is not
+                brought up to date while it stays the same
+
+        Returns:
+            Score of each entry sharing a term with the query
+        """
+        index = self._indexes.setdefault(collection, BM25Index())
+        if version is not None:
+            last = self._versions.get(collection)
+            if last is not None and last[0] is entries and last[1] == version:
+                return index.scores(query)
+            self._versions[collection] = (entries, version)
+        else:
+            self._versions.pop(collection, None)
+        indexed = self._indexed.setdefault(collection, {})
+        for key, record in entries.items():
+            # Records are replaced rather than modified, so identity tells what changed
+            if indexed.get(key) is not record:
+                index.add(key, text_of(record))
+                indexed[key] = record
+        if len(indexed) > len(entries):
+            for key in [key for key in indexed if key not in entries]:
+                index.remove(key)
+                del indexed[key]
+        return index.scores(query)
+
+
+def select_relevant(
+    entries: Iterable[Tuple[Hashable, str, int]],
+    scores: Mapping[Hashable, float],
+    top_k: Optional[int],
+    max_tokens: Optional[int],
+    count_tokens: Callable[[str], int]
+) -> List[Tuple[str, int]]:
+    """Pick the entries most relevant to a query that fit a token budget.
+
+    Entries are ranked by score, then priority, then age, newest first, so
+    that with few matches the most important entries fill the remaining
+    places. Entries larger than what is left of the budget are skipped.
+
+    Args:
+        entries: (key, formatted text, priority) of each entry, oldest first
+        scores: Query score of each entry; missing entries score 0
+        top_k: Maximum number of entries, or None for no limit
+        max_tokens: Token budget of the selected entries, or None for no limit
+        count_tokens: Estimates the tokens of a text
+
+    Returns:
+        (formatted text, priority) of the selected entries, in their original order
+    """
+    entries = list(entries)
+    ranked = sorted(
+        range(len(entries)),
+        key=lambda position: (scores.get(entries[position][0], 0.0), entries[position][2], position),
+        reverse=True
+    )
+    selected = []
+    remaining = max_tokens
+    for position in ranked:
+        if top_k is not None and len(selected) >= top_k:
+            break
+        text = entries[position][1]
+        if remaining is not None:
+            tokens = count_tokens(text)
+            if tokens > remaining:
+                continue
+            remaining -= tokens
+        selected.append(position)
+    return [(entries[position][1], entries[position][2]) for position in sorted(selected)]
@@ -0,0 +1,295 @@
+"""Parallel scheduling of planned implementation tasks.
+
+The planning agent may declare, for every task, the files it touches and the
+tasks it depends on. Tasks are grouped into waves: a wave only contains tasks
+whose dependencies are complete and whose file sets do not overlap. Each task
+of a wave runs in its own process inside an isolated git worktree, and the
+resulting patches are applied back to the main working tree once the wave
+finishes.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from git import Repo
+from git.exc import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+
+from sparc_cli.config import DEFAULT_MAX_PARALLEL_TASKS
+from sparc_cli.ledger import current_scope, get_ledger
+from sparc_cli.tool_cache import invalidate_tool_cache
+
+# Identity used for the throwaway snapshot commits backing task worktrees
+SNAPSHOT_GIT_ENV = {
+    'GIT_AUTHOR_NAME': 'sparc',
+    'GIT_AUTHOR_EMAIL': 'sparc@localhost',
+    'GIT_COMMITTER_NAME': 'sparc',
+    'GIT_COMMITTER_EMAIL': 'sparc@localhost',
+}
+
+
+def build_task_waves(
+    task_ids: List[int],
+    task_files: Dict[int, List[str]],
+    task_dependencies: Dict[int, List[int]]
+) -> List[List[int]]:
+    """Group tasks into waves that can be implemented concurrently.
+
+    Tasks are considered in ID order. A task joins the current wave once all of its
+    dependencies ran in an earlier wave and none of its files are claimed by another
+    task of the wave. Tasks that do not declare any files may touch anything, so they
+    always run alone.
+
+    Args:
+        task_ids: IDs of the tasks to schedule
+        task_files: Files declared per task ID
+        task_dependencies: Dependency task IDs declared per task ID
+
+    Returns:
+        List of waves, each a list of task IDs
+
+    Raises:
+        ValueError: If the dependencies contain a cycle
+    """
+    pending = sorted(task_ids)
+    known = set(pending)
+    done: Set[int] = set()
+    waves = []
+
+    while pending:
+        wave: List[int] = []
+        claimed: Set[str] = set()
+        exclusive = False
+
+        for task_id in pending:
+            deps = [dep for dep in task_dependencies.get(task_id, []) if dep in known]
+            if any(dep not in done for dep in deps):
+                continue
+
+            files = {os.path.normpath(f) for f in task_files.get(task_id, [])}
+            if not files:
+                # Undeclared file set: only run on its own
+                if not wave:
+                    wave.append(task_id)
+                    exclusive = True
+                break
+            if exclusive or files & claimed:
+                continue
+            wave.append(task_id)
+            claimed |= files
+
+        if not wave:
+            raise ValueError(f"Circular task dependencies between tasks {pending}")
+
+        waves.append(wave)
+        done.update(wave)
+        pending = [task_id for task_id in pending if task_id not in done]
+
+    return waves
+
+
+def snapshot_working_tree(repo: Repo) -> str:
+    """Record the current working tree, including uncommitted changes, as a commit.
+
+    The user's index, HEAD and branches are left untouched; the commit is only
+    reachable through the returned SHA.
+
+    Args:
+        repo: Repository to snapshot
+
+    Returns:
+        SHA of the snapshot commit
+    """
+    with tempfile.TemporaryDirectory(prefix="sparc_index_") as tmpdir:
+        env = dict(SNAPSHOT_GIT_ENV, GIT_INDEX_FILE=os.path.join(tmpdir, 'index'))
+        has_head = repo.head.is_valid()
+        if has_head:
+            repo.git.read_tree('HEAD', env=env)
+        repo.git.add('-A', env=env)
+        tree = repo.git.write_tree(env=env)
+        parents = ['-p', 'HEAD'] if has_head else []
+        return repo.git.commit_tree(tree, *parents, '-m', 'sparc task snapshot', env=env)
+
+
+def create_task_worktree(repo: Repo, snapshot: str, task_id: int) -> str:
+    """Check out a snapshot into a fresh, detached worktree.
+
+    Args:
+        repo: Main repository
+        snapshot: Commit to check out
+        task_id: Task the worktree is created for
+
+    Returns:
+        Path of the new worktree
+    """
+    path = tempfile.mkdtemp(prefix=f"sparc_task_{task_id}_")
+    # git worktree add requires the target to be absent or empty
+    os.rmdir(path)
+    repo.git.worktree('add', '--detach', path, snapshot)
+    return path
+
+
+def collect_worktree_patch(worktree: str, snapshot: str) -> str:
+    """Return a binary patch of every change made in a worktree since the snapshot.
+
+    Args:
+        worktree: Path of the task worktree
+        snapshot: Commit the worktree was created from
+
+    Returns:
+        Patch text, empty if nothing changed
+    """
+    repo = Repo(worktree)
+    repo.git.add('-A')
+    return repo.git.diff('--cached', '--binary', snapshot, strip_newline_in_stdout=False)
+
+
+def apply_patch(repo: Repo, patch: str) -> None:
+    """Apply a patch produced by collect_worktree_patch to the main working tree.
+
+    Args:
+        repo: Main repository
+        patch: Patch text
+
+    Raises:
+        GitCommandError: If the patch does not apply cleanly
+    """
+    if not patch.strip():
+        return
+    with tempfile.NamedTemporaryFile('w', suffix='.patch', delete=False) as f:
+        f.write(patch)
+        patch_path = f.name
+    try:
+        repo.git.apply('--binary', '--whitespace=nowarn', patch_path)
+    finally:
+        os.remove(patch_path)
+        invalidate_tool_cache()
+
+
+def remove_task_worktree(repo: Repo, worktree: str) -> None:
+    """Remove a task worktree and its administrative files."""
+    try:
+        repo.git.worktree('remove', '--force', worktree)
+    except GitCommandError:
+        shutil.rmtree(worktree, ignore_errors=True)
+        repo.git.worktree('prune')
+
+
+def _run_task_in_worktree(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker entry point: implement one task inside its worktree.
+
+    Runs in a separate process, so global memory is seeded from the parent's
+    snapshot and only entries created by this task are sent back.
+    """
+    from sparc_cli.tools.memory import _global_memory, memory_entries_since
+    from sparc_cli.llm import get_llm
+    from sparc_cli.agent_utils import run_task_implementation_agent
+    from sparc_cli.ledger import get_ledger, restored_scope
+
+    os.chdir(job['worktree'])
+    _global_memory.update(job['memory'])
+    config = _global_memory.get('config', {})
+
+    # Pool processes are reused, so only report the usage of this job
+    usage_start = len(get_ledger().entries)
+    success = True
+    reason = None
+    try:
+        model = get_llm(
+            config.get('provider', 'anthropic'),
+            config.get('model', 'claude-3-5-sonnet-20241022')
+        )
+        with restored_scope(job['usage_scope']):
+            run_task_implementation_agent(
+                base_task=_global_memory.get('base_task', ''),
+                tasks=job['tasks'],
+                task=job['task'],
+                plan=_global_memory.get('plan', ''),
+                related_files=list(_global_memory['related_files'].values()),
+                model=model,
+                expert_enabled=True,
+                config=config
+            )
+    except Exception as e:
+        success = False
+        reason = f"error: {str(e)}"
+
+    return {
+        'task_id': job['task_id'],
+        'success': success,
+        'reason': reason,
+        'completion_message': _global_memory.get('completion_message', ''),
+        'patch': collect_worktree_patch(job['worktree'], job['snapshot']),
+        'usage': get_ledger().entries[usage_start:],
+        **memory_entries_since(job['memory']),
+    }
+
+
+def run_wave_in_worktrees(
+    wave: List[int],
+    tasks: Dict[int, str],
+    memory: Dict[str, Any],
+    *,
+    repo_path: str = ".",
+    max_workers: int = DEFAULT_MAX_PARALLEL_TASKS,
+    worker: Callable[[Dict[str, Any]], Dict[str, Any]] = _run_task_in_worktree
+) -> List[Dict[str, Any]]:
+    """Implement the tasks of one wave concurrently and merge their changes back.
+
+    Args:
+        wave: Task IDs to implement; their file sets must not overlap
+        tasks: All task specifications by ID
+        memory: Picklable snapshot of global memory to seed each worker with
+        repo_path: Path of the main repository
+        max_workers: Upper bound on concurrently running tasks
+        worker: Function executed in the worker processes for each task
+
+    Returns:
+        One result dict per task, in wave order
+    """
+    repo = Repo(repo_path)
+    snapshot = snapshot_working_tree(repo)
+    task_list = [tasks[task_id] for task_id in sorted(tasks)]
+    worktrees = {task_id: create_task_worktree(repo, snapshot, task_id) for task_id in wave}
+
+    try:
+        jobs = [
+            {
+                'task_id': task_id,
+                'task': tasks[task_id],
+                'tasks': task_list,
+                'worktree': worktrees[task_id],
+                'snapshot': snapshot,
+                'memory': memory,
+                'usage_scope': current_scope(),
+            }
+            for task_id in wave
+        ]
+        # Spawned workers start from a clean interpreter rather than a fork of a
+        # process that owns console, HTTP and signal handling state.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))), mp_context=context) as executor:
+            results = list(executor.map(worker, jobs))
+
+        for result in results:
+            get_ledger().merge(result.pop('usage', ()))
+            try:
+                apply_patch(repo, result['patch'])
+            except GitCommandError as e:
+                result['success'] = False
+                result['reason'] = f"error: could not merge changes back: {e.stderr.strip() if e.stderr else e}"
+        return results
+    finally:
+        for worktree in worktrees.values():
+            remove_task_worktree(repo, worktree)
+
+
+def find_repo_root(path: str = ".") -> Optional[str]:
+    """Return the root of the git repository containing path, if any."""
+    try:
+        return Repo(path, search_parent_directories=True).working_tree_dir
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return None
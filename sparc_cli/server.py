@@ -0,0 +1,510 @@
+"""HTTP server running submitted tasks on a pool of warm worker processes.
+
+Started by `sparc --non-interactive`. Tasks are submitted as JSON objects
+shaped like the lines of a `sparc batch` manifest and kept in a persistent
+queue in .sparc/server.db, so jobs that were queued or running when the
+server stopped are run again when it starts. Each worker process imports the
+agents once and keeps its model clients and connection pools between jobs;
+memory, tool cache and tracer are reset before every job.
+
+Endpoints:
+    POST   /jobs              Submit a task, returns the job
+    GET    /jobs              List all jobs
+    GET    /jobs/{id}         Status and result of a job
+    GET    /jobs/{id}/events  Server-sent events: status changes and the spans of the job's trace
+    DELETE /jobs/{id}         Cancel a queued or running job
+    GET    /health            Number of queued and running jobs
+
+If SPARC_SERVER_TOKEN is set, every request needs the header
+`Authorization: Bearer <token>`. Jobs run shell commands without confirmation,
+so the server only listens on interfaces other than loopback when it is set.
+"""
+
+import asyncio
+import ipaddress
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from rich.console import Console
+from rich.panel import Panel
+
+from sparc_cli.batch import parse_task, run_task
+from sparc_cli.config import DEFAULT_SERVER_PORT, DEFAULT_SERVER_WORKERS
+from sparc_cli.storage import ensure_sparc_dir
+
+SERVER_DB_NAME = 'server.db'
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = frozenset({'succeeded', 'failed', 'cancelled'})
+
+# Events kept per unfinished job, replayed to clients subscribing late
+MAX_JOB_EVENTS = 1000
+
+# Seconds between reads of a running job's trace for new spans
+TRACE_POLL_INTERVAL = 0.25
+
+MAX_REQUEST_BYTES = 1024 * 1024
+
+_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+            405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large'}
+
+console = Console()
+
+
+class JobStore:
+    """Jobs and their results, persisted in SQLite.
+
+    Only used from the server's event loop thread.
+    """
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                       id TEXT PRIMARY KEY,
+                       task TEXT NOT NULL,
+                       status TEXT NOT NULL,
+                       result TEXT,
+                       created_at REAL NOT NULL,
+                       started_at REAL,
+                       finished_at REAL
+                   )"""
+            )
+
+    def add(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a job for a task.
+
+        Raises:
+            KeyError: If a job with the task's ID exists
+        """
+        try:
+            with self._connection:
+                self._connection.execute(
+                    'INSERT INTO jobs (id, task, status, created_at) VALUES (?, ?, ?, ?)',
+                    (task['id'], json.dumps(task), 'queued', time.time())
+                )
+        except sqlite3.IntegrityError:
+            raise KeyError(task['id'])
+        return self.get(task['id'])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [_job(row) for row in self._connection.execute('SELECT * FROM jobs ORDER BY created_at, rowid')]
+
+    def set_status(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None) -> None:
+        now = time.time()
+        with self._connection:
+            if status == 'running':
+                self._connection.execute('UPDATE jobs SET status = ?, started_at = ? WHERE id = ?',
+                                         (status, now, job_id))
+            elif status in FINISHED_STATUSES:
+                self._connection.execute('UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?',
+                                         (status, json.dumps(result, default=str) if result else None, now, job_id))
+            else:
+                self._connection.execute('UPDATE jobs SET status = ? WHERE id = ?', (status, job_id))
+
+    def requeue_interrupted(self) -> List[str]:
+        """Queue jobs left running by a previous server again, and return all queued job IDs in order."""
+        with self._connection:
+            self._connection.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+        rows = self._connection.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at, rowid")
+        return [row['id'] for row in rows]
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def _job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job['task'] = json.loads(job['task'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+def _worker_main(connection, run_job: Callable[[Dict[str, Any]], Dict[str, Any]]) -> None:
+    """Worker process loop: run the jobs received on the connection one at a time, each from fresh state."""
+    from sparc_cli.session import Session, use_session
+    from sparc_cli.tool_cache import invalidate_tool_cache
+    from sparc_cli.tracing import reset_tracer
+    # Loaded once and shared by every job of this worker
+    import sparc_cli.agent_utils  # noqa: F401
+
+    # Ctrl-C reaches the whole process group; the server stops its workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cwd = os.getcwd()
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        invalidate_tool_cache()
+        reset_tracer()
+        os.chdir(cwd)
+        with use_session(Session()):
+            result = run_job(job)
+        connection.send(result)
+
+
+class _Worker:
+    """A worker process and the connection jobs are sent to it over."""
+
+    def __init__(self, context, run_job: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self._context = context
+        self._run_job = run_job
+        self.start()
+
+    def start(self) -> None:
+        self.connection, child_connection = self._context.Pipe()
+        # Not a daemon, since tasks may start worker processes of their own
+        self.process = self._context.Process(target=_worker_main, args=(child_connection, self._run_job))
+        self.process.start()
+        child_connection.close()
+
+    async def run(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a job and return its result.
+
+        Raises:
+            EOFError: If the process exited, for instance by being cancelled, before returning a result
+        """
+        self.connection.send(job)
+        return await asyncio.to_thread(self.connection.recv)
+
+    def kill(self) -> None:
+        self.process.terminate()
+
+    def restart(self) -> None:
+        self.process.join()
+        self.connection.close()
+        self.start()
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+
+class JobServer:
+    """Queue of jobs served over HTTP and run on a pool of worker processes."""
+
+    def __init__(
+        self,
+        root: str = '.',
+        *,
+        workers: int = DEFAULT_SERVER_WORKERS,
+        token: Optional[str] = None,
+        run_job: Callable[[Dict[str, Any]], Dict[str, Any]] = run_task
+    ):
+        """
+        Args:
+            root: Project directory; jobs are stored in its .sparc directory and repositories resolved against it
+            workers: Number of worker processes, and so of jobs run at a time
+            token: Bearer token required by every request, if set
+            run_job: Function run in the worker processes for each job
+        """
+        self.root = os.path.abspath(root)
+        sparc_dir = ensure_sparc_dir(self.root)
+        self.store = JobStore(os.path.join(sparc_dir, SERVER_DB_NAME))
+        self.artifacts_dir = os.path.join(sparc_dir, 'server')
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+        self.token = token
+        self._worker_count = max(1, workers)
+        self._run_job = run_job
+        self._workers: List[_Worker] = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._running: Dict[str, _Worker] = {}
+        self._events: Dict[str, Deque[Tuple[str, Dict[str, Any]]]] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str, port: int) -> Tuple[str, int]:
+        """Start the workers and listen for requests; returns the address listened on.
+
+        Raises:
+            ValueError: If host is not a loopback address and the server has no token
+        """
+        if not self.token and not is_loopback_host(host):
+            raise ValueError(f"refusing to listen on {host} without SPARC_SERVER_TOKEN set")
+        context = multiprocessing.get_context('spawn')
+        self._workers = [_Worker(context, self._run_job) for _ in range(self._worker_count)]
+        for job_id in self.store.requeue_interrupted():
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._work(worker)) for worker in self._workers]
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self) -> None:
+        """Stop listening and shut the workers down; running jobs are run again on the next start."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for worker in self._workers:
+            await asyncio.to_thread(worker.stop)
+        self.store.close()
+
+    # Jobs
+
+    def submit(self, spec: Any) -> Dict[str, Any]:
+        """Validate and queue a task.
+
+        Raises:
+            ValueError: If the task is invalid
+            KeyError: If a job with the task's ID exists
+        """
+        task = parse_task(spec, self.root, uuid.uuid4().hex)
+        job = self.store.add(task)
+        self._publish(task['id'], 'status', {'id': task['id'], 'status': 'queued'})
+        self._queue.put_nowait(task['id'])
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job; returns the job, or None if there is none with that ID."""
+        job = self.store.get(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return job
+        self.store.set_status(job_id, 'cancelled')
+        worker = self._running.get(job_id)
+        if worker is not None:
+            # The job's worker is restarted once its result is given up on
+            worker.kill()
+        else:
+            self._finish_events(job_id, 'cancelled')
+        return self.store.get(job_id)
+
+    async def _work(self, worker: _Worker) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self.store.get(job_id)
+            if job is None or job['status'] != 'queued':
+                continue
+            task = job['task']
+            paths = {kind: os.path.join(self.artifacts_dir, f"{job_id}.{kind}")
+                     for kind in ('log', 'trace.jsonl', 'session')}
+            # A job run again after a restart continues its trace where it stopped
+            trace_offset = os.path.getsize(paths['trace.jsonl']) if os.path.exists(paths['trace.jsonl']) else 0
+            self.store.set_status(job_id, 'running')
+            self._publish(job_id, 'status', {'id': job_id, 'status': 'running'})
+            self._running[job_id] = worker
+            tail = asyncio.create_task(self._tail_trace(job_id, paths['trace.jsonl'], trace_offset))
+            try:
+                result = await worker.run({
+                    'task': task,
+                    'log_path': paths['log'],
+                    'trace_path': paths['trace.jsonl'],
+                    'session_path': paths['session'],
+                })
+                status = 'succeeded' if result.get('success') else 'failed'
+            except (EOFError, OSError) as e:
+                await asyncio.to_thread(worker.restart)
+                result = None
+                status = 'cancelled'
+                if self.store.get(job_id)['status'] != 'cancelled':
+                    result = {'id': job_id, 'success': False, 'error': f"worker process exited: {e!r}"}
+                    status = 'failed'
+            finally:
+                self._running.pop(job_id, None)
+                tail.cancel()
+                await asyncio.gather(tail, return_exceptions=True)
+            self._read_trace(job_id, paths['trace.jsonl'], trace_offset)
+            self.store.set_status(job_id, status, result)
+            self._finish_events(job_id, status)
+
+    async def _tail_trace(self, job_id: str, path: str, offset: int) -> None:
+        while True:
+            await asyncio.sleep(TRACE_POLL_INTERVAL)
+            offset = self._read_trace(job_id, path, offset)
+
+    def _read_trace(self, job_id: str, path: str, offset: int) -> int:
+        """Publish the spans written to a trace since offset; returns the offset after the last complete line."""
+        if not os.path.exists(path):
+            return offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                self._publish(job_id, 'span', json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return offset + end
+
+    # Events
+
+    def _publish(self, job_id: str, event: str, data: Dict[str, Any]) -> None:
+        self._events.setdefault(job_id, deque(maxlen=MAX_JOB_EVENTS)).append((event, data))
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait((event, data))
+
+    def _finish_events(self, job_id: str, status: str) -> None:
+        job = self.store.get(job_id)
+        self._publish(job_id, 'status', {'id': job_id, 'status': status, 'result': job['result']})
+        for queue in self._subscribers.pop(job_id, ()):
+            queue.put_nowait(None)
+        self._events.pop(job_id, None)
+
+    # HTTP
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, headers, body = await _read_request(reader)
+            if self.token and headers.get('authorization') != f"Bearer {self.token}":
+                await _send_json(writer, 401, {'error': 'missing or wrong bearer token'})
+            else:
+                await self._route(method, path, body, writer)
+        except _HttpError as e:
+            await _send_json(writer, e.status, {'error': e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        parts = [part for part in path.split('/') if part]
+        if parts == ['health']:
+            jobs = self.store.list()
+            await _send_json(writer, 200, {
+                'workers': len(self._workers),
+                'queued': sum(job['status'] == 'queued' for job in jobs),
+                'running': len(self._running),
+            })
+        elif parts == ['jobs'] and method == 'GET':
+            await _send_json(writer, 200, {'jobs': self.store.list()})
+        elif parts == ['jobs'] and method == 'POST':
+            try:
+                job = self.submit(json.loads(body or b'null'))
+            except KeyError as e:
+                raise _HttpError(409, f"job {e.args[0]} exists")
+            except ValueError as e:
+                raise _HttpError(400, str(e))
+            await _send_json(writer, 202, job)
+        elif len(parts) == 2 and parts[0] == 'jobs' and method in ('GET', 'DELETE'):
+            job = self.store.get(parts[1]) if method == 'GET' else self.cancel(parts[1])
+            if job is None:
+                raise _HttpError(404, f"no job {parts[1]}")
+            await _send_json(writer, 200, job)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events' and method == 'GET':
+            await self._stream_events(parts[1], writer)
+        elif parts in (['health'], ['jobs']) or (parts[:1] == ['jobs'] and len(parts) in (2, 3)):
+            raise _HttpError(405, f"{method} is not supported on {path}")
+        else:
+            raise _HttpError(404, f"no route {path}")
+
+    async def _stream_events(self, job_id: str, writer: asyncio.StreamWriter) -> None:
+        job = self.store.get(job_id)
+        if job is None:
+            raise _HttpError(404, f"no job {job_id}")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        if job['status'] in FINISHED_STATUSES:
+            writer.write(_event('status', {'id': job_id, 'status': job['status'], 'result': job['result']}))
+            await writer.drain()
+            return
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in self._events.get(job_id, ()):
+            queue.put_nowait(item)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            while (item := await queue.get()) is not None:
+                writer.write(_event(*item))
+                await writer.drain()
+        finally:
+            self._subscribers.get(job_id, set()).discard(queue)
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+    request_line = (await reader.readline()).decode('latin-1').split()
+    if len(request_line) != 3:
+        raise _HttpError(400, "malformed request line")
+    method, target, _ = request_line
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_REQUEST_BYTES:
+        raise _HttpError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), urlsplit(target).path, headers, body
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, data: Any) -> None:
+    body = json.dumps(data, default=str).encode('utf-8')
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+
+
+def _event(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode('utf-8')
+
+
+def is_loopback_host(host: str) -> bool:
+    """Check whether a host to listen on is only reachable from this machine."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def run_server(host: str = '127.0.0.1', port: int = DEFAULT_SERVER_PORT, workers: int = DEFAULT_SERVER_WORKERS) -> None:
+    """Serve jobs until interrupted.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on
+        workers: Number of worker processes
+    """
+    async def serve() -> None:
+        server = JobServer(workers=workers, token=os.environ.get('SPARC_SERVER_TOKEN'))
+        address = await server.start(host, port)
+        console.print(Panel(
+            f"[bold green]SPARC CLI Server[/bold green]\n\n"
+            f"Listening on http://{address[0]}:{address[1]} with {workers} worker(s).\n"
+            f"Submit tasks with POST /jobs and follow them with GET /jobs/<id>/events.",
+            title="🚀 SPARC CLI",
+            border_style="green"
+        ))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        console.print("\nShutting down...")
@@ -0,0 +1,158 @@
+"""State of the agent session the current code runs in.
+
+A session holds everything an agent run mutates: its memory (facts, tasks,
+config, agent depth), the relevance index over that memory, the expert model
+chosen by its config, the context collected for the next expert question and
+the interruptible sections it is inside of. The current session is kept in a
+context variable, so agents running concurrently on threads or asyncio tasks
+of one process each see their own state when started in their own session:
+
+    with use_session(Session()):
+        run_research_agent(...)
+
+Code that runs outside of any session uses a process-wide default session,
+which is what a single CLI run has always used. Threads started by the agent
+frameworks copy the context of their caller and so stay in its session.
+
+Module-level names such as tools.memory._global_memory and
+tools.expert.expert_context remain usable: they are SessionMapping shims that
+resolve to the current session's state on each access.
+"""
+
+import contextvars
+import copy
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from sparc_cli.memory_store import MemoryStore
+from sparc_cli.retrieval import MemoryIndex
+
+
+class Session:
+    """Per-session state of agent runs."""
+
+    __slots__ = (
+        'memory', 'memory_index', 'expert_model', 'expert_context', 'interruptible_sections', 'interrupted_section'
+    )
+
+    def __init__(self, memory: Optional[MemoryStore] = None):
+        """
+        Args:
+            memory: Memory to start with; defaults to fresh memory with the usual initial values
+        """
+        if memory is None:
+            from sparc_cli.tools.memory import new_memory
+            memory = new_memory()
+        self.memory = memory
+        # Ranks memory entries by relevance to a prompt's task, see sparc_cli.retrieval
+        self.memory_index = MemoryIndex()
+        # Expert model of the session's expert_provider and expert_model config, created on first use
+        self.expert_model: Any = None
+        # Context collected by emit_expert_context for the next ask_expert call
+        self.expert_context: Dict[str, List[str]] = {'text': [], 'files': []}
+        # Interruptible sections entered, innermost last, and the one an interrupt was requested for
+        self.interruptible_sections: List[Any] = []
+        self.interrupted_section: Any = None
+
+
+_current_session: contextvars.ContextVar[Optional[Session]] = contextvars.ContextVar('sparc_session', default=None)
+
+# Session of code running outside of use_session, created on first use
+_default_session: Optional[Session] = None
+_default_session_lock = threading.Lock()
+
+
+def current_session() -> Session:
+    """Return the session the calling code runs in."""
+    session = _current_session.get()
+    if session is not None:
+        return session
+    global _default_session
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = Session()
+    return _default_session
+
+
+@contextmanager
+def use_session(session: Session) -> Iterator[Session]:
+    """Run the code of the block, and everything it starts in copies of its context, in a session."""
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
+class SessionMapping(MutableMapping):
+    """Module-level shim for a mapping attribute of the current session.
+
+    Every access is forwarded to the attribute of the session current at that
+    moment. Copies and pickles are of the session's mapping itself, so saving a
+    deep copy and restoring it later works as with a plain dict.
+    """
+
+    __slots__ = ('_attribute',)
+
+    def __init__(self, attribute: str):
+        self._attribute = attribute
+
+    def target(self) -> Any:
+        """Return the mapping of the current session."""
+        return getattr(current_session(), self._attribute)
+
+    def __getitem__(self, key: Any) -> Any:
+        return getattr(current_session(), self._attribute)[key]
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return getattr(current_session(), self._attribute).get(key, default)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        getattr(current_session(), self._attribute)[key] = value
+
+    def __delitem__(self, key: Any) -> None:
+        del getattr(current_session(), self._attribute)[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.target())
+
+    def __len__(self) -> int:
+        return len(self.target())
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.target()
+
+    def clear(self) -> None:
+        self.target().clear()
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self.target().update(*args, **kwargs)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        return self.target().setdefault(key, default)
+
+    def __getattr__(self, name: str) -> Any:
+        # Attributes of the mapping itself, such as MemoryStore.key_facts
+        if name.startswith('__') or name == '_attribute':
+            raise AttributeError(name)
+        return getattr(self.target(), name)
+
+    def __copy__(self) -> Any:
+        return copy.copy(self.target())
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Any:
+        return copy.deepcopy(self.target(), memo)
+
+    def __reduce_ex__(self, protocol: int) -> Any:
+        return self.target().__reduce_ex__(protocol)
+
+    def __eq__(self, other: object) -> bool:
+        return self.target() == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(self.target())
@@ -0,0 +1,27 @@
+"""Location of sparc's per-project state on disk."""
+
+import os
+
+# Directory, relative to the project root, holding checkpoints and caches
+SPARC_DIR = '.sparc'
+
+
+def ensure_sparc_dir(root: str = '.') -> str:
+    """Create the project state directory if needed and return its path.
+
+    The directory ignores itself for git, so its databases never show up in the
+    user's status or in working tree snapshots.
+
+    Args:
+        root: Project root directory
+
+    Returns:
+        Path of the state directory
+    """
+    path = os.path.join(root, SPARC_DIR)
+    os.makedirs(path, exist_ok=True)
+    gitignore = os.path.join(path, '.gitignore')
+    if not os.path.exists(gitignore):
+        with open(gitignore, 'w') as f:
+            f.write('*\n')
+    return path
@@ -1,3 +1,4 @@
 from .processing import truncate_output
+from .compaction import CompactablePrompt, PromptSection, estimate_tokens, fit_text
 
-__all__ = ['truncate_output']
+__all__ = ['truncate_output', 'CompactablePrompt', 'PromptSection', 'estimate_tokens', 'fit_text']
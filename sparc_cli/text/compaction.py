@@ -0,0 +1,215 @@
+"""Token-budget-aware prompt compaction.
+
+Prompts are built from a template, fixed values and droppable sections such as
+key facts or research notes. When the rendered prompt exceeds its token budget,
+the lowest-value entries (lowest section priority, then lowest entry priority,
+then oldest) are condensed first and dropped next, until the prompt fits.
+
+A prompt may also carry a prefix of static instructions. The prefix is never
+compacted, so it stays byte-identical across agents and providers can cache it.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Default token budget for the initial prompt of an agent, leaving room in the
+# context window for the conversation that follows.
+DEFAULT_MAX_PROMPT_TOKENS = 100000
+
+# Entries are condensed to roughly this many characters before being dropped
+CONDENSED_ENTRY_CHARS = 300
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text without calling a tokenizer.
+
+    Counts words, numbers and punctuation, splitting long words the way BPE
+    tokenizers do, and never reports fewer than one token per four characters.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    pieces = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece[0].isalpha():
+            pieces += 1 + (len(piece) - 1) // 6
+        elif piece[0].isdigit():
+            pieces += 1 + (len(piece) - 1) // 3
+        else:
+            pieces += 1
+    return max(pieces, len(text) // 4)
+
+
+def fit_text(text: str, max_tokens: int) -> str:
+    """Fit plain text into a token budget by eliding lines from the middle.
+
+    The beginning and end of a prompt usually carry the task and the closing
+    instructions, so both are kept and the middle is removed first.
+
+    Args:
+        text: Text to fit
+        max_tokens: Token budget
+
+    Returns:
+        The original text if it fits, otherwise a shortened version
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    lines = text.splitlines(keepends=True)
+    head: List[str] = []
+    tail: List[str] = []
+    used = estimate_tokens("[... 0000000 lines omitted to fit the context window ...]\n")
+    lo, hi = 0, len(lines) - 1
+    take_head = True
+    while lo <= hi:
+        line = lines[lo] if take_head else lines[hi]
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            break
+        used += cost
+        if take_head:
+            head.append(line)
+            lo += 1
+        else:
+            tail.insert(0, line)
+            hi -= 1
+        take_head = not take_head
+
+    if hi < lo:
+        return text
+
+    # Per-line estimates do not add up exactly, so trim until the whole fits
+    while True:
+        omitted = len(lines) - len(head) - len(tail)
+        fitted = "".join(head) + f"[... {omitted} lines omitted to fit the context window ...]\n" + "".join(tail)
+        if estimate_tokens(fitted) <= max_tokens or not (head or tail):
+            return fitted
+        if len(head) > len(tail):
+            head.pop()
+        else:
+            tail.pop(0)
+
+
+@dataclass
+class PromptSection:
+    """A droppable section of a prompt, filled into one template placeholder.
+
+    Entries are ordered oldest first. Sections with a higher priority, and
+    entries with a higher priority within a section, are kept the longest.
+    """
+    name: str
+    entries: List[str]
+    priority: int = 0
+    entry_priorities: Optional[List[int]] = None
+    separator: str = "\n\n"
+
+
+@dataclass
+class CompactablePrompt:
+    """A prompt template whose droppable sections are compacted to fit a budget.
+
+    The prefix template is rendered with the same values and placed before the
+    template, but is never compacted.
+    """
+    template: str
+    sections: List[PromptSection] = field(default_factory=list)
+    values: Dict[str, str] = field(default_factory=dict)
+    prefix: str = ""
+
+    def render(self, max_tokens: Optional[int] = None) -> str:
+        """Render the prompt, compacting sections if it exceeds max_tokens.
+
+        Args:
+            max_tokens: Token budget, or None to render everything
+
+        Returns:
+            The rendered prompt
+        """
+        prefix, body = self.render_parts(max_tokens)
+        return prefix + body
+
+    def render_parts(self, max_tokens: Optional[int] = None) -> Tuple[str, str]:
+        """Render the prefix and the compacted remainder of the prompt separately.
+
+        Args:
+            max_tokens: Token budget for both parts, or None to render everything
+
+        Returns:
+            Tuple of (prefix, body)
+        """
+        prefix = self.prefix.format(**self.values) if self.prefix else ""
+        if max_tokens is not None:
+            max_tokens = max(1, max_tokens - estimate_tokens(prefix))
+        return prefix, self._render_body(max_tokens)
+
+    def _render_body(self, max_tokens: Optional[int]) -> str:
+        entries = {section.name: list(section.entries) for section in self.sections}
+        prompt = self._format(entries, {})
+        if max_tokens is None:
+            return prompt
+
+        total = estimate_tokens(prompt)
+        if total <= max_tokens:
+            return prompt
+
+        # Lowest-value entries first: section priority, entry priority, then age
+        candidates = []
+        for section in self.sections:
+            priorities = section.entry_priorities or [0] * len(section.entries)
+            for index in range(len(section.entries)):
+                candidates.append((section.priority, priorities[index], index, section.name))
+        candidates.sort()
+
+        # First condense entries, then drop them, until the prompt fits
+        for _, _, index, name in candidates:
+            if total <= max_tokens:
+                break
+            entry = entries[name][index]
+            condensed = _condense(entry)
+            total += estimate_tokens(condensed) - estimate_tokens(entry)
+            entries[name][index] = condensed
+
+        dropped: Dict[str, int] = {}
+        for _, _, index, name in candidates:
+            if total <= max_tokens:
+                break
+            total -= estimate_tokens(entries[name][index])
+            entries[name][index] = None
+            dropped[name] = dropped.get(name, 0) + 1
+
+        prompt = self._format(entries, dropped)
+        # Fixed parts alone may still exceed the budget
+        return fit_text(prompt, max_tokens)
+
+    def _format(self, entries: Dict[str, List[Optional[str]]], dropped: Dict[str, int]) -> str:
+        values = dict(self.values)
+        for section in self.sections:
+            kept = [entry for entry in entries[section.name] if entry is not None]
+            text = section.separator.join(kept)
+            if dropped.get(section.name):
+                note = f"({dropped[section.name]} lower-priority entries omitted to fit the context window)"
+                text = section.separator.join([text, note]) if text else note
+            values[section.name] = text
+        return self.template.format(**values)
+
+
+def _condense(entry: str) -> str:
+    """Shorten an entry to its leading lines, keeping headers and references."""
+    if len(entry) <= CONDENSED_ENTRY_CHARS:
+        return entry
+    cut = entry.rfind("\n", 0, CONDENSED_ENTRY_CHARS)
+    if cut <= 0:
+        cut = CONDENSED_ENTRY_CHARS
+    condensed = entry[:cut].rstrip()
+    if condensed.count("```") % 2:
+        condensed += "\n```"
+    return condensed + "\n[... condensed ...]"
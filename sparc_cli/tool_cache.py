@@ -0,0 +1,243 @@
+"""Session cache of the results of read-only tools.
+
+Agents often repeat a file read, search or directory listing with identical
+arguments. Results of these tools are kept for the session, keyed by the tool,
+its arguments and the working directory, and are only reused while a
+fingerprint of the filesystem state they depend on is unchanged: the mtime and
+size of a read file, of every entry of a listed directory tree, or the
+git status of the repository for repository-wide searches.
+
+Any tool that may write files, such as file writes, string replacements, shell
+commands and programming tasks, clears the cache when it runs, which also
+covers changes that the fingerprints cannot see.
+"""
+
+import copy
+import functools
+import inspect
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from rich.console import Console
+
+# Results kept per session; the least recently used are dropped first
+MAX_TOOL_CACHE_ENTRIES = 256
+
+console = Console()
+
+
+def path_fingerprint(path: str) -> Optional[Tuple[int, int]]:
+    """Return the mtime and size of a path, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def tree_fingerprint(path: str, max_depth: int, follow_links: bool = False) -> Optional[Tuple[Any, ...]]:
+    """Return the mtime and size of every entry of a directory tree, down to max_depth levels.
+
+    Args:
+        path: Root directory of the tree
+        max_depth: Number of levels listed; 1 covers the directory's own entries
+        follow_links: Whether linked directories are descended into
+
+    Returns:
+        Fingerprint of the tree, or None if path is not a readable directory
+    """
+    entries: List[Tuple[str, int, int]] = []
+
+    def scan(directory: str, depth: int) -> None:
+        with os.scandir(directory) as scanned:
+            for entry in scanned:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        # The entries of a directory are what is listed, not its own mtime
+                        entries.append((entry.path, -1, -1))
+                    else:
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append((entry.path, stat.st_mtime_ns, stat.st_size))
+                    if depth + 1 < max_depth and entry.is_dir(follow_symlinks=follow_links):
+                        scan(entry.path, depth + 1)
+                except OSError:
+                    entries.append((entry.path, -2, -2))
+
+    try:
+        scan(path, 0)
+    except OSError:
+        return None
+    return tuple(sorted(entries))
+
+
+def _work_tree(path: str) -> Optional[str]:
+    """Return the root of the git working tree containing path, also of linked worktrees."""
+    current = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(current, '.git')):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def _status_paths(records: List[bytes]) -> List[bytes]:
+    """Return the paths of the changed and untracked files in git status --porcelain=v2 -z records."""
+    paths = []
+    records = iter(records)
+    for record in records:
+        kind = record[:1]
+        if kind == b'1':
+            paths.append(record.split(b' ', 8)[8])
+        elif kind == b'2':
+            paths.append(record.split(b' ', 9)[9])
+            # The original path of a rename follows as a record of its own
+            next(records, None)
+        elif kind == b'u':
+            paths.append(record.split(b' ', 10)[10])
+        elif kind == b'?':
+            paths.append(record[2:])
+    return paths
+
+
+def git_status_fingerprint(path: str = '.') -> Optional[Tuple[bytes, Tuple[Any, ...]]]:
+    """Return the state of the git repository containing path, as far as searches of it can see.
+
+    Covers the commit checked out, the index and working tree state of every
+    changed or untracked file, and the mtime and size of those files, so that
+    further edits to an already modified file change it too. Clean files are
+    those of the commit.
+
+    Args:
+        path: Directory inside the repository
+
+    Returns:
+        Fingerprint of the repository, or None if path is not inside one
+    """
+    root = _work_tree(path)
+    if root is None:
+        return None
+    try:
+        status = subprocess.run(
+            ['git', '--no-optional-locks', 'status', '--porcelain=v2', '-z', '--branch', '--untracked-files=all'],
+            cwd=root, capture_output=True, timeout=60
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if status.returncode != 0:
+        return None
+    files = tuple(
+        path_fingerprint(os.path.join(root, os.fsdecode(file)))
+        for file in _status_paths(status.stdout.split(b'\0'))
+    )
+    return status.stdout, files
+
+
+class ToolResultCache:
+    """Bounded, thread-safe map of tool calls to their results and fingerprints."""
+
+    def __init__(self, max_entries: int = MAX_TOOL_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Hashable, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: Hashable, fingerprint: Hashable) -> Tuple[bool, Any]:
+        """Return (True, result) if key was stored with the same fingerprint, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, copy.deepcopy(entry[1])
+
+    def store(self, key: Hashable, fingerprint: Hashable, result: Any) -> None:
+        with self._lock:
+            self._entries[key] = (fingerprint, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_cache = ToolResultCache()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Return the tool result cache of the session."""
+    return _cache
+
+
+def invalidate_tool_cache() -> None:
+    """Forget all cached tool results, after files may have changed."""
+    _cache.clear()
+
+
+def _enabled() -> bool:
+    from sparc_cli.tools.memory import _global_memory
+    return _global_memory.get('config', {}).get('tool_cache', True)
+
+
+def cached_tool_result(fingerprint: Callable[[Dict[str, Any]], Hashable]):
+    """Decorate a read-only tool function so its results are reused while its inputs are unchanged.
+
+    Apply it below @tool.
+
+    Args:
+        fingerprint: Returns the filesystem state the result depends on, given the call's
+            arguments, or None if it cannot be determined, in which case the result is not cached
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled():
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            key = (func.__name__, json.dumps(arguments, sort_keys=True, default=str), os.getcwd())
+            state = fingerprint(arguments)
+            if state is None:
+                return func(*args, **kwargs)
+            found, result = _cache.lookup(key, state)
+            if found:
+                console.print(f"[dim]Reusing result of {func.__name__}, its inputs are unchanged[/dim]")
+                return result
+            result = func(*args, **kwargs)
+            _cache.store(key, state, result)
+            return result
+
+        return wrapper
+    return decorator
+
+
+def invalidates_tool_cache(func: Callable) -> Callable:
+    """Decorate a tool function that may write files so it clears the tool result cache.
+
+    Apply it below @tool.
+    """
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return func(*args, **kwargs)
+        finally:
+            invalidate_tool_cache()
+
+    return wrapper
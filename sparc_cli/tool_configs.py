@@ -1,111 +1,177 @@
-from typing import List
-from sparc_cli.tools import (
-    ask_expert, ask_human, run_shell_command, run_programming_task,
-    emit_research_notes, emit_plan, emit_related_files, emit_task,
-    emit_expert_context, emit_key_facts, delete_key_facts,
-    emit_key_snippets, delete_key_snippets, deregister_related_files, delete_tasks, read_file_tool,
-    fuzzy_find_project_files, ripgrep_search, list_directory_tree,
-    swap_task_order, monorepo_detected, existing_project_detected, ui_detected,
-    task_completed, plan_implementation_completed
-)
-from sparc_cli.tools.math.evaluator import CalculatorTool, SymbolicSolverTool
-from sparc_cli.tools.scrape import scrape_url_tool
-from sparc_cli.tools.memory import one_shot_completed
-from sparc_cli.tools.agent import request_research, request_implementation, request_research_and_implementation, request_task_implementation
+"""Tool sets of each kind of agent.
+
+Tools are looked up by name in a registry and their modules are imported the
+first time a tool is bound to an agent, so commands that never build an agent
+don't pay for playwright, sympy or GitPython.
+"""
+
+from functools import lru_cache
+from importlib import import_module
+from typing import Any, Iterable, List
+
+# Module defining each tool, by the tool's attribute name
+TOOL_MODULES = {
+    'ask_expert': 'sparc_cli.tools.expert',
+    'emit_expert_context': 'sparc_cli.tools.expert',
+    'ask_human': 'sparc_cli.tools.human',
+    'run_shell_command': 'sparc_cli.tools.shell',
+    'run_programming_task': 'sparc_cli.tools.programmer',
+    'read_file_tool': 'sparc_cli.tools.read_file',
+    'fuzzy_find_project_files': 'sparc_cli.tools.fuzzy_find',
+    'ripgrep_search': 'sparc_cli.tools.ripgrep',
+    'list_directory_tree': 'sparc_cli.tools.list_directory',
+    'scrape_url_tool': 'sparc_cli.tools.scrape',
+    'monorepo_detected': 'sparc_cli.tools.research',
+    'existing_project_detected': 'sparc_cli.tools.research',
+    'ui_detected': 'sparc_cli.tools.research',
+    'CalculatorTool': 'sparc_cli.tools.math.evaluator',
+    'SymbolicSolverTool': 'sparc_cli.tools.math.evaluator',
+    'emit_research_notes': 'sparc_cli.tools.memory',
+    'emit_plan': 'sparc_cli.tools.memory',
+    'emit_task': 'sparc_cli.tools.memory',
+    'emit_related_files': 'sparc_cli.tools.memory',
+    'emit_key_facts': 'sparc_cli.tools.memory',
+    'delete_key_facts': 'sparc_cli.tools.memory',
+    'emit_key_snippets': 'sparc_cli.tools.memory',
+    'delete_key_snippets': 'sparc_cli.tools.memory',
+    'deregister_related_files': 'sparc_cli.tools.memory',
+    'delete_tasks': 'sparc_cli.tools.memory',
+    'swap_task_order': 'sparc_cli.tools.memory',
+    'task_completed': 'sparc_cli.tools.memory',
+    'plan_implementation_completed': 'sparc_cli.tools.memory',
+    'one_shot_completed': 'sparc_cli.tools.memory',
+    'request_research': 'sparc_cli.tools.agent',
+    'request_research_batch': 'sparc_cli.tools.agent',
+    'request_implementation': 'sparc_cli.tools.agent',
+    'request_research_and_implementation': 'sparc_cli.tools.agent',
+    'request_task_implementation': 'sparc_cli.tools.agent',
+    'request_planned_tasks_implementation': 'sparc_cli.tools.agent',
+}
+
+# Tools without side effects, which can run concurrently when a model calls several in one turn
+CONCURRENT_SAFE_TOOLS = frozenset({
+    'list_directory_tree',
+    'read_file_tool',
+    'fuzzy_find_project_files',
+    'ripgrep_search',
+    'scrape_url'
+})
+
+@lru_cache(maxsize=None)
+def get_tool(name: str) -> Any:
+    """Import a tool's module and return the tool.
+
+    Args:
+        name: Attribute name of the tool in TOOL_MODULES
+
+    Returns:
+        The tool, or its class for tools that are instantiated per agent
+
+    Raises:
+        KeyError: If the tool is not registered
+    """
+    return getattr(import_module(TOOL_MODULES[name]), name)
+
+def get_tools(names: Iterable[str]) -> List[Any]:
+    """Return the named tools, in order."""
+    return [get_tool(name) for name in names]
 
 # Read-only tools that don't modify system state
+READ_ONLY_TOOLS = (
+    'emit_related_files',
+    'emit_key_facts',
+    'delete_key_facts',
+    'emit_key_snippets',
+    'delete_key_snippets',
+    'deregister_related_files',
+    'list_directory_tree',
+    'read_file_tool',
+    'fuzzy_find_project_files',
+    'ripgrep_search',
+    'run_shell_command',  # can modify files, but we still need it for read-only tasks.
+    'scrape_url_tool'
+)
+
 def get_read_only_tools(human_interaction: bool = False) -> list:
     """Get the list of read-only tools, optionally including human interaction tools."""
-    tools = [
-        emit_related_files,
-        emit_key_facts,
-        delete_key_facts,
-        emit_key_snippets,
-        delete_key_snippets,
-        deregister_related_files,
-        list_directory_tree,
-        read_file_tool,
-        fuzzy_find_project_files,
-        ripgrep_search,
-        run_shell_command, # can modify files, but we still need it for read-only tasks.
-        scrape_url_tool
-    ]
+    tools = get_tools(READ_ONLY_TOOLS)
     
     if human_interaction:
-        tools.append(ask_human)
+        tools.append(get_tool('ask_human'))
     
     return tools
 
 # Define constant tool groups
-READ_ONLY_TOOLS = get_read_only_tools()
-MODIFICATION_TOOLS = [run_programming_task]
-COMMON_TOOLS = READ_ONLY_TOOLS.copy()
-EXPERT_TOOLS = [emit_expert_context, ask_expert]
-RESEARCH_TOOLS = [
-    emit_research_notes,
-    one_shot_completed,
-    monorepo_detected,
-    existing_project_detected,
-    ui_detected
-]
+MODIFICATION_TOOLS = ('run_programming_task',)
+COMMON_TOOLS = READ_ONLY_TOOLS
+EXPERT_TOOLS = ('emit_expert_context', 'ask_expert')
+RESEARCH_TOOLS = (
+    'emit_research_notes',
+    'one_shot_completed',
+    'monorepo_detected',
+    'existing_project_detected',
+    'ui_detected'
+)
 
 def get_research_tools(research_only: bool = False, expert_enabled: bool = True, human_interaction: bool = False) -> list:
     """Get the list of research tools based on mode and whether expert is enabled."""
     # Start with read-only tools
-    tools = get_read_only_tools(human_interaction).copy()
+    tools = get_read_only_tools(human_interaction)
     
-    tools.extend(RESEARCH_TOOLS)
+    tools.extend(get_tools(RESEARCH_TOOLS))
     
     # Add modification tools if not research_only
     if not research_only:
-        tools.extend(MODIFICATION_TOOLS)
-        tools.append(request_implementation)
+        tools.extend(get_tools(MODIFICATION_TOOLS))
+        tools.append(get_tool('request_implementation'))
     
     # Add expert tools if enabled
     if expert_enabled:
-        tools.extend(EXPERT_TOOLS)
+        tools.extend(get_tools(EXPERT_TOOLS))
     
     # Add chat-specific tools
-    tools.append(request_research)
+    tools.append(get_tool('request_research'))
+    tools.append(get_tool('request_research_batch'))
     
     return tools
 
 def get_planning_tools(expert_enabled: bool = True) -> list:
     """Get the list of planning tools based on whether expert is enabled."""
     # Start with common tools
-    tools = COMMON_TOOLS.copy()
+    tools = get_tools(COMMON_TOOLS)
     
     # Add planning-specific tools
-    planning_tools = [
-        delete_tasks,
-        emit_plan,
-        emit_task,
-        swap_task_order,
-        request_task_implementation,
-        plan_implementation_completed
-    ]
+    planning_tools = get_tools([
+        'delete_tasks',
+        'emit_plan',
+        'emit_task',
+        'swap_task_order',
+        'request_task_implementation',
+        'request_planned_tasks_implementation',
+        'plan_implementation_completed'
+    ])
     tools.extend(planning_tools)
     
     # Add expert tools if enabled
     if expert_enabled:
-        tools.extend(EXPERT_TOOLS)
+        tools.extend(get_tools(EXPERT_TOOLS))
     
     return tools
 
 def get_implementation_tools(expert_enabled: bool = True) -> list:
     """Get the list of implementation tools based on whether expert is enabled."""
     # Start with common tools
-    tools = COMMON_TOOLS.copy()
+    tools = get_tools(COMMON_TOOLS)
     
     # Add modification tools since it's not research-only
-    tools.extend(MODIFICATION_TOOLS)
+    tools.extend(get_tools(MODIFICATION_TOOLS))
     tools.extend([
-        task_completed
+        get_tool('task_completed')
     ])
     
     # Add expert tools if enabled
     if expert_enabled:
-        tools.extend(EXPERT_TOOLS)
+        tools.extend(get_tools(EXPERT_TOOLS))
     
     return tools
 
@@ -115,17 +181,17 @@ def get_chat_tools(expert_enabled: bool = True) -> list:
     Chat mode includes research and implementation capabilities but excludes
     complex planning tools. Human interaction is always enabled.
     """
-    tools = [
-        ask_human,
-        request_research,
-        request_research_and_implementation,
-        emit_key_facts,
-        delete_key_facts,
-        delete_key_snippets,
-        deregister_related_files,
-        scrape_url_tool,
-        CalculatorTool(),
-        SymbolicSolverTool()
-    ]
+    tools = get_tools([
+        'ask_human',
+        'request_research',
+        'request_research_batch',
+        'request_research_and_implementation',
+        'emit_key_facts',
+        'delete_key_facts',
+        'delete_key_snippets',
+        'deregister_related_files',
+        'scrape_url_tool'
+    ])
+    tools.extend([get_tool('CalculatorTool')(), get_tool('SymbolicSolverTool')()])
 
     return tools
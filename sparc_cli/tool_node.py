@@ -0,0 +1,94 @@
+"""Tool execution for agent graphs.
+
+Models often request several independent reads in one turn. The tool node runs
+consecutive calls to read-only tools concurrently, bounded by a concurrency limit,
+while calls to tools that change files or memory run alone and in the order the
+model requested them.
+"""
+
+import asyncio
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Union
+
+from langchain_core.messages import ToolCall
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import get_executor_for_config
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from langgraph.store.base import BaseStore
+from langgraph.types import Command
+
+from sparc_cli.config import DEFAULT_MAX_TOOL_CONCURRENCY
+from sparc_cli.tool_configs import CONCURRENT_SAFE_TOOLS
+
+
+def _batches(tool_calls: List[ToolCall], concurrent_tools: Iterable[str]) -> List[List[ToolCall]]:
+    """Split tool calls into runs of concurrency-safe calls and single exclusive calls."""
+    batches: List[List[ToolCall]] = []
+    for call in tool_calls:
+        if call["name"] in concurrent_tools and batches and batches[-1][0]["name"] in concurrent_tools:
+            batches[-1].append(call)
+        else:
+            batches.append([call])
+    return batches
+
+
+class ConcurrentToolNode(ToolNode):
+    """ToolNode that only runs read-only tools concurrently.
+
+    The stock ToolNode runs every call of a turn at once, including writes and
+    shell commands that may depend on each other.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[Union[BaseTool, Callable]],
+        *,
+        max_concurrency: Optional[int] = None,
+        concurrent_tools: Iterable[str] = CONCURRENT_SAFE_TOOLS,
+        **kwargs: Any
+    ):
+        """Create the tool node.
+
+        Args:
+            tools: Tools the agent can call
+            max_concurrency: Maximum number of read-only calls run at once
+            concurrent_tools: Names of tools that are safe to run concurrently
+            **kwargs: Passed to ToolNode
+        """
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max(1, max_concurrency or DEFAULT_MAX_TOOL_CONCURRENCY)
+        self.concurrent_tools = frozenset(concurrent_tools)
+
+    def _func(self, input: Any, config: RunnableConfig, *, store: Optional[BaseStore]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        outputs = []
+        with get_executor_for_config({**config, "max_concurrency": self.max_concurrency}) as executor:
+            for batch in _batches(tool_calls, self.concurrent_tools):
+                if len(batch) == 1:
+                    outputs.append(self._run_one(batch[0], input_type, config))
+                else:
+                    outputs.extend(executor.map(lambda call: self._run_one(call, input_type, config), batch))
+        return self._combine_outputs(outputs, input_type)
+
+    async def _afunc(self, input: Any, config: RunnableConfig, *, store: Optional[BaseStore]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_limited(call: ToolCall) -> Any:
+            async with semaphore:
+                return await self._arun_one(call, input_type, config)
+
+        outputs = []
+        for batch in _batches(tool_calls, self.concurrent_tools):
+            outputs.extend(await asyncio.gather(*(run_limited(call) for call in batch)))
+        return self._combine_outputs(outputs, input_type)
+
+    def _combine_outputs(self, outputs: List[Any], input_type: str) -> Any:
+        """Shape tool outputs into a graph update, as ToolNode does."""
+        if not any(isinstance(output, Command) for output in outputs):
+            return outputs if input_type == "list" else {self.messages_key: outputs}
+        return [
+            output if isinstance(output, Command)
+            else [output] if input_type == "list" else {self.messages_key: [output]}
+            for output in outputs
+        ]
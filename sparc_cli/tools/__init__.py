@@ -1,25 +1,56 @@
-from .shell import run_shell_command
-from .scrape import scrape_url_tool
-from .research import monorepo_detected, existing_project_detected, ui_detected
-from .math.models import BenchmarkRequest, BenchmarkResponse
-from .math.validator import MathValidator
-from .math.evaluator import MathBenchmarkEvaluator
-from .math.agent import MathAgent
-from .human import ask_human
-from .programmer import run_programming_task
-from .expert import ask_expert, emit_expert_context
-from .read_file import read_file_tool
-from .file_str_replace import file_str_replace
-from .write_file import write_file_tool
-from .fuzzy_find import fuzzy_find_project_files
-from .list_directory import list_directory_tree
-from .ripgrep import ripgrep_search
-from .memory import (
-    delete_tasks, emit_research_notes, emit_plan, emit_task, get_memory_value, emit_key_facts,
-    request_implementation, delete_key_facts,
-    emit_key_snippets, delete_key_snippets, emit_related_files, swap_task_order, task_completed,
-    plan_implementation_completed, deregister_related_files
-)
+"""Tools available to the agents.
+
+Tools are imported from their modules on first access, since some of them
+pull in heavy dependencies (playwright, sympy, GitPython) that most commands
+never use.
+"""
+
+from importlib import import_module
+
+_LAZY_EXPORTS = {
+    'run_shell_command': '.shell',
+    'scrape_url_tool': '.scrape',
+    'monorepo_detected': '.research',
+    'existing_project_detected': '.research',
+    'ui_detected': '.research',
+    'BenchmarkRequest': '.math.models',
+    'BenchmarkResponse': '.math.models',
+    'MathValidator': '.math.validator',
+    'MathBenchmarkEvaluator': '.math.evaluator',
+    'MathAgent': '.math.agent',
+    'ask_human': '.human',
+    'run_programming_task': '.programmer',
+    'ask_expert': '.expert',
+    'emit_expert_context': '.expert',
+    'read_file_tool': '.read_file',
+    'file_str_replace': '.file_str_replace',
+    'write_file_tool': '.write_file',
+    'fuzzy_find_project_files': '.fuzzy_find',
+    'list_directory_tree': '.list_directory',
+    'ripgrep_search': '.ripgrep',
+    'delete_tasks': '.memory',
+    'emit_research_notes': '.memory',
+    'emit_plan': '.memory',
+    'emit_task': '.memory',
+    'get_memory_value': '.memory',
+    'emit_key_facts': '.memory',
+    'request_implementation': '.memory',
+    'delete_key_facts': '.memory',
+    'emit_key_snippets': '.memory',
+    'delete_key_snippets': '.memory',
+    'emit_related_files': '.memory',
+    'swap_task_order': '.memory',
+    'task_completed': '.memory',
+    'plan_implementation_completed': '.memory',
+    'deregister_related_files': '.memory',
+}
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     'ask_expert',
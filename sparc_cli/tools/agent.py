@@ -6,11 +6,17 @@ from typing_extensions import TypeAlias
 
 ResearchResult = Dict[str, Union[str, bool, Dict[int, Any], List[Any], None]]
 from rich.console import Console
+from rich.markdown import Markdown
+from rich.panel import Panel
 from sparc_cli.tools.memory import _global_memory
 from sparc_cli.console.formatting import print_error, print_interrupt
-from .memory import get_memory_value, get_related_files, get_work_log, reset_work_log
-from ..llm import initialize_llm
+from .memory import get_memory_value, get_related_files, get_work_log, reset_work_log, merge_memory_entries
+from ..llm import get_llm
+from ..ledger import usage_scope
 from ..console import print_task_header
+from ..checkpoint import session_thread_id
+from ..scheduler import DEFAULT_MAX_PARALLEL_TASKS, build_task_waves, find_repo_root, run_wave_in_worktrees
+from ..research_batch import DEFAULT_MAX_PARALLEL_RESEARCH, run_research_batch
 
 CANCELLED_BY_USER_REASON = "The operation was explicitly cancelled by the user. This typically is an indication that the action requested was not aligned with the user request."
 
@@ -19,6 +25,7 @@ RESEARCH_AGENT_RECURSION_LIMIT = 2
 console = Console()
 
 @tool("request_research")
+@usage_scope("request_research")
 def request_research(query: str) -> ResearchResult:
     """Spawn a research-only agent to investigate the given query.
 
@@ -30,7 +37,7 @@ def request_research(query: str) -> ResearchResult:
     """
     # Initialize model from config
     config = _global_memory.get('config', {})
-    model = initialize_llm(config.get('provider', 'anthropic'), config.get('model', 'claude-3-5-sonnet-20241022'))
+    model = get_llm(config.get('provider', 'anthropic'), config.get('model', 'claude-3-5-sonnet-20241022'))
     
     # Check recursion depth
     current_depth = _global_memory.get('agent_depth', 0)
@@ -58,6 +65,7 @@ def request_research(query: str) -> ResearchResult:
             expert_enabled=True,
             research_only=True,
             hil=config.get('hil', False),
+            config=config,
             console_message=query
         )
     except KeyboardInterrupt:
@@ -92,7 +100,99 @@ def request_research(query: str) -> ResearchResult:
         "reason": reason
     }
 
+@tool("request_research_batch")
+@usage_scope("request_research_batch")
+def request_research_batch(queries: List[str]) -> Dict[str, Any]:
+    """Spawn research-only agents for several independent queries at once.
+
+    Use this instead of consecutive request_research calls when an investigation splits
+    into independent questions, e.g. how authentication, billing and logging each work.
+    Findings of all agents are merged into memory without duplicates.
+
+    Args:
+        queries: Independent research questions, each self-contained
+    """
+    # Drop blank and repeated queries, keeping the order given
+    queries = list(dict.fromkeys(query.strip() for query in queries if query.strip()))
+
+    current_depth = _global_memory.get('agent_depth', 0)
+    if current_depth >= RESEARCH_AGENT_RECURSION_LIMIT:
+        print_error("Maximum research recursion depth reached")
+        return {
+            "query_results": [],
+            "key_facts": get_memory_value("key_facts"),
+            "related_files": get_related_files(),
+            "research_notes": get_memory_value("research_notes"),
+            "key_snippets": get_memory_value("key_snippets"),
+            "success": False,
+            "reason": "max_depth_exceeded"
+        }
+
+    # Parallel workers cannot prompt the user, so fall back to serial execution
+    # whenever shell approvals or human interaction may be needed.
+    config = _global_memory.get('config', {})
+    max_workers = config.get('max_parallel_research', DEFAULT_MAX_PARALLEL_RESEARCH)
+    parallel = max_workers > 1 and len(queries) > 1 and config.get('cowboy_mode', False) and not config.get('hil', False)
+
+    query_results = []
+    success = True
+    reason = None
+    try:
+        if parallel:
+            for query in queries:
+                console.print(Panel(Markdown(query), title="🔬 Looking into it..."))
+            for result in run_research_batch(queries, dict(_global_memory), max_workers=max_workers):
+                merge_memory_entries(
+                    result['key_facts'],
+                    result['key_snippets'],
+                    result['related_files'],
+                    result['research_notes']
+                )
+                query_results.append({key: result[key] for key in ('query', 'success', 'reason', 'completion_message')})
+        else:
+            for query in queries:
+                result = request_research.invoke({"query": query})
+                query_results.append({
+                    "query": query,
+                    "success": result['success'],
+                    "reason": result['reason'],
+                    "completion_message": result['completion_message']
+                })
+    except KeyboardInterrupt:
+        print_interrupt("Research interrupted by user")
+        success = False
+        reason = CANCELLED_BY_USER_REASON
+    except Exception as e:
+        print_error(f"Error during research: {str(e)}")
+        success = False
+        reason = f"error: {str(e)}"
+
+    if success and not all(result['success'] for result in query_results):
+        success = False
+        reason = "One or more research queries failed."
+
+    # Get and reset work log if at root depth
+    work_log = get_work_log() if current_depth == 1 else None
+    if current_depth == 1:
+        reset_work_log()
+
+    # Clear completion state from global memory
+    _global_memory['completion_message'] = ''
+    _global_memory['task_completed'] = False
+
+    return {
+        "work_log": work_log,
+        "query_results": query_results,
+        "key_facts": get_memory_value("key_facts"),
+        "related_files": get_related_files(),
+        "research_notes": get_memory_value("research_notes"),
+        "key_snippets": get_memory_value("key_snippets"),
+        "success": success,
+        "reason": reason
+    }
+
 @tool("request_research_and_implementation")
+@usage_scope("request_research_and_implementation")
 def request_research_and_implementation(query: str) -> Dict[str, Any]:
     """Spawn a research agent to investigate and implement the given query.
     
@@ -101,7 +201,7 @@ def request_research_and_implementation(query: str) -> Dict[str, Any]:
     """
     # Initialize model from config
     config = _global_memory.get('config', {})
-    model = initialize_llm(config.get('provider', 'anthropic'), config.get('model', 'claude-3-5-sonnet-20241022'))
+    model = get_llm(config.get('provider', 'anthropic'), config.get('model', 'claude-3-5-sonnet-20241022'))
     
     try:
         # Run research agent
@@ -112,6 +212,8 @@ def request_research_and_implementation(query: str) -> Dict[str, Any]:
             expert_enabled=True,
             research_only=False,
             hil=config.get('hil', False),
+            config=config,
+            thread_id=session_thread_id('research_and_implementation', query),
             console_message=query
         )
         
@@ -152,6 +254,7 @@ def request_research_and_implementation(query: str) -> Dict[str, Any]:
     }
 
 @tool("request_task_implementation")
+@usage_scope("request_task_implementation")
 def request_task_implementation(task_spec: str) -> Dict[str, Any]:
     """Spawn an implementation agent to execute the given task.
     
@@ -160,7 +263,7 @@ def request_task_implementation(task_spec: str) -> Dict[str, Any]:
     """
     # Initialize model from config
     config = _global_memory.get('config', {})
-    model = initialize_llm(config.get('provider', 'anthropic'), config.get('model', 'claude-3-5-sonnet-20241022'))
+    model = get_llm(config.get('provider', 'anthropic'), config.get('model', 'claude-3-5-sonnet-20241022'))
     
     # Get required parameters
     tasks = [_global_memory['tasks'][task_id] for task_id in sorted(_global_memory['tasks'])]
@@ -178,7 +281,8 @@ def request_task_implementation(task_spec: str) -> Dict[str, Any]:
             plan=plan, 
             related_files=related_files,
             model=model,
-            expert_enabled=True
+            expert_enabled=True,
+            config=config
         )
         
         success = True
@@ -215,7 +319,106 @@ def request_task_implementation(task_spec: str) -> Dict[str, Any]:
         "reason": reason
     }
 
+@tool("request_planned_tasks_implementation")
+@usage_scope("request_planned_tasks_implementation")
+def request_planned_tasks_implementation() -> Dict[str, Any]:
+    """Spawn implementation agents for every emitted task, running independent tasks in parallel.
+
+    Tasks run after the tasks they depend on. Tasks whose declared files do not overlap
+    run at the same time in isolated worktrees and their changes are merged back afterwards.
+    Tasks that do not declare their files run one at a time.
+    """
+    tasks = dict(_global_memory['tasks'])
+    if not tasks:
+        return {
+            "task_results": [],
+            "success": False,
+            "reason": "No tasks have been emitted."
+        }
+
+    try:
+        waves = build_task_waves(
+            list(tasks),
+            _global_memory.get('task_files', {}),
+            _global_memory.get('task_dependencies', {})
+        )
+    except ValueError as e:
+        print_error(str(e))
+        return {
+            "task_results": [],
+            "success": False,
+            "reason": f"error: {str(e)}"
+        }
+
+    # Parallel workers cannot prompt the user, so fall back to serial execution
+    # whenever shell approvals or human interaction may be needed.
+    config = _global_memory.get('config', {})
+    max_workers = config.get('max_parallel_tasks', DEFAULT_MAX_PARALLEL_TASKS)
+    repo_root = find_repo_root()
+    parallel = max_workers > 1 and config.get('cowboy_mode', False) and not config.get('hil', False) and repo_root is not None
+
+    task_results = []
+    success = True
+    reason = None
+    try:
+        for wave in waves:
+            if parallel and len(wave) > 1:
+                for task_id in wave:
+                    print_task_header(tasks[task_id])
+                wave_results = run_wave_in_worktrees(
+                    wave,
+                    tasks,
+                    dict(_global_memory),
+                    repo_path=repo_root,
+                    max_workers=max_workers
+                )
+                for result in wave_results:
+                    merge_memory_entries(result['key_facts'], result['key_snippets'], result['related_files'])
+                    task_results.append({key: result[key] for key in ('task_id', 'success', 'reason', 'completion_message')})
+            else:
+                for task_id in wave:
+                    result = request_task_implementation.invoke({"task_spec": tasks[task_id]})
+                    task_results.append({
+                        "task_id": task_id,
+                        "success": result['success'],
+                        "reason": result['reason'],
+                        "completion_message": result['completion_message']
+                    })
+    except KeyboardInterrupt:
+        print_interrupt("Task implementation interrupted by user")
+        success = False
+        reason = CANCELLED_BY_USER_REASON
+    except Exception as e:
+        print_error(f"Error during task implementation: {str(e)}")
+        success = False
+        reason = f"error: {str(e)}"
+
+    if success and not all(result['success'] for result in task_results):
+        success = False
+        reason = "One or more tasks failed."
+
+    # Get and reset work log if at root depth
+    current_depth = _global_memory.get('agent_depth', 0)
+    work_log = get_work_log() if current_depth == 1 else None
+    if current_depth == 1:
+        reset_work_log()
+
+    # Clear completion state from global memory
+    _global_memory['completion_message'] = ''
+    _global_memory['task_completed'] = False
+
+    return {
+        "work_log": work_log,
+        "task_results": task_results,
+        "key_facts": get_memory_value("key_facts"),
+        "related_files": get_related_files(),
+        "key_snippets": get_memory_value("key_snippets"),
+        "success": success,
+        "reason": reason
+    }
+
 @tool("request_implementation")
+@usage_scope("request_implementation")
 def request_implementation(task_spec: str) -> Dict[str, Any]:
     """Spawn a planning agent to create an implementation plan for the given task.
     
@@ -224,7 +427,7 @@ def request_implementation(task_spec: str) -> Dict[str, Any]:
     """
     # Initialize model from config
     config = _global_memory.get('config', {})
-    model = initialize_llm(config.get('provider', 'anthropic'), config.get('model', 'claude-3-5-sonnet-20241022'))
+    model = get_llm(config.get('provider', 'anthropic'), config.get('model', 'claude-3-5-sonnet-20241022'))
     
     try:
         # Run planning agent
@@ -4,30 +4,31 @@ from langchain_core.tools import tool
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
-from ..llm import initialize_expert_llm
-from .memory import get_memory_value, get_related_files, _global_memory
+from ..llm import get_llm
+from ..ledger import usage_scope
+from ..llm_cache import with_response_cache
+from ..session import SessionMapping, current_session
+from .memory import get_relevant_memory_value, get_related_files, _global_memory
 
 console = Console()
-_model = None
 
 def get_model():
-    global _model
+    """Return the expert model of the session, creating it from the session's config on first use."""
+    session = current_session()
     try:
-        if _model is None:
+        if session.expert_model is None:
             provider = _global_memory['config']['expert_provider'] or 'openai'
             model = _global_memory['config']['expert_model'] or 'o1-preview'
-            _model = initialize_expert_llm(provider, model)
+            session.expert_model = with_response_cache(get_llm(provider, model, expert=True), 'expert')
     except Exception as e:
-        _model = None
+        session.expert_model = None
         console.print(Panel(f"Failed to initialize expert model: {e}", title="Error", border_style="red"))
         raise
-    return _model
+    return session.expert_model
 
-# Keep track of context globally
-expert_context = {
-    'text': [],    # Additional textual context
-    'files': []    # File paths to include
-}
+# Context for the next expert question, kept per session:
+# 'text' holds additional textual context, 'files' file paths to include
+expert_context = SessionMapping('expert_context')
 
 @tool("emit_expert_context")
 def emit_expert_context(context: str) -> str:
@@ -109,6 +110,7 @@ def read_related_files(file_paths: List[str]) -> str:
     return read_files_with_limit(file_paths, max_lines=10000)
 
 @tool("ask_expert")
+@usage_scope("ask_expert")
 def ask_expert(question: str) -> str:
     """Ask a question to an expert AI model.
 
@@ -130,8 +132,9 @@ def ask_expert(question: str) -> str:
     # Get all content first
     file_paths = expert_context['files'] + list(get_related_files())
     related_contents = read_related_files(file_paths)
-    key_snippets = get_memory_value('key_snippets')
-    key_facts = get_memory_value('key_facts')
+    # Only the findings relevant to the question
+    key_snippets = get_relevant_memory_value('key_snippets', question)
+    key_facts = get_relevant_memory_value('key_facts', question)
     
     # Build display query (just question)
     display_query = "# Question\n" + question
@@ -4,6 +4,7 @@ from pathlib import Path
 from rich.panel import Panel
 from sparc_cli.console import console
 from sparc_cli.console.formatting import print_error
+from sparc_cli.tool_cache import invalidates_tool_cache
 
 def truncate_display_str(s: str, max_length: int = 30) -> str:
     """Truncate a string for display purposes if it exceeds max length.
@@ -34,6 +35,7 @@ def format_string_for_display(s: str, threshold: int = 30) -> str:
     return f'[{len(s)} characters]'
 
 @tool
+@invalidates_tool_cache
 def file_str_replace(
     filepath: str,
     old_str: str,
@@ -6,6 +6,7 @@ from langchain_core.tools import tool
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
+from sparc_cli.tool_cache import cached_tool_result, git_status_fingerprint
 
 console = Console()
 
@@ -19,6 +20,7 @@ DEFAULT_EXCLUDE_PATTERNS = [
 ]
 
 @tool
+@cached_tool_result(lambda args: git_status_fingerprint(args['repo_path']))
 def fuzzy_find_project_files(
     search_term: str,
     *,
@@ -8,6 +8,7 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
 from langchain_core.tools import tool
+from sparc_cli.tool_cache import cached_tool_result, tree_fingerprint
 import fnmatch
 
 console = Console()
@@ -144,6 +145,7 @@ def build_tree(
         tree.add("🔒 (Permission denied)")
 
 @tool
+@cached_tool_result(lambda args: tree_fingerprint(args['path'], args['max_depth'], args['follow_links']))
 def list_directory_tree(
     path: str = ".",
     *,
@@ -1,4 +1,5 @@
-from typing import Dict, List, Any, Union, Optional, Set
+import heapq
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from typing_extensions import TypedDict
 
 class WorkLogEntry(TypedDict):
@@ -9,6 +10,12 @@ from rich.markdown import Markdown
 from rich.panel import Panel
 from langchain_core.tools import tool
 
+from sparc_cli.config import DEFAULT_MEMORY_MAX_TOKENS, DEFAULT_MEMORY_TOP_K
+from sparc_cli.memory_store import Fact, MemoryStore, Snippet
+from sparc_cli.retrieval import select_relevant
+from sparc_cli.session import SessionMapping, current_session
+from sparc_cli.text.compaction import estimate_tokens
+
 class SnippetInfo(TypedDict):
     """Type definition for source code snippet information"""
     filepath: str
@@ -51,54 +58,83 @@ class PrioritizedSnippet(MemoryItem, SnippetInfo):
     """Code snippet with priority"""
     pass
 
-# Global memory store
-_global_memory: Dict[str, Union[List[Any], Dict[int, Union[str, PrioritizedFact, PrioritizedSnippet]], int, Set[str], bool, str, int, List[WorkLogEntry]]] = {
-    'research_notes': [],  # List[PrioritizedNote]
-    'plans': [],
-    'tasks': {},  # Dict[int, str] - ID to task mapping
-    'task_completed': False,  # Flag indicating if task is complete
-    'completion_message': '',  # Message explaining completion
-    'task_id_counter': 1,  # Counter for generating unique task IDs
-    'key_facts': {},  # Dict[int, PrioritizedFact] - ID to fact mapping
-    'key_fact_id_counter': 1,  # Counter for generating unique fact IDs
-    'key_snippets': {},  # Dict[int, PrioritizedSnippet] - ID to snippet mapping
-    'key_snippet_id_counter': 1,  # Counter for generating unique snippet IDs
-    'implementation_requested': False,
-    'related_files': {},  # Dict[int, str] - ID to filepath mapping
-    'related_file_id_counter': 1,  # Counter for generating unique file IDs
-    'plan_completed': False,
-    'agent_depth': 0,
-    'work_log': []  # List[WorkLogEntry] - Timestamped work events
-}
+def new_memory() -> MemoryStore:
+    """Return memory holding the initial values of a session."""
+    return MemoryStore({
+        'research_notes': [],  # List[PrioritizedNote]
+        'plans': [],
+        'tasks': {},  # Dict[int, str] - ID to task mapping
+        'task_files': {},  # Dict[int, List[str]] - Task ID to files the task touches
+        'task_dependencies': {},  # Dict[int, List[int]] - Task ID to IDs of tasks it depends on
+        'task_completed': False,  # Flag indicating if task is complete
+        'completion_message': '',  # Message explaining completion
+        'task_id_counter': 1,  # Counter for generating unique task IDs
+        'key_facts': {},  # Dict[int, Fact] - ID to fact mapping
+        'key_fact_id_counter': 1,  # Counter for generating unique fact IDs
+        'key_snippets': {},  # Dict[int, Snippet] - ID to snippet mapping
+        'key_snippet_id_counter': 1,  # Counter for generating unique snippet IDs
+        'implementation_requested': False,
+        'related_files': {},  # Dict[int, str] - ID to filepath mapping, indexed by filepath
+        'related_file_id_counter': 1,  # Counter for generating unique file IDs
+        'plan_completed': False,
+        'agent_depth': 0,
+        'work_log': [],  # List[WorkLogEntry] - Timestamped work events
+        'finished_threads': []  # List[str] - Session threads whose agent run completed
+    })
+
+# Memory of the current session, see sparc_cli.session
+_global_memory = SessionMapping('memory')
+
+# Called with the memory type and the (ID, item) pairs evicted from it; notes have no ID
+EvictionHook = Callable[[str, List[Tuple[Optional[int], Any]]], None]
+
+_eviction_hooks: List[EvictionHook] = []
+
+def add_eviction_hook(hook: EvictionHook) -> None:
+    """Report research notes, key facts and key snippets evicted by memory limits to hook.
+
+    Lets evicted items be archived or summarized rather than lost.
+    """
+    _eviction_hooks.append(hook)
+
+def remove_eviction_hook(hook: EvictionHook) -> None:
+    """Stop reporting evicted items to a hook added with add_eviction_hook."""
+    if hook in _eviction_hooks:
+        _eviction_hooks.remove(hook)
+
+def _report_evicted(memory_type: str, evicted: List[Tuple[Optional[int], Any]]) -> None:
+    for hook in list(_eviction_hooks):
+        try:
+            hook(memory_type, evicted)
+        except Exception as e:
+            # A failing archive must not fail the tool that stored the new item
+            console.print(f"[dim]Eviction hook {getattr(hook, '__name__', hook)} failed: {e}[/dim]")
 
 def _enforce_memory_limit(memory_type: str) -> None:
     """Enforce memory limits by removing lowest priority, oldest items first."""
-    from datetime import datetime
-    
     if memory_type not in MEMORY_LIMITS:
         return
         
     limit = MEMORY_LIMITS[memory_type]
+    evicted: List[Tuple[Optional[int], Any]] = []
     
     if memory_type == 'research_notes':
         notes = _global_memory['research_notes']
         if len(notes) > limit:
-            # Sort by priority (ascending) then timestamp (ascending)
-            notes.sort(key=lambda x: (x['priority'], x['timestamp']))
-            # Remove oldest, lowest priority items
-            _global_memory['research_notes'] = notes[-limit:]
+            # Notes are read in the order they were recorded, so pick the lowest priority,
+            # oldest ones in linear time rather than sorting the list
+            doomed = set(heapq.nsmallest(
+                len(notes) - limit,
+                range(len(notes)),
+                key=lambda index: (notes[index]['priority'], notes[index]['timestamp'])
+            ))
+            evicted = [(None, notes[index]) for index in sorted(doomed)]
+            notes[:] = [note for index, note in enumerate(notes) if index not in doomed]
+            _global_memory.mark_changed()
             
     elif memory_type in ['key_facts', 'key_snippets']:
-        items = _global_memory[memory_type]
-        if len(items) > limit:
-            # Sort items by priority and timestamp
-            sorted_items = sorted(
-                items.items(),
-                key=lambda x: (x[1]['priority'], x[1]['timestamp'])
-            )
-            # Keep only the highest priority, newest items
-            items_to_keep = dict(sorted_items[-limit:])
-            _global_memory[memory_type] = items_to_keep
+        # Collections keep their records in a heap, so this costs O(log n) per evicted item
+        evicted = _global_memory[memory_type].evict(limit)
             
     elif memory_type == 'work_log':
         log = _global_memory['work_log']
@@ -106,6 +142,9 @@ def _enforce_memory_limit(memory_type: str) -> None:
             # Keep newest entries
             _global_memory['work_log'] = log[-limit:]
 
+    if evicted:
+        _report_evicted(memory_type, evicted)
+
 @tool("emit_research_notes")
 def emit_research_notes(notes: str, priority: int = MemoryPriority.MEDIUM) -> str:
     """Store research notes in global memory with priority.
@@ -126,6 +165,7 @@ def emit_research_notes(notes: str, priority: int = MemoryPriority.MEDIUM) -> st
     )
     
     _global_memory['research_notes'].append(note)
+    _global_memory.mark_changed()
     _enforce_memory_limit('research_notes')
     
     priority_labels = {
@@ -152,16 +192,21 @@ def emit_plan(plan: str) -> str:
         The stored plan
     """
     _global_memory['plans'].append(plan)
+    _global_memory.mark_changed()
     console.print(Panel(Markdown(plan), title="📋 Plan"))
     log_work_event(f"Added plan step:\n\n{plan}")
     return plan
 
 @tool("emit_task")
-def emit_task(task: str) -> str:
+def emit_task(task: str, files: Optional[List[str]] = None, depends_on: Optional[List[int]] = None) -> str:
     """Store a task in global memory.
+
+    Declaring files and dependencies lets independent tasks be implemented in parallel.
     
     Args:
         task: The task to store
+        files: Optional list of file paths the task will create or modify
+        depends_on: Optional list of task IDs that must be completed before this task
         
     Returns:
         String confirming task storage with ID number
@@ -172,8 +217,14 @@ def emit_task(task: str) -> str:
     
     # Store task with ID
     _global_memory['tasks'][task_id] = task
-    
-    console.print(Panel(Markdown(task), title=f"✅ Task #{task_id}"))
+    _global_memory.setdefault('task_files', {})[task_id] = list(files or [])
+    _global_memory.setdefault('task_dependencies', {})[task_id] = list(depends_on or [])
+    _global_memory.mark_changed()
+    
+    title = f"✅ Task #{task_id}"
+    if depends_on:
+        title += f" (after {', '.join(f'#{dep}' for dep in depends_on)})"
+    console.print(Panel(Markdown(task), title=title))
     log_work_event(f"Task #{task_id} added:\n\n{task}")
     return f"Task #{task_id} stored."
 
@@ -196,16 +247,12 @@ def emit_key_facts(facts: List[str], priority: int = MemoryPriority.MEDIUM) -> s
     priority = min(max(priority, MemoryPriority.LOW), MemoryPriority.CRITICAL)
     
     for fact in facts:
-        # Get and increment fact ID
-        fact_id = _global_memory['key_fact_id_counter']
-        _global_memory['key_fact_id_counter'] += 1
-        
-        # Store fact with ID and priority
-        _global_memory['key_facts'][fact_id] = PrioritizedFact(
+        # Store fact with the next fact ID and priority
+        fact_id = _global_memory.key_facts.add(Fact(
             content=fact,
             priority=priority,
             timestamp=datetime.now().isoformat()
-        )
+        ))
         
         # Display panel with ID and priority
         priority_labels = {
@@ -242,9 +289,9 @@ def delete_key_facts(fact_ids: List[int]) -> str:
     """
     results = []
     for fact_id in fact_ids:
-        if fact_id in _global_memory['key_facts']:
+        if fact_id in _global_memory.key_facts:
             # Delete the fact
-            deleted_fact = _global_memory['key_facts'].pop(fact_id)
+            deleted_fact = _global_memory.key_facts.pop(fact_id)
             success_msg = f"Successfully deleted fact #{fact_id}: {deleted_fact}"
             console.print(Panel(Markdown(success_msg), title="Fact Deleted", border_style="green"))
             results.append(success_msg)
@@ -268,6 +315,9 @@ def delete_tasks(task_ids: List[int]) -> str:
         if task_id in _global_memory['tasks']:
             # Delete the task
             deleted_task = _global_memory['tasks'].pop(task_id)
+            _global_memory.get('task_files', {}).pop(task_id, None)
+            _global_memory.get('task_dependencies', {}).pop(task_id, None)
+            _global_memory.mark_changed()
             success_msg = f"Successfully deleted task #{task_id}: {deleted_task}"
             console.print(Panel(Markdown(success_msg), 
                               title="Task Deleted", 
@@ -321,17 +371,15 @@ def emit_key_snippets(snippets: List[SnippetInfo], priority: int = MemoryPriorit
 
     results = []
     for snippet_info in snippets:
-        # Get and increment snippet ID 
-        snippet_id = _global_memory['key_snippet_id_counter']
-        _global_memory['key_snippet_id_counter'] += 1
-        
-        # Store snippet info with priority
-        prioritized_snippet = PrioritizedSnippet(
-            **snippet_info,
+        # Store snippet info with the next snippet ID and priority
+        snippet_id = _global_memory.key_snippets.add(Snippet(
+            filepath=snippet_info['filepath'],
+            line_number=snippet_info['line_number'],
+            snippet=snippet_info['snippet'],
+            description=snippet_info.get('description'),
             priority=priority,
             timestamp=datetime.now().isoformat()
-        )
-        _global_memory['key_snippets'][snippet_id] = prioritized_snippet
+        ))
         
         # Format display text as markdown
         priority_labels = {
@@ -353,7 +401,7 @@ def emit_key_snippets(snippets: List[SnippetInfo], priority: int = MemoryPriorit
             snippet_info['snippet'].rstrip(),  # Remove trailing whitespace 
             "```"
         ]
-        if snippet_info['description']:
+        if snippet_info.get('description'):
             display_text.extend(["", "**Description**:", snippet_info['description']])
             
         # Display panel
@@ -382,9 +430,9 @@ def delete_key_snippets(snippet_ids: List[int]) -> str:
     """
     results = []
     for snippet_id in snippet_ids:
-        if snippet_id in _global_memory['key_snippets']:
+        if snippet_id in _global_memory.key_snippets:
             # Delete the snippet
-            deleted_snippet = _global_memory['key_snippets'].pop(snippet_id)
+            deleted_snippet = _global_memory.key_snippets.pop(snippet_id)
             success_msg = f"Successfully deleted snippet #{snippet_id} from {deleted_snippet['filepath']}"
             console.print(Panel(Markdown(success_msg), 
                               title="Snippet Deleted", 
@@ -416,6 +464,15 @@ def swap_task_order(id1: int, id2: int) -> str:
     # Swap the tasks
     _global_memory['tasks'][id1], _global_memory['tasks'][id2] = \
         _global_memory['tasks'][id2], _global_memory['tasks'][id1]
+
+    # Declared files and dependencies travel with the task they describe
+    for key in ('task_files', 'task_dependencies'):
+        entries = _global_memory.setdefault(key, {})
+        entries[id1], entries[id2] = entries.get(id2, []), entries.get(id1, [])
+    swapped = {id1: id2, id2: id1}
+    for task_id, deps in _global_memory['task_dependencies'].items():
+        _global_memory['task_dependencies'][task_id] = [swapped.get(dep, dep) for dep in deps]
+    _global_memory.mark_changed()
     
     # Display what was swapped
     console.print(Panel(
@@ -472,6 +529,8 @@ def plan_implementation_completed(message: str) -> str:
     _global_memory['plan_completed'] = True
     _global_memory['completion_message'] = message
     _global_memory['tasks'].clear()  # Clear task list when plan is completed
+    _global_memory.get('task_files', {}).clear()
+    _global_memory.get('task_dependencies', {}).clear()
     _global_memory['task_id_counter'] = 1
     console.print(Panel(Markdown(message), title="✅ Plan Executed"))
     log_work_event(f"Plan execution completed:\n\n{message}")
@@ -483,7 +542,7 @@ def get_related_files() -> List[str]:
     Returns:
         List of formatted strings in the format 'ID#X path/to/file.py'
     """
-    files = _global_memory['related_files']
+    files = _global_memory.related_files
     return [f"ID#{file_id} {filepath}" for file_id, filepath in sorted(files.items())]
 
 @tool("emit_related_files")
@@ -501,25 +560,11 @@ def emit_related_files(files: List[str]) -> str:
     
     # Process files
     for file in files:
-        # Check if file path already exists in values
-        existing_id = None
-        for fid, fpath in _global_memory['related_files'].items():
-            if fpath == file:
-                existing_id = fid
-                break
-                
-        if existing_id is not None:
-            # File exists, use existing ID
-            results.append(f"File ID #{existing_id}: {file}")
-        else:
-            # New file, assign new ID
-            file_id = _global_memory['related_file_id_counter']
-            _global_memory['related_file_id_counter'] += 1
-            
-            # Store file with ID
-            _global_memory['related_files'][file_id] = file
+        # Known files keep their ID, new ones get the next file ID
+        file_id, added = _global_memory.related_files.add_path(file)
+        if added:
             added_files.append((file_id, file))
-            results.append(f"File ID #{file_id}: {file}")
+        results.append(f"File ID #{file_id}: {file}")
     
     # Rich output - single consolidated panel
     if added_files:
@@ -532,6 +577,99 @@ def emit_related_files(files: List[str]) -> str:
     return '\n'.join(results)
 
 
+def merge_memory_entries(
+    key_facts: Optional[Dict[int, PrioritizedFact]] = None,
+    key_snippets: Optional[Dict[int, PrioritizedSnippet]] = None,
+    related_files: Optional[Dict[int, str]] = None,
+    research_notes: Optional[List[PrioritizedNote]] = None
+) -> Dict[str, int]:
+    """Merge facts, snippets, related files and notes recorded by another agent into global memory.
+
+    Entries are deduplicated against what is already stored and receive fresh IDs.
+
+    Args:
+        key_facts: Facts keyed by the other agent's fact IDs
+        key_snippets: Snippets keyed by the other agent's snippet IDs
+        related_files: File paths keyed by the other agent's file IDs
+        research_notes: Research notes in the order they were recorded
+
+    Returns:
+        Number of entries added per memory type
+    """
+    added = {'key_facts': 0, 'key_snippets': 0, 'related_files': 0, 'research_notes': 0}
+
+    known_facts = {fact.content for fact in _global_memory.key_facts.values()}
+    for _, fact in sorted((key_facts or {}).items()):
+        if fact['content'] in known_facts:
+            continue
+        _global_memory.key_facts.add(fact)
+        known_facts.add(fact['content'])
+        added['key_facts'] += 1
+
+    known_snippets = {
+        (snippet.filepath, snippet.line_number, snippet.snippet)
+        for snippet in _global_memory.key_snippets.values()
+    }
+    for _, snippet in sorted((key_snippets or {}).items()):
+        snippet_key = (snippet['filepath'], snippet['line_number'], snippet['snippet'])
+        if snippet_key in known_snippets:
+            continue
+        _global_memory.key_snippets.add(snippet)
+        known_snippets.add(snippet_key)
+        added['key_snippets'] += 1
+
+    for _, filepath in sorted((related_files or {}).items()):
+        if _global_memory.related_files.add_path(filepath)[1]:
+            added['related_files'] += 1
+
+    known_notes = {note['content'] for note in _global_memory['research_notes']}
+    for note in research_notes or []:
+        if note['content'] in known_notes:
+            continue
+        _global_memory['research_notes'].append(note)
+        _global_memory.mark_changed()
+        known_notes.add(note['content'])
+        added['research_notes'] += 1
+
+    _enforce_memory_limit('key_facts')
+    _enforce_memory_limit('key_snippets')
+    _enforce_memory_limit('research_notes')
+    return added
+
+
+def memory_entries_since(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the facts, snippets, related files and notes recorded since a memory snapshot.
+
+    Used by agents running in worker processes, whose memory starts as a copy of the
+    parent's, to send back only their own findings for merge_memory_entries.
+
+    Args:
+        snapshot: Copy of global memory taken when the agent started
+
+    Returns:
+        New entries keyed like the arguments of merge_memory_entries
+    """
+    known_notes = {note['content'] for note in snapshot.get('research_notes', [])}
+    return {
+        'key_facts': {
+            k: v for k, v in _global_memory['key_facts'].items()
+            if k >= snapshot.get('key_fact_id_counter', 1)
+        },
+        'key_snippets': {
+            k: v for k, v in _global_memory['key_snippets'].items()
+            if k >= snapshot.get('key_snippet_id_counter', 1)
+        },
+        'related_files': {
+            k: v for k, v in _global_memory['related_files'].items()
+            if k >= snapshot.get('related_file_id_counter', 1)
+        },
+        'research_notes': [
+            note for note in _global_memory['research_notes']
+            if note['content'] not in known_notes
+        ],
+    }
+
+
 def log_work_event(event: str) -> str:
     """Add timestamped entry to work log.
     
@@ -554,6 +692,7 @@ def log_work_event(event: str) -> str:
         event=event
     )
     _global_memory['work_log'].append(entry)
+    _global_memory.mark_changed()
     _enforce_memory_limit('work_log')
     return f"Event logged: {event}"
 
@@ -595,6 +734,7 @@ def reset_work_log() -> str:
         This permanently removes all work log entries. The operation cannot be undone.
     """
     _global_memory['work_log'].clear()
+    _global_memory.mark_changed()
     return "Work log cleared"
 
 
@@ -611,9 +751,9 @@ def deregister_related_files(file_ids: List[int]) -> str:
     """
     results = []
     for file_id in file_ids:
-        if file_id in _global_memory['related_files']:
+        if file_id in _global_memory.related_files:
             # Delete the file reference
-            deleted_file = _global_memory['related_files'].pop(file_id)
+            deleted_file = _global_memory.related_files.pop(file_id)
             success_msg = f"Successfully removed related file #{file_id}: {deleted_file}"
             console.print(Panel(Markdown(success_msg), 
                               title="File Reference Removed", 
@@ -622,6 +762,137 @@ def deregister_related_files(file_ids: List[int]) -> str:
             
     return "File references removed."
 
+def _format_key_fact(fact_id: int, fact: Fact) -> str:
+    """Format a key fact as a markdown section."""
+    return "\n".join([
+        f"## 🔑 Key Fact #{fact_id}",
+        "",  # Empty line for better markdown spacing
+        fact.content
+    ])
+
+def _format_key_snippet(snippet_id: int, snippet: Snippet) -> str:
+    """Format a key snippet with file info and content as a markdown section."""
+    snippet_text = [
+        f"## 📝 Code Snippet #{snippet_id}",
+        "",  # Empty line for better markdown spacing
+        f"**Source Location**:",
+        f"- File: `{snippet.filepath}`",
+        f"- Line: `{snippet.line_number}`",
+        "",  # Empty line before code block
+        "**Code**:",
+        "```python",
+        snippet.snippet.rstrip(),  # Remove trailing whitespace
+        "```"
+    ]
+    if snippet.description:
+        # Add empty line and description
+        snippet_text.extend(["", "**Description**:", snippet.description])
+    return "\n".join(snippet_text)
+
+# Formatters of the memory collections rendered as Markdown sections
+MEMORY_FORMATTERS: Dict[str, Callable[[int, Any], str]] = {
+    'key_facts': _format_key_fact,
+    'key_snippets': _format_key_snippet,
+}
+
+def get_memory_items(key: str) -> List[Tuple[str, int]]:
+    """Get the individually formatted entries of a memory collection.
+
+    Used by prompt builders that need to rank and drop entries one by one.
+    
+    Args:
+        key: One of 'key_facts', 'key_snippets', 'research_notes' or 'related_files'
+        
+    Returns:
+        List of (formatted entry, priority) tuples, oldest first
+    """
+    values = _global_memory.get(key, [])
+
+    if key in MEMORY_FORMATTERS:
+        # Only entries changed since the last call are formatted again
+        return [(text, record.priority) for _, record, text in values.rendered(MEMORY_FORMATTERS[key])]
+
+    if key == 'research_notes':
+        # Notes are kept in insertion order, which is also age order
+        return [
+            (note['content'], note['priority']) if isinstance(note, dict) else (str(note), MemoryPriority.MEDIUM)
+            for note in values
+        ]
+
+    if key == 'related_files':
+        return [(entry, MemoryPriority.MEDIUM) for entry in get_related_files()]
+
+    return [(str(v), MemoryPriority.MEDIUM) for v in values]
+
+# Memory collections ranked by relevance in prompts, and the text each entry is indexed by
+RETRIEVED_MEMORY_KEYS: Dict[str, Callable[[Any], str]] = {
+    'key_facts': lambda fact: fact.content,
+    'key_snippets': lambda snippet: "\n".join(
+        part for part in (snippet.filepath, snippet.description, snippet.snippet) if part
+    ),
+    'research_notes': lambda note: note['content'] if isinstance(note, dict) else str(note),
+}
+
+def get_relevant_memory_items(
+    key: str,
+    query: str,
+    top_k: Optional[int] = None,
+    max_tokens: Optional[int] = None
+) -> List[Tuple[str, int]]:
+    """Get the formatted entries of a memory collection most relevant to a task or question.
+
+    Entries are ranked with BM25 against the query, then by priority and age, and
+    taken best first up to top_k entries and max_tokens tokens.
+
+    Args:
+        key: One of 'key_facts', 'key_snippets' or 'research_notes'; other keys return all entries
+        query: Task or question the prompt is built for
+        top_k: Maximum number of entries, 0 for all (default: memory_top_k of the run config)
+        max_tokens: Token budget of the entries, 0 for none (default: memory_max_tokens of the run config)
+
+    Returns:
+        List of (formatted entry, priority) tuples of the selected entries, oldest first
+    """
+    config = _global_memory.get('config', {})
+    if top_k is None:
+        top_k = config.get('memory_top_k', DEFAULT_MEMORY_TOP_K)
+    if max_tokens is None:
+        max_tokens = config.get('memory_max_tokens', DEFAULT_MEMORY_MAX_TOKENS)
+    if key not in RETRIEVED_MEMORY_KEYS or not query or not (top_k or max_tokens):
+        return get_memory_items(key)
+
+    values = _global_memory.get(key, [])
+    memory_index = current_session().memory_index
+    if key == 'research_notes':
+        # Notes have no IDs; the index holds on to them, so their ids stay unique
+        entry_keys = [id(note) for note in values]
+        scores = memory_index.scores(key, dict(zip(entry_keys, values)), RETRIEVED_MEMORY_KEYS[key], query)
+        items = get_memory_items(key)
+    else:
+        # The selection for the same query is reused until the collection changes
+        selection_key = (query, top_k, max_tokens, values.version)
+        selection = memory_index.selections.get(key)
+        if selection is not None and selection[0] is values and selection[1] == selection_key:
+            return list(selection[2])
+        rendered = values.rendered(MEMORY_FORMATTERS[key])
+        entry_keys = [entry_id for entry_id, _, _ in rendered]
+        items = [(text, record.priority) for _, record, text in rendered]
+        scores = memory_index.scores(key, values, RETRIEVED_MEMORY_KEYS[key], query, version=values.version)
+    selected = select_relevant(
+        [(entry_key, text, priority) for entry_key, (text, priority) in zip(entry_keys, items)],
+        scores,
+        top_k or None,
+        max_tokens or None,
+        estimate_tokens
+    )
+    if key != 'research_notes':
+        memory_index.selections[key] = (values, selection_key, selected)
+    return list(selected)
+
+def get_relevant_memory_value(key: str, query: str) -> str:
+    """Get the entries of a memory collection most relevant to a task or question, as Markdown."""
+    return "\n\n".join(text for text, _ in get_relevant_memory_items(key, query))
+
 def get_memory_value(key: str) -> str:
     """Get a value from global memory.
     
@@ -641,44 +912,9 @@ def get_memory_value(key: str) -> str:
     """
     values = _global_memory.get(key, [])
     
-    if key == 'key_facts':
-        # For empty dict, return empty string
-        if not values:
-            return ""
-        # Sort by ID for consistent output and format as markdown sections
-        facts = []
-        for k, v in sorted(values.items()):
-            facts.extend([
-                f"## 🔑 Key Fact #{k}",
-                "",  # Empty line for better markdown spacing
-                v['content'],
-                ""  # Empty line between facts
-            ])
-        return "\n".join(facts).rstrip()  # Remove trailing newline
-    
-    if key == 'key_snippets':
-        if not values:
-            return ""
-        # Format each snippet with file info and content using markdown
-        snippets = []
-        for k, v in sorted(values.items()):
-            snippet_text = [
-                f"## 📝 Code Snippet #{k}",
-                "",  # Empty line for better markdown spacing
-                f"**Source Location**:",
-                f"- File: `{v['filepath']}`",
-                f"- Line: `{v['line_number']}`",
-                "",  # Empty line before code block
-                "**Code**:",
-                "```python",
-                v['snippet'].rstrip(),  # Remove trailing whitespace
-                "```"
-            ]
-            if v['description']:
-                # Add empty line and description
-                snippet_text.extend(["", "**Description**:", v['description']])
-            snippets.append("\n".join(snippet_text))
-        return "\n\n".join(snippets)
+    if key in MEMORY_FORMATTERS:
+        # Markdown sections in ID order, reused until the collection changes
+        return values.rendered_text(MEMORY_FORMATTERS[key], "\n\n")
     
     if key == 'work_log':
         if not values:
@@ -9,6 +9,7 @@ from rich.text import Text
 from sparc_cli.proc.interactive import run_interactive_command
 from pydantic import BaseModel, Field
 from sparc_cli.text.processing import truncate_output
+from sparc_cli.tool_cache import invalidates_tool_cache
 
 console = Console()
 
@@ -18,6 +19,7 @@ class RunProgrammingTaskInput(BaseModel):
     files: Optional[List[str]] = Field(None, description="Optional list of files for Aider to examine")
 
 @tool
+@invalidates_tool_cache
 def run_programming_task(input: RunProgrammingTaskInput) -> Dict[str, Union[str, int, bool]]:
     """Assign a programming task to a human programmer.
 
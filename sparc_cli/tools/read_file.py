@@ -6,6 +6,7 @@ from langchain_core.tools import tool
 from rich.console import Console
 from rich.panel import Panel
 from sparc_cli.text.processing import truncate_output
+from sparc_cli.tool_cache import cached_tool_result, path_fingerprint
 
 console = Console()
 
@@ -13,6 +14,7 @@ console = Console()
 CHUNK_SIZE = 8192
 
 @tool
+@cached_tool_result(lambda args: path_fingerprint(args['filepath']))
 def read_file_tool(
     filepath: str,
     verbose: bool = True,
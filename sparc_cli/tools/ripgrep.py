@@ -8,6 +8,7 @@ from rich.panel import Panel
 from rich.markdown import Markdown
 from sparc_cli.proc.interactive import run_interactive_command
 from sparc_cli.text.processing import truncate_output
+from sparc_cli.tool_cache import cached_tool_result, git_status_fingerprint
 
 console = Console()
 
@@ -80,6 +81,7 @@ DEFAULT_EXCLUDE_DIRS = [
 ]
 
 @tool
+@cached_tool_result(lambda args: git_status_fingerprint())
 def ripgrep_search(
     pattern: str,
     *,
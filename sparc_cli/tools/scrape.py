@@ -8,7 +8,6 @@ from dataclasses import dataclass
 from typing import Dict, Optional, Any
 from urllib.parse import urlparse
 import pypandoc
-from playwright.sync_api import sync_playwright
 
 logger = logging.getLogger(__name__)
 
@@ -147,6 +146,9 @@ def scrape_url_tool(
                 raise NetworkError(f"HTTP error: {str(e)}")
 
     def scrape_with_playwright() -> str:
+        # Playwright is slow to import and only needed for pages rendered with JavaScript
+        from playwright.sync_api import sync_playwright
+
         with sync_playwright() as p:
             browser = p.chromium.launch()
             context = browser.new_context(
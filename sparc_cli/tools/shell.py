@@ -7,10 +7,12 @@ from sparc_cli.tools.memory import _global_memory
 from sparc_cli.proc.interactive import run_interactive_command
 from sparc_cli.text.processing import truncate_output
 from sparc_cli.console.cowboy_messages import get_cowboy_message
+from sparc_cli.tool_cache import invalidates_tool_cache
 
 console = Console()
 
 @tool
+@invalidates_tool_cache
 def run_shell_command(command: str) -> Dict[str, Union[str, int, bool]]:
     """Execute a shell command and return its output.
 
@@ -57,6 +59,7 @@ def run_shell_command(command: str) -> Dict[str, Union[str, int, bool]]:
             }
         elif response == "c":
             _global_memory['config']['cowboy_mode'] = True
+            _global_memory.mark_changed()
             console.print("")
             console.print(" " + get_cowboy_message())
             console.print("")
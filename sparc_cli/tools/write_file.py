@@ -5,10 +5,12 @@ from typing import Dict
 from langchain_core.tools import tool
 from rich.console import Console
 from rich.panel import Panel
+from sparc_cli.tool_cache import invalidates_tool_cache
 
 console = Console()
 
 @tool
+@invalidates_tool_cache
 def write_file_tool(
     filepath: str,
     content: str,
@@ -0,0 +1,263 @@
+"""Tracing of agent runs, LLM calls and tool calls.
+
+When enabled, every agent run, model call and tool call is recorded as a span
+with its wall time and, depending on its kind, the tokens sent and received or
+the size of the tool output. Spans link to the span they ran in: model and
+tool calls to their agent, sub-agents to the agent whose tool started them.
+
+Spans are appended to a JSONL file as they finish, so agents running in worker
+processes can write to the same trace, and the trace can be converted to the
+Chrome trace format for viewing in chrome://tracing or Perfetto.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from sparc_cli.ledger import response_usage
+
+# Span of the agent run executing in the current context
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('sparc_current_span', default=None)
+
+
+def _agent_depth() -> int:
+    from sparc_cli.tools.memory import _global_memory
+    return _global_memory.get('agent_depth', 0)
+
+
+@dataclass
+class Span:
+    """A timed operation within a session."""
+    name: str
+    kind: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: Optional[str] = None
+    depth: int = 0
+    start: float = field(default_factory=time.time)
+    duration: Optional[float] = None
+    pid: int = field(default_factory=os.getpid)
+    thread: int = field(default_factory=threading.get_ident)
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = asdict(self)
+        del record['_started']
+        return record
+
+
+class Tracer:
+    """Collects finished spans and appends them to a JSONL file."""
+
+    def __init__(self, path: Optional[str] = None):
+        """Create a tracer.
+
+        Args:
+            path: JSONL file the spans are appended to, or None to keep them in memory only
+        """
+        self.path = path
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+
+    def start(self, name: str, kind: str, parent: Optional[Span] = None, depth: Optional[int] = None,
+              **attributes: Any) -> Span:
+        """Open a span, by default as a child of the current agent span at the current agent depth."""
+        parent = parent or _current_span.get()
+        return Span(
+            name=name,
+            kind=kind,
+            parent_id=parent.span_id if parent else None,
+            depth=_agent_depth() if depth is None else depth,
+            attributes=attributes
+        )
+
+    def finish(self, span: Span, **attributes: Any) -> None:
+        """Close a span and record it."""
+        span.duration = time.perf_counter() - span._started
+        span.attributes.update(attributes)
+        with self._lock:
+            self.spans.append(span)
+            if self._file is not None:
+                self._file.write(json.dumps(span.to_dict(), default=str) + '\n')
+                self._file.flush()
+
+    @contextmanager
+    def span(self, name: str, kind: str, depth: Optional[int] = None, **attributes: Any) -> Iterator[Span]:
+        """Record the enclosed block as a span that encloses the spans opened within it."""
+        span = self.start(name, kind, depth=depth, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Return all recorded spans, including those written by other processes to the same file."""
+        if self.path is None:
+            with self._lock:
+                return [span.to_dict() for span in self.spans]
+        with open(self.path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def to_chrome_trace(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert span records to the Chrome trace event format.
+
+    Each span becomes a complete event on the row of the thread that ran it.
+    """
+    events = []
+    for record in records:
+        events.append({
+            'name': record['name'],
+            'cat': record['kind'],
+            'ph': 'X',
+            'ts': record['start'] * 1e6,
+            'dur': (record['duration'] or 0) * 1e6,
+            'pid': record['pid'],
+            'tid': record['thread'],
+            'args': {
+                'span_id': record['span_id'],
+                'parent_id': record['parent_id'],
+                'depth': record['depth'],
+                **record['attributes']
+            }
+        })
+    return {'traceEvents': sorted(events, key=lambda event: event['ts']), 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(tracer: 'Tracer', path: str) -> None:
+    """Write the tracer's spans to path in the Chrome trace format."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(to_chrome_trace(tracer.records()), f, default=str)
+
+
+def _message_chars(messages: List[List[Any]]) -> int:
+    return sum(len(str(message.content)) for batch in messages for message in batch)
+
+
+def _usage(response: Any) -> Dict[str, int]:
+    usage = response_usage(response)
+    return {'tokens_in': usage['input_tokens'], 'tokens_out': usage['output_tokens'],
+            'cached_tokens': usage['cache_read_tokens']}
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records a span for every model and tool call of the runs it is attached to."""
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._spans: Dict[UUID, Span] = {}
+        self._lock = threading.Lock()
+
+    def _open(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attributes: Any) -> None:
+        with self._lock:
+            parent = self._spans.get(parent_run_id) if parent_run_id else None
+        span = self.tracer.start(name, kind, parent=parent, **attributes)
+        with self._lock:
+            self._spans[run_id] = span
+
+    def _close(self, run_id: UUID, **attributes: Any) -> None:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is not None:
+            self.tracer.finish(span, **attributes)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                            **kwargs: Any) -> None:
+        metadata = metadata or {}
+        self._open(
+            run_id, parent_run_id,
+            metadata.get('ls_model_name') or (serialized or {}).get('name') or 'llm', 'llm',
+            provider=metadata.get('ls_provider'),
+            prompt_chars=_message_chars(messages)
+        )
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._close(run_id, **_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._close(run_id, error=f"{type(error).__name__}: {error}")
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._open(run_id, parent_run_id, (serialized or {}).get('name') or kwargs.get('name') or 'tool', 'tool',
+                   input_bytes=len(str(input_str).encode('utf-8')))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        content = getattr(output, 'content', output)
+        self._close(run_id, output_bytes=len(str(content).encode('utf-8')))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._close(run_id, error=f"{type(error).__name__}: {error}")
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer(config: Optional[Dict[str, Any]] = None) -> Optional[Tracer]:
+    """Return the process's tracer, opening it if the config enables tracing.
+
+    Args:
+        config: Configuration holding 'trace_path', defaults to the global config
+
+    Returns:
+        The tracer, or None if tracing is off
+    """
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    if config is None:
+        from sparc_cli.tools.memory import _global_memory
+        config = _global_memory.get('config', {})
+    path = config.get('trace_path')
+    if not path:
+        return None
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(path)
+    return _tracer
+
+
+def reset_tracer() -> None:
+    """Forget the process's tracer, so that the next get_tracer call opens the one configured then.
+
+    Used by processes that run several traced tasks one after another.
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.close()
+        _tracer = None
+
+
+def agent_span(name: str, depth: Optional[int] = None, **attributes: Any):
+    """Return a context manager recording an agent run as a span, if tracing is on."""
+    tracer = get_tracer()
+    return tracer.span(name, 'agent', depth=depth, **attributes) if tracer else nullcontext()
+
+
+def tracing_callbacks() -> List[BaseCallbackHandler]:
+    """Return the callbacks to attach to an agent run so its calls are traced."""
+    tracer = get_tracer()
+    return [TracingCallbackHandler(tracer)] if tracer else []
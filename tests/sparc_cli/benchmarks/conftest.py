@@ -0,0 +1,82 @@
+"""Fixtures of the performance budget tests.
+
+The budget tests only run with SPARC_BENCHMARKS=1. Each one times a hot path
+and fails if it takes longer than its stored baseline times
+SPARC_BENCHMARK_TOLERANCE (default 1.5). Run them with
+SPARC_UPDATE_BASELINES=1 to record new baselines in baselines.json instead.
+"""
+
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict
+
+import pytest
+
+from sparc_cli.benchmarks.synthetic_repo import create_synthetic_repo
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+UPDATE_BASELINES = os.environ.get('SPARC_UPDATE_BASELINES') == '1'
+TOLERANCE = float(os.environ.get('SPARC_BENCHMARK_TOLERANCE', '1.5'))
+
+# Absolute slack, so that timer noise cannot fail paths that take microseconds
+MIN_SLACK = 0.005
+
+
+def measure(func: Callable[[], object], *, repeat: int = 5, warmup: bool = True) -> float:
+    """Return the median wall time of func over repeat calls, in seconds."""
+    if warmup:
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+@pytest.fixture(scope='session')
+def baselines():
+    """Stored baseline timings, rewritten at the end of the session when updating them."""
+    stored: Dict[str, float] = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH, encoding='utf-8') as f:
+            stored = json.load(f)
+    yield stored
+    if UPDATE_BASELINES:
+        with open(BASELINES_PATH, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(stored.items())), f, indent=2)
+            f.write('\n')
+
+
+@pytest.fixture
+def budget(baselines):
+    """Time a function and check it against its baseline."""
+    def check(name: str, func: Callable[[], object], *, repeat: int = 5, warmup: bool = True) -> float:
+        seconds = measure(func, repeat=repeat, warmup=warmup)
+        if UPDATE_BASELINES:
+            baselines[name] = round(seconds, 6)
+            return seconds
+        if name not in baselines:
+            pytest.fail(f"No baseline for {name}; record one with SPARC_UPDATE_BASELINES=1")
+        limit = max(baselines[name] * TOLERANCE, baselines[name] + MIN_SLACK)
+        assert seconds <= limit, (
+            f"{name} took {seconds * 1000:.1f} ms, over its budget of {limit * 1000:.1f} ms "
+            f"(baseline {baselines[name] * 1000:.1f} ms)"
+        )
+        return seconds
+    return check
+
+
+@pytest.fixture(scope='session')
+def large_repo(tmp_path_factory):
+    """A git repository of 100,000 files."""
+    return create_synthetic_repo(str(tmp_path_factory.mktemp('large_repo')))
+
+
+@pytest.fixture(scope='session')
+def deep_tree(tmp_path_factory):
+    """A directory tree five levels deep."""
+    return create_synthetic_repo(str(tmp_path_factory.mktemp('deep_tree')), files=2_000, depth=5, fanout=4, git=False)
@@ -0,0 +1,15 @@
+from sparc_cli.benchmarks.agent_loop import SCRIPTS, STAGES, create_fixture_repo, run_agent_benchmark
+from sparc_cli.tools.memory import _global_memory
+
+def test_agent_benchmark_runs_every_stage_to_completion(tmp_path):
+    """Test that each stage's agent consumes its whole script and memory is restored afterwards."""
+    repo = create_fixture_repo(str(tmp_path), modules=3)
+    before = dict(_global_memory)
+    results = run_agent_benchmark(repo, repeat=2, modules=3, output_mode='plain')
+
+    assert list(results) == list(STAGES)
+    for stage, result in results.items():
+        assert result.model_calls == len(SCRIPTS[stage](3))
+        assert len(result.seconds) == 2
+        assert result.overhead == result.median
+    assert dict(_global_memory) == before
@@ -0,0 +1,101 @@
+import copy
+import os
+import shutil
+import time
+
+import pytest
+
+from sparc_cli.memory_store import Fact
+from sparc_cli.proc.interactive import run_interactive_command
+from sparc_cli.text.processing import truncate_output
+from sparc_cli.tools.fuzzy_find import fuzzy_find_project_files
+from sparc_cli.tools.list_directory import list_directory_tree
+from sparc_cli.tools.math.evaluator import CalculatorTool, SymbolicSolverTool
+from sparc_cli.tools.memory import MemoryPriority, _enforce_memory_limit, _global_memory, get_memory_value
+
+pytestmark = [
+    pytest.mark.skipif(os.environ.get('SPARC_BENCHMARKS') != '1', reason="performance budgets run with SPARC_BENCHMARKS=1"),
+    pytest.mark.timeout(900),
+]
+
+@pytest.fixture(autouse=True)
+def memory():
+    """Run each benchmark with the tool cache off and restore memory afterwards."""
+    saved = copy.deepcopy(_global_memory)
+    _global_memory['config'] = {'tool_cache': False}
+    yield _global_memory
+    _global_memory.clear()
+    _global_memory.update(saved)
+
+def _facts(count):
+    now = time.time()
+    return {
+        index: Fact(f"Fact {index} about module_{index % 50}.py", index % 4 + 1, now + index)
+        for index in range(1, count + 1)
+    }
+
+def _snippets(count):
+    now = time.time()
+    return {
+        index: {
+            'filepath': f"pkg/module_{index}.py",
+            'line_number': index,
+            'snippet': f"def function_{index}(value):\n    return value * {index}\n",
+            'description': f"Function {index}",
+            'priority': MemoryPriority.MEDIUM,
+            'timestamp': now + index
+        }
+        for index in range(1, count + 1)
+    }
+
+def test_truncate_output_budget(budget):
+    """Test that truncating 4 MB of command output stays within budget."""
+    output = "".join(f"line {index}: {'x' * 60}\n" for index in range(60_000))
+    budget('truncate_output_4mb', lambda: truncate_output(output))
+
+def test_enforce_memory_limit_budget(budget, memory):
+    """Test that trimming 5,000 key facts to the memory limit stays within budget."""
+    facts = _facts(5_000)
+
+    def trim():
+        memory['key_facts'] = dict(facts)
+        _enforce_memory_limit('key_facts')
+
+    budget('enforce_memory_limit_5000_facts', trim)
+
+def test_get_memory_value_budget(budget, memory):
+    """Test that rendering 1,000 facts and 1,000 snippets stays within budget."""
+    memory['key_facts'] = _facts(1_000)
+    memory['key_snippets'] = _snippets(1_000)
+    budget('get_memory_value_1000_facts', lambda: get_memory_value('key_facts'))
+    budget('get_memory_value_1000_snippets', lambda: get_memory_value('key_snippets'))
+
+def test_fuzzy_find_budget(budget, large_repo):
+    """Test that a fuzzy search of a 100,000 file repository stays within budget."""
+    budget(
+        'fuzzy_find_100k_files',
+        lambda: fuzzy_find_project_files.invoke({'search_term': 'mod_3/file_42.py', 'repo_path': large_repo}),
+        repeat=1,
+        warmup=False
+    )
+
+def test_list_directory_tree_budget(budget, deep_tree):
+    """Test that listing a tree five levels deep stays within budget."""
+    budget('list_directory_tree_depth_5', lambda: list_directory_tree.invoke({'path': deep_tree, 'max_depth': 5}), repeat=3)
+
+@pytest.mark.skipif(shutil.which('script') is None, reason="run_interactive_command needs script")
+def test_interactive_command_spawn_budget(budget):
+    """Test that the overhead of spawning a command under a pseudo-terminal stays within budget."""
+    budget('run_interactive_command_spawn', lambda: run_interactive_command(['true']))
+
+def test_calculator_throughput_budget(budget):
+    """Test that 1,000 calculator evaluations stay within budget."""
+    calculator = CalculatorTool()
+    expressions = [f"({index} + 3) * 2 / 7" for index in range(1_000)]
+    budget('calculator_1000_expressions', lambda: [calculator._run(expression) for expression in expressions])
+
+def test_symbolic_solver_throughput_budget(budget):
+    """Test that 20 symbolic simplifications and solutions stay within budget."""
+    solver = SymbolicSolverTool()
+    expressions = [f"x**2 - {index * index} = 0" if index % 2 else f"(x + {index})**2 - x**2" for index in range(20)]
+    budget('symbolic_solver_20_expressions', lambda: [solver._run(expression) for expression in expressions], repeat=3)
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from sparc_cli.benchmarks.scripted_model import ScriptedChatModel, scripted_turn, tool_call
+
+def test_replays_script_with_unique_tool_call_ids():
+    """Test that responses follow the script and every tool call gets its own ID."""
+    model = ScriptedChatModel(script=[
+        scripted_turn(tool_call('read_file_tool', filepath='a.py'), tool_call('read_file_tool', filepath='b.py')),
+        AIMessage(content="done")
+    ])
+    first = model.invoke("task")
+    assert [call['args'] for call in first.tool_calls] == [{'filepath': 'a.py'}, {'filepath': 'b.py'}]
+    assert len({call['id'] for call in first.tool_calls}) == 2
+    assert model.invoke("next").content == "done"
+    assert model.calls == 2
+
+def test_exhausted_script_raises():
+    """Test that a call beyond the end of the script fails loudly."""
+    model = ScriptedChatModel(script=[AIMessage(content="done")])
+    model.invoke("task")
+    with pytest.raises(RuntimeError, match="script has 1 responses"):
+        model.invoke("again")
+
+def test_reports_configured_usage_and_latency():
+    """Test that each call waits for the latency and reports the configured token counts."""
+    model = ScriptedChatModel(script=[AIMessage(content="a"), AIMessage(content="b")], latency=0.05,
+                              input_tokens=1000, output_tokens=20)
+    start = time.perf_counter()
+    response = model.invoke("task")
+    assert time.perf_counter() - start >= 0.05
+    assert response.usage_metadata == {'input_tokens': 1000, 'output_tokens': 20, 'total_tokens': 1020}
+    assert asyncio.run(model.ainvoke("task")).content == "b"
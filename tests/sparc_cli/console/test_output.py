@@ -0,0 +1,76 @@
+from io import StringIO
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import create_react_agent
+from rich.console import Console
+
+import sparc_cli.console.output as output
+from sparc_cli.agent_utils import run_agent_with_retry
+from sparc_cli.console.output import AgentOutputRenderer, message_text
+
+class ToolCallingModel(FakeMessagesListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+class StreamingModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+def _token(text):
+    return ("messages", (AIMessageChunk(content=text), {"langgraph_node": "agent"}))
+
+def test_message_text():
+    """Test that only text blocks of message content are kept."""
+    assert message_text("plain") == "plain"
+    assert message_text([{"type": "text", "text": "a"}, {"type": "tool_use", "input": "{}"}, {"type": "text", "text": "b"}]) == "ab"
+
+def test_stream_mode_renders_markdown_once(monkeypatch):
+    """Test that streamed tokens are followed by a single Markdown panel."""
+    monkeypatch.setattr(output, 'console', Console(file=StringIO(), width=80))
+    printed = []
+    monkeypatch.setattr(output.console, 'print', lambda renderable, *args, **kwargs: printed.append(renderable))
+
+    renderer = AgentOutputRenderer('stream')
+    for text in ["# Title", "\n", "body"]:
+        renderer.render(_token(text))
+    renderer.render(("updates", {"agent": {"messages": [AIMessage(content="# Title\nbody")]}}))
+    renderer.close()
+
+    assert len(printed) == 1
+    assert printed[0].renderable.markup == "# Title\nbody"
+
+def test_plain_mode_writes_tokens():
+    """Test that plain mode writes tokens as they arrive, without Rich."""
+    stream = StringIO()
+    renderer = AgentOutputRenderer('plain', output=stream)
+    renderer.render(_token("Hello"))
+    assert stream.getvalue() == "Hello"
+    renderer.render(_token(" world"))
+    renderer.render(("updates", {"agent": {"messages": [AIMessage(content="Hello world")]}}))
+    assert stream.getvalue() == "Hello world\n"
+
+@pytest.mark.parametrize("async_agents", [False, True])
+def test_sub_agent_tokens_are_shown_once(capsys, async_agents):
+    """Test that a sub-agent's tokens do not leak into its parent's stream."""
+    config = {"output_mode": "plain", "async_agents": async_agents, "configurable": {"thread_id": "child"}}
+
+    @tool
+    def research(query: str) -> str:
+        """Run a sub-agent."""
+        child = create_react_agent(StreamingModel(messages=iter([AIMessage(content="child findings")])), [], checkpointer=MemorySaver())
+        run_agent_with_retry(child, query, config)
+        return "done"
+
+    parent = create_react_agent(ToolCallingModel(responses=[
+        AIMessage(content="", tool_calls=[{"name": "research", "args": {"query": "q"}, "id": "1"}]),
+        AIMessage(content="parent summary")
+    ]), [research], checkpointer=MemorySaver())
+    run_agent_with_retry(parent, "task", {**config, "configurable": {"thread_id": "parent"}})
+
+    out = capsys.readouterr().out
+    assert out.count("child findings") == 1
+    assert out.count("parent summary") == 1
@@ -0,0 +1,149 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+
+import sparc_cli.agent_utils as agent_utils
+from sparc_cli.agent_utils import create_agent
+from sparc_cli.benchmarks.scripted_model import ScriptedChatModel
+
+@tool
+def lookup(key: str) -> str:
+    """Look up a key."""
+    return key
+
+@tool
+def store(key: str) -> str:
+    """Store a key."""
+    return key
+
+@pytest.fixture(autouse=True)
+def empty_caches(monkeypatch):
+    """Give each test empty graph and schema caches."""
+    monkeypatch.setattr(agent_utils, '_compiled_agents', agent_utils.OrderedDict())
+    monkeypatch.setattr(agent_utils, '_tool_schemas', {})
+
+def test_graph_is_compiled_once_per_model_and_toolset(monkeypatch):
+    """Test that agents of one model and toolset share a compiled graph, with their own checkpointers."""
+    compiled = []
+    compile_agent = agent_utils._compile_agent
+    monkeypatch.setattr(agent_utils, '_compile_agent', lambda *args: compiled.append(args) or compile_agent(*args))
+    model = ScriptedChatModel(script=[])
+    first, second = MemorySaver(), MemorySaver()
+    agent = create_agent(model, [lookup, store], checkpointer=first)
+    again = create_agent(model, [lookup, store], checkpointer=second)
+    assert len(compiled) == 1
+    assert again.nodes is agent.nodes
+    assert (agent.checkpointer, again.checkpointer) == (first, second)
+    create_agent(model, [lookup], checkpointer=first)
+    create_agent(ScriptedChatModel(script=[]), [lookup, store])
+    assert len(compiled) == 3
+
+def test_tool_schemas_are_derived_once(monkeypatch):
+    """Test that each tool's schema is derived once and reused by every toolset containing it."""
+    derived = []
+    convert = agent_utils.convert_to_openai_tool
+    monkeypatch.setattr(agent_utils, 'convert_to_openai_tool', lambda t: derived.append(t.name) or convert(t))
+    create_agent(ScriptedChatModel(script=[]), [lookup, store])
+    create_agent(ScriptedChatModel(script=[]), [lookup])
+    assert derived == ['lookup', 'store']
+    assert agent_utils.tool_schema(lookup)['function']['name'] == 'lookup'
+
+def test_cached_graph_keeps_threads_apart():
+    """Test that agents sharing a compiled graph keep the state of their threads in their own checkpointers."""
+    model = ScriptedChatModel(script=[AIMessage(content="one"), AIMessage(content="two")])
+    first = create_agent(model, [lookup], checkpointer=MemorySaver())
+    second = create_agent(model, [lookup], checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "thread"}}
+    first.invoke({"messages": [HumanMessage(content="hi")]}, config)
+    second.invoke({"messages": [HumanMessage(content="hi")]}, config)
+    assert [m.content for m in first.get_state(config).values["messages"]] == ["hi", "one"]
+    assert [m.content for m in second.get_state(config).values["messages"]] == ["hi", "two"]
+
+@pytest.fixture
+def implementation_run(monkeypatch):
+    """Run an implementation task from its tool with a scripted model and the given run config."""
+    import sparc_cli.tools.agent as agent_tools
+    from sparc_cli.session import Session, use_session
+    from sparc_cli.tools.memory import _global_memory
+
+    renderers = []
+    renderer_class = agent_utils.AgentOutputRenderer
+    monkeypatch.setattr(agent_utils, 'AgentOutputRenderer', lambda mode: renderers.append(mode) or renderer_class(mode))
+
+    def run(**config):
+        model = ScriptedChatModel(script=[AIMessage(content="done")])
+        monkeypatch.setattr(agent_tools, 'get_llm', lambda *args: model)
+        with use_session(Session()):
+            _global_memory['config'] = {'provider': 'anthropic', 'model': 'scripted', **config}
+            result = agent_tools.request_task_implementation.invoke({"task_spec": "Add a flag"})
+        assert result['success']
+        return renderers
+
+    return run
+
+def test_implementation_agents_follow_the_output_mode(implementation_run):
+    """Test that agents started from tools show their output in the run's output mode."""
+    assert implementation_run(output_mode='plain') == ['plain']
+
+def test_implementation_agents_run_async_when_enabled(implementation_run, monkeypatch):
+    """Test that implementation agents started from tools run on the agent loop with async_agents on."""
+    loop_runs = []
+    run_on_agent_loop = agent_utils.run_on_agent_loop
+    monkeypatch.setattr(agent_utils, 'run_on_agent_loop', lambda coro: loop_runs.append(coro) or run_on_agent_loop(coro))
+    implementation_run(async_agents=True)
+    assert len(loop_runs) == 1
+
+def test_prompt_budget_falls_back_to_the_run_config():
+    """Test that agents run without a token budget of their own get the budget of the run."""
+    from sparc_cli.session import Session, use_session
+    from sparc_cli.text.compaction import CompactablePrompt
+    from sparc_cli.tools.memory import _global_memory
+
+    budgets = []
+    prompt = CompactablePrompt("{task}", values={"task": "Add a flag"})
+    render_parts = prompt.render_parts
+    prompt.render_parts = lambda budget: budgets.append(budget) or render_parts(budget)
+    agent = create_agent(ScriptedChatModel(script=[AIMessage(content="done")]), [lookup], checkpointer=MemorySaver())
+    with use_session(Session()):
+        _global_memory['config'] = {'max_prompt_tokens': 1234, 'output_mode': 'plain'}
+        agent_utils.run_agent_with_retry(agent, prompt, {"configurable": {"thread_id": "t"}})
+    assert budgets == [1234]
+
+def test_unparsed_prompt_overflow_is_compacted_not_retried(monkeypatch):
+    """Test that a too-long error without token counts compacts the prompt on a fresh thread, or gives up."""
+    import anthropic
+    import httpx
+    from sparc_cli.session import Session, use_session
+    from sparc_cli.text.compaction import CompactablePrompt, PromptSection, estimate_tokens
+    from sparc_cli.tools.memory import _global_memory
+
+    too_long = anthropic.APIError("prompt is too long", httpx.Request("POST", "https://api.anthropic.com"), body=None)
+    runs = []
+
+    def stream(agent, stream_input, config, renderer):
+        runs.append((config["configurable"]["thread_id"], estimate_tokens(stream_input["messages"][0].content)))
+        if len(runs) == 1:
+            raise too_long
+
+    monkeypatch.setattr(agent_utils, '_stream_agent', stream)
+    notes = [f"note {i} " + "word " * 50 for i in range(10)]
+    prompt = CompactablePrompt("{notes}", sections=[PromptSection("notes", notes)])
+    agent = create_agent(ScriptedChatModel(script=[]), [lookup])
+    with use_session(Session()):
+        _global_memory['config'] = {'output_mode': 'plain'}
+        agent_utils.run_agent_with_retry(agent, prompt, {"configurable": {"thread_id": "t"}})
+        assert [thread for thread, _ in runs] == ["t", "t:compacted-1"]
+        assert runs[1][1] <= runs[0][1] * agent_utils.UNKNOWN_OVERFLOW_COMPACTION
+
+        # A prompt with nothing left to drop fails at once
+        rejected = []
+
+        def reject(*args):
+            rejected.append(args)
+            raise too_long
+
+        monkeypatch.setattr(agent_utils, '_stream_agent', reject)
+        with pytest.raises(RuntimeError, match="cannot be compacted further"):
+            agent_utils.run_agent_with_retry(agent, "Fix it", {"configurable": {"thread_id": "u"}})
+        assert len(rejected) == 1
@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+
+from sparc_cli.batch import completed_task_ids, load_manifest, run_batch
+
+def _write_manifest(path, *tasks):
+    path.write_text("".join(json.dumps(task) + "\n" for task in tasks))
+    return str(path)
+
+def _pid_worker(job):
+    """Worker used in place of an agent run: fails tasks asking to, and reports its process."""
+    task = job['task']
+    return {'id': task['id'], 'success': task['message'] != 'fail', 'error': None, 'pid': os.getpid()}
+
+def test_load_manifest_fills_defaults(tmp_path):
+    """Test that tasks get IDs, absolute repository paths and default models."""
+    manifest = _write_manifest(
+        tmp_path / "tasks.jsonl",
+        {"message": "Explain auth", "mode": "research-only"},
+        {"id": "fix", "repo": "service", "message": "Fix it", "provider": "openai", "model": "gpt-4o"}
+    )
+    first, second = load_manifest(manifest)
+    assert (first['id'], first['repo'], first['mode']) == ("1", str(tmp_path), "research-only")
+    assert first['model'] == 'claude-3-5-sonnet-20241022'
+    assert (second['id'], second['repo'], second['mode']) == ("fix", str(tmp_path / "service"), "full")
+
+@pytest.mark.parametrize('task, error', [
+    ({"id": "a"}, "needs a message"),
+    ({"id": "../../x", "message": "m"}, "id may only contain"),
+    ({"message": "m", "mode": "quick"}, "mode must be one of"),
+    ({"message": "m", "provider": "openai"}, "model is required"),
+])
+def test_load_manifest_rejects_invalid_tasks(tmp_path, task, error):
+    """Test that invalid tasks are reported with their line number."""
+    manifest = _write_manifest(tmp_path / "tasks.jsonl", {"message": "ok"}, task)
+    with pytest.raises(ValueError, match=f":2: .*{error}"):
+        load_manifest(manifest)
+
+def test_run_batch_isolates_tasks_and_resumes(tmp_path):
+    """Test that every task runs in its own process and a rerun only retries tasks without a successful result."""
+    manifest = _write_manifest(tmp_path / "tasks.jsonl", *[{"id": str(i), "message": "work"} for i in range(3)],
+                               {"id": "3", "message": "fail"})
+    output = str(tmp_path / "results.jsonl")
+    results = run_batch(load_manifest(manifest), output, workers=2, worker=_pid_worker)
+    assert sorted(result['id'] for result in results) == ["0", "1", "2", "3"]
+    assert len({result['pid'] for result in results}) == 4
+    assert completed_task_ids(output) == {"0", "1", "2"}
+
+    rerun = run_batch(load_manifest(manifest), output, workers=2, worker=_pid_worker)
+    assert [result['id'] for result in rerun] == ["3"]
+    assert len(open(output).readlines()) == 5
+
+def test_task_with_unconfigured_provider_fails(tmp_path, monkeypatch):
+    """Test that a task whose provider has no API key fails with its own result instead of ending the batch."""
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    manifest = _write_manifest(tmp_path / "tasks.jsonl", {"id": "t", "message": "m", "provider": "openai", "model": "gpt-4o"})
+    output = str(tmp_path / "results.jsonl")
+    [result] = run_batch(load_manifest(manifest), output, workers=1)
+    assert not result['success']
+    assert "environment" in result['error']
+    assert os.path.exists(result['log'])
+    assert result['usage']['total']['calls'] == 0
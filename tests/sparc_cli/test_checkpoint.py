@@ -0,0 +1,195 @@
+import operator
+import sqlite3
+import zlib
+from typing import Annotated, List
+
+import pytest
+from typing_extensions import TypedDict
+from langgraph.graph import StateGraph, START, END
+
+import sparc_cli.checkpoint as checkpoint_module
+from sparc_cli.checkpoint import (
+    SqliteCheckpointer,
+    activate_session,
+    finish_session_thread,
+    get_checkpointer,
+    open_checkpointer,
+    session_thread_id
+)
+from sparc_cli.agent_utils import _has_pending_run
+from sparc_cli.memory_store import MemoryStore
+from sparc_cli.session import Session, use_session
+
+class State(TypedDict):
+    steps: Annotated[List[str], operator.add]
+
+def _build_graph(checkpointer, fail_in_second_step=False):
+    """Build a two-step graph whose second step can be made to crash."""
+    def first(state):
+        return {"steps": ["first"]}
+
+    def second(state):
+        if fail_in_second_step:
+            raise RuntimeError("crash")
+        return {"steps": ["second"]}
+
+    builder = StateGraph(State)
+    builder.add_node("first", first)
+    builder.add_node("second", second)
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", END)
+    return builder.compile(checkpointer=checkpointer)
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "checkpoints.db")
+
+@pytest.fixture(autouse=True)
+def no_active_session(monkeypatch):
+    """Keep the process-wide session from leaking between tests."""
+    monkeypatch.setattr(checkpoint_module, '_active_session', None)
+
+def test_checkpoint_roundtrip(db_path):
+    """Test that graph state is saved and can be listed and reloaded."""
+    graph = _build_graph(SqliteCheckpointer(db_path))
+    config = {"configurable": {"thread_id": "t1"}}
+    graph.invoke({"steps": []}, config)
+
+    # A fresh checkpointer on the same file sees the same state
+    graph = _build_graph(SqliteCheckpointer(db_path))
+    state = graph.get_state(config)
+    assert state.values == {"steps": ["first", "second"]}
+    assert not state.next
+    history = list(graph.get_state_history(config))
+    assert len(history) == 4
+    assert history[-1].values == {"steps": []}
+
+def test_checkpoints_are_compressed(db_path):
+    """Test that stored checkpoints are zlib-compressed."""
+    graph = _build_graph(SqliteCheckpointer(db_path))
+    graph.invoke({"steps": []}, {"configurable": {"thread_id": "t1"}})
+
+    conn = sqlite3.connect(db_path)
+    blobs = [row[0] for row in conn.execute("SELECT checkpoint FROM checkpoints")]
+    assert blobs
+    for blob in blobs:
+        zlib.decompress(blob)
+
+def test_resume_after_crash(db_path):
+    """Test that an interrupted run continues from its last checkpoint."""
+    config = {"configurable": {"thread_id": "t1"}}
+    graph = _build_graph(SqliteCheckpointer(db_path), fail_in_second_step=True)
+    with pytest.raises(RuntimeError):
+        graph.invoke({"steps": []}, config)
+    assert _has_pending_run(graph, config)
+
+    graph = _build_graph(SqliteCheckpointer(db_path))
+    assert _has_pending_run(graph, config)
+    result = graph.invoke(None, config)
+    # The first step is not repeated
+    assert result == {"steps": ["first", "second"]}
+    assert not _has_pending_run(graph, config)
+
+def test_threads_are_isolated(db_path):
+    """Test that threads sharing a database do not see each other's state."""
+    checkpointer = SqliteCheckpointer(db_path)
+    graph = _build_graph(checkpointer)
+    graph.invoke({"steps": ["a"]}, {"configurable": {"thread_id": "t1"}})
+    graph.invoke({"steps": ["b"]}, {"configurable": {"thread_id": "t2"}})
+
+    assert graph.get_state({"configurable": {"thread_id": "t1"}}).values["steps"][0] == "a"
+    assert graph.get_state({"configurable": {"thread_id": "t2"}}).values["steps"][0] == "b"
+    checkpointer.delete_thread("t1")
+    assert not graph.get_state({"configurable": {"thread_id": "t1"}}).values
+
+def test_wal_allows_concurrent_readers(db_path):
+    """Test that the database is in WAL mode and readable during a write."""
+    checkpointer = SqliteCheckpointer(db_path)
+    graph = _build_graph(checkpointer)
+    graph.invoke({"steps": []}, {"configurable": {"thread_id": "t1"}})
+
+    writer = sqlite3.connect(db_path, isolation_level=None)
+    assert writer.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("DELETE FROM checkpoints")
+    try:
+        assert checkpointer.get_tuple({"configurable": {"thread_id": "t1"}}) is not None
+    finally:
+        writer.execute("ROLLBACK")
+
+def test_session_memory_snapshot(db_path):
+    """Test that tracked memory is saved with checkpoints and restored intact."""
+    checkpointer = SqliteCheckpointer(db_path)
+    checkpointer.create_session("s1", "base task")
+    memory = {'key_facts': {}, 'agent_depth': 0}
+    checkpointer.track_memory("s1", memory)
+
+    def remember(state):
+        memory['key_facts'][1] = {'content': 'fact', 'priority': 2}
+        return {"steps": ["remember"]}
+
+    builder = StateGraph(State)
+    builder.add_node("remember", remember)
+    builder.add_edge(START, "remember")
+    builder.add_edge("remember", END)
+    builder.compile(checkpointer=checkpointer).invoke({"steps": []}, {"configurable": {"thread_id": "s1:research"}})
+
+    session = SqliteCheckpointer(db_path).get_session("s1")
+    assert session['base_task'] == "base task"
+    assert session['stage'] == "research"
+    assert session['memory']['key_facts'] == {1: {'content': 'fact', 'priority': 2}}
+
+    checkpointer.set_session_stage("s1", "planning")
+    assert checkpointer.get_session("s1")['stage'] == "planning"
+    assert checkpointer.get_session("missing") is None
+
+def test_unchanged_memory_is_not_serialized_again(db_path, monkeypatch):
+    """Test that checkpoints only snapshot a MemoryStore whose version changed since the last snapshot."""
+    snapshots = []
+    to_dict = MemoryStore.to_dict
+    monkeypatch.setattr(MemoryStore, 'to_dict', lambda self: snapshots.append(1) or to_dict(self))
+    checkpointer = SqliteCheckpointer(db_path)
+    checkpointer.create_session("s1", "base task")
+    memory = MemoryStore({'research_notes': []})
+    checkpointer.track_memory("s1", memory)
+
+    _build_graph(checkpointer).invoke({"steps": []}, {"configurable": {"thread_id": "t1"}})
+    assert len(snapshots) == 1
+    memory['research_notes'].append({'content': 'note'})
+    memory.mark_changed()
+    _build_graph(checkpointer).invoke({"steps": []}, {"configurable": {"thread_id": "t2"}})
+    assert len(snapshots) == 2
+    assert checkpointer.get_session("s1")['memory']['research_notes'] == [{'content': 'note'}]
+
+def test_finished_threads_are_not_continued(tmp_path):
+    """Test that a repeated run of a finished input gets a new thread, also after a resume."""
+    checkpointer = open_checkpointer(str(tmp_path))
+    checkpointer.create_session("s1", "task")
+    with use_session(Session()):
+        activate_session(checkpointer, "s1")
+        first = session_thread_id('task', "do x")
+        assert session_thread_id('task', "do x") == first
+        finish_session_thread(first)
+        second = session_thread_id('task', "do x")
+        assert second == f"{first}:run-2"
+        finish_session_thread(second)
+        assert session_thread_id('task', "do x") == f"{first}:run-3"
+        assert session_thread_id('task', "do y") != first
+
+    saved = open_checkpointer(str(tmp_path)).get_session("s1")['memory']
+    assert saved['finished_threads'] == [first, second]
+
+def test_session_thread_ids(tmp_path):
+    """Test that thread IDs are stable within a session and unique outside of one."""
+    assert session_thread_id('research') != session_thread_id('research')
+
+    checkpointer = open_checkpointer(str(tmp_path))
+    assert (tmp_path / ".sparc" / ".gitignore").read_text() == "*\n"
+    checkpointer.create_session("s1", "task")
+    activate_session(checkpointer, "s1")
+
+    assert get_checkpointer() is checkpointer
+    assert session_thread_id('research') == "s1:research"
+    assert session_thread_id('task', "do x") == session_thread_id('task', "do x")
+    assert session_thread_id('task', "do x") != session_thread_id('task', "do y")
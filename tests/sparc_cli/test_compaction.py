@@ -0,0 +1,114 @@
+import pytest
+from sparc_cli.text.compaction import (
+    CompactablePrompt,
+    PromptSection,
+    estimate_tokens,
+    fit_text
+)
+
+TEMPLATE = "Task: {task}\n\nFacts:\n{facts}\n\nNotes:\n{notes}\n\nDone."
+
+def _prompt(facts, notes, fact_priorities=None):
+    return CompactablePrompt(
+        TEMPLATE,
+        sections=[
+            PromptSection("facts", facts, priority=2, entry_priorities=fact_priorities),
+            PromptSection("notes", notes, priority=0)
+        ],
+        values={"task": "fix the bug"}
+    )
+
+def test_estimate_tokens():
+    """Test that the token estimate grows with content and handles empty input."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello world") >= 2
+    short = estimate_tokens("def foo(): return 1")
+    assert estimate_tokens("def foo(): return 1\n" * 10) >= 10 * short - 10
+    # Never fewer than one token per four characters
+    assert estimate_tokens("x" * 4000) >= 1000
+
+def test_render_without_budget_keeps_everything():
+    """Test that a prompt within budget is rendered unchanged."""
+    prompt = _prompt(["fact one", "fact two"], ["note one"])
+    text = prompt.render(10000)
+    assert text == prompt.render()
+    assert "fact one\n\nfact two" in text
+    assert "note one" in text
+
+def test_render_drops_lowest_priority_section_first():
+    """Test that notes are dropped before facts and the result fits."""
+    facts = [f"fact {i}" for i in range(5)]
+    notes = [f"note {i} " + "detail " * 50 for i in range(20)]
+    prompt = _prompt(facts, notes)
+    budget = estimate_tokens(prompt.render()) // 3
+
+    text = prompt.render(budget)
+    assert estimate_tokens(text) <= budget
+    assert all(fact in text for fact in facts)
+    assert "omitted to fit the context window" in text
+    # Fixed parts of the template survive
+    assert text.startswith("Task: fix the bug")
+    assert text.endswith("Done.")
+
+def test_render_drops_oldest_entries_first():
+    """Test that newer entries outlive older ones within a section."""
+    notes = [f"note {i} " + "detail " * 20 for i in range(10)]
+    prompt = _prompt([], notes)
+    budget = estimate_tokens(prompt.render()) // 2
+
+    text = prompt.render(budget)
+    assert "note 9 " in text
+    assert "note 0 " not in text
+
+def test_render_respects_entry_priority():
+    """Test that high-priority entries outlive low-priority ones regardless of age."""
+    facts = ["important " + "x " * 100, "minor " + "y " * 100]
+    prompt = _prompt(facts, [], fact_priorities=[3, 0])
+    budget = estimate_tokens(prompt.render()) - 50
+
+    text = prompt.render(budget)
+    assert "important" in text
+    assert "minor" not in text
+
+def test_render_condenses_before_dropping():
+    """Test that long entries are condensed rather than dropped when that suffices."""
+    snippet = "## Snippet #1\n```python\n" + "line = 1\n" * 200 + "```"
+    prompt = _prompt([snippet], [])
+    budget = estimate_tokens(prompt.render()) // 2
+
+    text = prompt.render(budget)
+    assert "## Snippet #1" in text
+    assert "[... condensed ...]" in text
+    # Condensing must not leave an unterminated code block
+    assert text.count("```") % 2 == 0
+
+def test_fit_text_keeps_head_and_tail():
+    """Test that fit_text elides the middle of oversized text."""
+    text = "".join(f"line {i}\n" for i in range(1000))
+    fitted = fit_text(text, 200)
+    assert estimate_tokens(fitted) <= 200
+    assert fitted.startswith("line 0\n")
+    assert fitted.endswith("line 999\n")
+    assert "lines omitted" in fitted
+
+def test_fit_text_within_budget():
+    """Test that fit_text leaves short text alone."""
+    assert fit_text("short", 100) == "short"
+
+def test_render_parts_keeps_prefix_intact():
+    """Test that the prefix is rendered with the values but never compacted."""
+    notes = [f"note {i} " + "detail " * 50 for i in range(20)]
+    prompt = CompactablePrompt(
+        "Notes:\n{notes}\n",
+        sections=[PromptSection("notes", notes)],
+        values={"stage": "research"},
+        prefix="Instructions for {stage}.\n" + "Follow the rules. " * 50
+    )
+    full_prefix, full_body = prompt.render_parts()
+    budget = estimate_tokens(full_prefix) + estimate_tokens(full_body) // 3
+
+    prefix, body = prompt.render_parts(budget)
+    assert prefix == full_prefix
+    assert prefix.startswith("Instructions for research.")
+    assert estimate_tokens(prefix + body) <= budget
+    assert prompt.render(budget) == prefix + body
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import create_react_agent
+
+import sparc_cli.ledger as ledger_module
+from sparc_cli.agent_utils import run_agent_with_retry
+from sparc_cli.ledger import (
+    UsageCallbackHandler, UsageLedger, model_price, usage_cost, usage_scope
+)
+
+class ToolCallingModel(FakeMessagesListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+def _usage(input_tokens, output_tokens, cache_read=0, cache_creation=0):
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cache_read, "cache_creation": cache_creation}}
+
+@pytest.fixture
+def ledger(monkeypatch):
+    """Give each test an empty ledger."""
+    fresh = UsageLedger()
+    monkeypatch.setattr(ledger_module, '_ledger', fresh)
+    return fresh
+
+def test_model_price_matches_longest_prefix():
+    """Test that dated, dotted and vendor-prefixed model names find their prices."""
+    assert model_price('gpt-4o-mini-2024-07-18') == ledger_module.MODEL_PRICES['gpt-4o-mini']
+    assert model_price('anthropic/claude-3.5-sonnet') == ledger_module.MODEL_PRICES['claude-3-5-sonnet']
+    assert model_price('o1-preview') == ledger_module.MODEL_PRICES['o1-preview']
+    assert model_price('some-local-model') is None
+
+def test_usage_cost_prices_cache_reads_and_writes_separately():
+    """Test that cached input tokens are billed at the cache prices, not the input price."""
+    # 1000 uncached, 2000 read and 1000 written input tokens, 500 output tokens
+    cost = usage_cost('claude-3-5-sonnet-20241022', 4000, 500, cache_read_tokens=2000, cache_write_tokens=1000)
+    assert cost == pytest.approx((1000 * 3.0 + 2000 * 0.30 + 1000 * 3.75 + 500 * 15.0) / 1_000_000)
+    assert usage_cost('unknown', 10, 10) is None
+
+def test_replayed_responses_are_not_billed(ledger):
+    """Test that responses replayed from a cache are counted but cost nothing."""
+    handler = UsageCallbackHandler('openai', 'gpt-4o')
+    model = FakeMessagesListChatModel(responses=[
+        AIMessage(content="a", usage_metadata={**_usage(100, 10), "total_cost": 0}),
+        AIMessage(content="b", usage_metadata=_usage(100, 10)),
+    ], callbacks=[handler])
+    model.invoke("x")
+    model.invoke("x")
+
+    total = ledger.summary()['total']
+    assert total['replayed_calls'] == 1
+    assert total['calls'] == 1
+    assert total['input_tokens'] == 100
+    assert total['cost_usd'] == pytest.approx((100 * 2.5 + 10 * 10.0) / 1_000_000)
+
+def test_usage_is_attributed_to_stage_sub_agent_and_expert(ledger, tmp_path):
+    """Test that calls of sub-agents and expert calls are attributed to the tools that made them."""
+    expert = FakeMessagesListChatModel(responses=[AIMessage(content="advice", usage_metadata=_usage(50, 5))],
+                                       callbacks=[UsageCallbackHandler('openai', 'o1-preview')])
+
+    @tool
+    @usage_scope("ask_expert")
+    def ask_expert(question: str) -> str:
+        """Ask the expert."""
+        return expert.invoke(question).content
+
+    @tool
+    @usage_scope("request_research")
+    def request_research(query: str) -> str:
+        """Run a sub-agent."""
+        child = create_react_agent(ToolCallingModel(responses=[
+            AIMessage(content="", tool_calls=[{"name": "ask_expert", "args": {"question": "q"}, "id": "2"}],
+                      usage_metadata=_usage(20, 2)),
+            AIMessage(content="found", usage_metadata=_usage(20, 2)),
+        ], callbacks=[UsageCallbackHandler('anthropic', 'claude-3-5-sonnet-20241022')]), [ask_expert],
+            checkpointer=MemorySaver())
+        run_agent_with_retry(child, query, {"agent_name": "research", "configurable": {"thread_id": "child"}})
+        return "done"
+
+    parent = create_react_agent(ToolCallingModel(responses=[
+        AIMessage(content="", tool_calls=[{"name": "request_research", "args": {"query": "q"}, "id": "1"}],
+                  usage_metadata=_usage(100, 10)),
+        AIMessage(content="done", usage_metadata=_usage(100, 10)),
+    ], callbacks=[UsageCallbackHandler('anthropic', 'claude-3-5-sonnet-20241022')]), [request_research],
+        checkpointer=MemorySaver())
+    run_agent_with_retry(parent, "task", {"agent_name": "implementation", "configurable": {"thread_id": "parent"}})
+
+    summary = ledger.summary()
+    assert list(summary['by_stage']) == ["implementation"]
+    assert summary['by_stage']["implementation"]['input_tokens'] == 290
+    by_scope = summary['by_scope']
+    assert by_scope["implementation"]['input_tokens'] == 200
+    assert by_scope["implementation > request_research"]['input_tokens'] == 40
+    assert by_scope["implementation > request_research > ask_expert"]['input_tokens'] == 50
+    assert summary['by_model']["openai/o1-preview"]['calls'] == 1
+
+    path = tmp_path / "usage.json"
+    ledger.write_json(str(path))
+    written = json.loads(path.read_text())
+    assert written['total']['calls'] == 5
+    assert len(written['entries']) == 5
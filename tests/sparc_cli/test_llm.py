@@ -1,9 +1,27 @@
+import asyncio
+
+import httpx
 import pytest
 from unittest.mock import Mock, patch
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from sparc_cli.env import validate_environment
-from sparc_cli.llm import initialize_llm, initialize_expert_llm
+import sparc_cli.llm as llm_module
+from sparc_cli.llm import (
+    initialize_llm,
+    initialize_expert_llm,
+    cacheable_prompt_content,
+    get_async_http_client,
+    get_http_client,
+    get_llm
+)
+
+@pytest.fixture
+def model_registry(monkeypatch):
+    """Give each test an empty model registry."""
+    monkeypatch.setattr(llm_module, '_model_registry', {})
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setenv('ANTHROPIC_API_KEY', 'test-key')
 
 def test_initialize_llm_openai():
     """Test OpenAI LLM initialization."""
@@ -63,3 +81,69 @@ def test_environment_variables():
     expert_enabled, missing = validate_environment(args)
     assert isinstance(expert_enabled, bool)
     assert isinstance(missing, list)
+
+def test_cacheable_prompt_content():
+    """Test that the static prefix is marked for caching only where needed."""
+    content = cacheable_prompt_content("instructions", "task", "anthropic")
+    assert content == [
+        {"type": "text", "text": "instructions", "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "task"}
+    ]
+    assert cacheable_prompt_content("instructions", "task", "openrouter")[0]["cache_control"] == {"type": "ephemeral"}
+    # OpenAI caches stable prefixes without markers
+    assert cacheable_prompt_content("instructions", "task", "openai") == "instructionstask"
+    assert cacheable_prompt_content("", "task", "anthropic") == "task"
+
+def test_get_llm_shares_clients(model_registry):
+    """Test that the registry returns one client per provider, model and role."""
+    model = get_llm('openai', 'gpt-4')
+    assert get_llm('openai', 'gpt-4') is model
+    assert get_llm('openai', 'gpt-4o') is not model
+    assert get_llm('openai', 'gpt-4', expert=True) is not model
+    assert get_llm('anthropic', 'claude-2') is get_llm('anthropic', 'claude-2')
+
+def test_get_llm_uses_shared_pool(model_registry):
+    """Test that OpenAI and Anthropic clients send requests through the shared connection pools."""
+    assert get_llm('openai', 'gpt-4').root_client._client is get_http_client()
+    assert get_llm('openai', 'gpt-4').root_async_client._client is get_async_http_client()
+    assert get_llm('anthropic', 'claude-2')._client._client is get_http_client()
+    assert get_llm('anthropic', 'claude-2')._async_client._client is get_async_http_client()
+
+def test_anthropic_requests_go_through_the_shared_pools(model_registry, monkeypatch):
+    """Test that ChatAnthropic really sends sync and async calls through the clients set on it."""
+    sent = []
+
+    def respond(request):
+        sent.append(request.url.host)
+        return httpx.Response(200, json={
+            "id": "msg_1", "type": "message", "role": "assistant", "model": "claude-2",
+            "content": [{"type": "text", "text": "hi"}], "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 1},
+        })
+
+    async def arespond(request):
+        return respond(request)
+
+    monkeypatch.delenv('ANTHROPIC_API_URL', raising=False)
+    monkeypatch.delenv('ANTHROPIC_BASE_URL', raising=False)
+    monkeypatch.setattr(llm_module, '_http_client', httpx.Client(transport=httpx.MockTransport(respond)))
+    monkeypatch.setattr(llm_module, '_async_http_client', httpx.AsyncClient(transport=httpx.MockTransport(arespond)))
+    model = get_llm('anthropic', 'claude-2')
+    assert model.invoke("hello").content == "hi"
+    assert asyncio.run(model.ainvoke("hello")).content == "hi"
+    assert sent == ['api.anthropic.com', 'api.anthropic.com']
+
+def test_pooled_openai_clients_report_streamed_usage(model_registry, monkeypatch):
+    """Test that OpenAI clients on the shared pool still report token usage when streaming."""
+    monkeypatch.setenv('OPENROUTER_API_KEY', 'test-key')
+    monkeypatch.setenv('EXPERT_OPENAI_API_KEY', 'test-key')
+    assert get_llm('openai', 'gpt-4').stream_usage is True
+    assert get_llm('openrouter', 'anthropic/claude-3-5-sonnet').stream_usage is True
+    assert get_llm('openai', 'o1-preview', expert=True).stream_usage is True
+
+def test_get_llm_is_rate_limited(model_registry, monkeypatch):
+    """Test that shared clients route their calls through the rate limit scheduler."""
+    monkeypatch.delenv('ANTHROPIC_API_URL', raising=False)
+    monkeypatch.delenv('ANTHROPIC_BASE_URL', raising=False)
+    assert get_llm('anthropic', 'claude-2').callbacks[0].host == 'api.anthropic.com'
+    assert get_llm('openrouter', 'some/model').callbacks[0].host == 'openrouter.ai'
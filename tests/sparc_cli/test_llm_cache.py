@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.outputs import ChatGeneration
+
+import sparc_cli.agent_utils as agent_utils
+import sparc_cli.llm_cache as llm_cache
+from sparc_cli.agent_utils import create_agent
+from sparc_cli.llm_cache import (
+    ResponseCache,
+    cache_key,
+    parse_cache_stages,
+    with_response_cache
+)
+from sparc_cli.tools.memory import _global_memory
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "llm_cache.db"))
+
+@pytest.fixture
+def cache_config(tmp_path, monkeypatch):
+    """Enable caching for the research stage only, storing under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(llm_cache, '_stage_caches', {})
+    monkeypatch.setattr(llm_cache, '_cached_models', {})
+    monkeypatch.setitem(_global_memory, 'config', {'response_cache_stages': ['research']})
+
+def _generations(text):
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+def test_identical_calls_hit(cache):
+    """Test that a repeated call is answered from the cache."""
+    model = FakeListChatModel(responses=["first", "second"], cache=cache)
+    assert model.invoke([HumanMessage("hello")]).content == "first"
+    assert model.invoke([HumanMessage("hello")]).content == "first"
+    assert model.invoke([HumanMessage("other")]).content == "second"
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.hit_rate == pytest.approx(1 / 3)
+
+def test_cache_persists_on_disk(tmp_path):
+    """Test that responses survive reopening the store."""
+    path = str(tmp_path / "llm_cache.db")
+    FakeListChatModel(responses=["stored"], cache=ResponseCache(path)).invoke([HumanMessage("hello")])
+
+    cache = ResponseCache(path)
+    model = FakeListChatModel(responses=["stored"], cache=cache)
+    assert model.invoke([HumanMessage("hello")]).content == "stored"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+def test_cache_key_ignores_message_ids():
+    """Test that message IDs do not change the key, but content and settings do."""
+    def prompt(message_id, content="hello"):
+        return (
+            '[{"lc": 1, "type": "constructor", "id": ["langchain", "schema", "messages", "HumanMessage"], '
+            f'"kwargs": {{"content": "{content}", "type": "human", "id": "{message_id}"}}}}]'
+        )
+
+    assert cache_key(prompt("a"), "model") == cache_key(prompt("b"), "model")
+    assert cache_key(prompt("a"), "model") != cache_key(prompt("a", "bye"), "model")
+    # Tool schemas are part of the model string
+    assert cache_key(prompt("a"), "model---[('tools', [1])]") != cache_key(prompt("a"), "model---[('tools', [2])]")
+
+def test_lru_eviction(tmp_path):
+    """Test that the least recently used responses are evicted to respect the size bound."""
+    cache = ResponseCache(str(tmp_path / "llm_cache.db"))
+    for i in range(3):
+        cache.update(f"prompt {i}", "model", _generations("x" * 1000 + str(i)))
+    entry_size = cache._conn.execute("SELECT MAX(size) FROM responses").fetchone()[0]
+
+    # Touch the oldest entry so it becomes the most recently used
+    assert cache.lookup("prompt 0", "model") is not None
+    cache.max_bytes = entry_size * 3
+    cache.update("prompt 3", "model", _generations("x" * 1000 + "3"))
+
+    assert cache.lookup("prompt 1", "model") is None
+    assert cache.lookup("prompt 0", "model") is not None
+    assert cache.lookup("prompt 3", "model") is not None
+
+def test_ttl_expiry(cache):
+    """Test that responses older than the TTL are treated as misses."""
+    cache.ttl = 60
+    cache.update("prompt", "model", _generations("answer"))
+    assert cache.lookup("prompt", "model")[0].message.content == "answer"
+
+    # Age the entry past the TTL
+    cache._conn.execute("UPDATE responses SET created_at = created_at - 61")
+    assert cache.lookup("prompt", "model") is None
+
+def test_with_response_cache_per_stage(cache_config, tmp_path):
+    """Test that only enabled stages get a caching copy of the model."""
+    model = FakeListChatModel(responses=["a"])
+    research_model = with_response_cache(model, 'research')
+    assert research_model is not model
+    assert isinstance(research_model.cache, ResponseCache)
+    assert model.cache is None
+    assert with_response_cache(model, 'planning') is model
+    assert (tmp_path / ".sparc" / "llm_cache.db").exists()
+
+def test_cached_agents_share_a_compiled_graph(cache_config, monkeypatch):
+    """Test that agents created twice with the response cache on reuse the cached model and its graph."""
+    compiled = []
+    compile_agent = agent_utils._compile_agent
+    monkeypatch.setattr(agent_utils, '_compiled_agents', OrderedDict())
+    monkeypatch.setattr(agent_utils, '_compile_agent', lambda *args: compiled.append(args) or compile_agent(*args))
+    model = FakeListChatModel(responses=["a"])
+    first = create_agent(with_response_cache(model, 'research'), [])
+    again = create_agent(with_response_cache(model, 'research'), [])
+    assert with_response_cache(model, 'research') is with_response_cache(model, 'research')
+    assert len(compiled) == 1
+    assert again.nodes is first.nodes
+
+def test_parse_cache_stages():
+    """Test parsing of the stage list given on the command line."""
+    assert parse_cache_stages("all") == llm_cache.CACHE_STAGES
+    assert parse_cache_stages("research, expert") == ("research", "expert")
+    with pytest.raises(ValueError):
+        parse_cache_stages("research,deploy")
@@ -0,0 +1,92 @@
+import copy
+import pickle
+
+from sparc_cli.memory_store import Fact, MemoryStore, Snippet
+
+def test_collections_convert_dicts_to_records():
+    """Test that entries assigned as dicts are stored as records that still read like dicts."""
+    store = MemoryStore({'key_facts': {3: {'content': 'fact', 'priority': 2, 'timestamp': 't'}}, 'key_fact_id_counter': 4})
+    fact = store['key_facts'][3]
+    assert isinstance(fact, Fact)
+    assert fact['content'] == fact.content == 'fact'
+    assert fact == {'content': 'fact', 'priority': 2, 'timestamp': 't'}
+    assert store.key_facts.add(Fact('next', 1, 't')) == 4
+    assert store['key_fact_id_counter'] == 5
+
+def test_related_files_are_indexed_by_path():
+    """Test that known paths keep their ID and the index follows deletions."""
+    store = MemoryStore()
+    assert store.related_files.add_path('a.py') == (1, True)
+    assert store.related_files.add_path('b.py') == (2, True)
+    assert store.related_files.add_path('a.py') == (1, False)
+    del store['related_files'][1]
+    assert store.related_files.id_of('a.py') is None
+    assert store.related_files.add_path('a.py') == (3, True)
+    assert store['related_files'] == {2: 'b.py', 3: 'a.py'}
+
+def test_store_behaves_like_the_memory_dict():
+    """Test that plain values, counters, clear, update, copies and snapshots work as with a dict."""
+    store = MemoryStore({'tasks': {}, 'agent_depth': 0})
+    store.key_snippets.add(Snippet('a.py', 1, 'a = 1', None, 1, 't'))
+    store['config'] = {'provider': 'anthropic'}
+    assert store.get('config')['provider'] == 'anthropic'
+    assert store.get('missing', 'default') == 'default'
+
+    saved = copy.deepcopy(store)
+    restored = pickle.loads(pickle.dumps(store))
+    store.clear()
+    assert len(store['key_snippets']) == 0 and store['key_snippet_id_counter'] == 1 and 'config' not in store
+
+    store.update(saved)
+    assert store['key_snippets'][1].filepath == 'a.py'
+    assert restored.to_dict() == saved.to_dict()
+    snapshot = store.to_dict()
+    assert type(snapshot['key_snippets'][1]) is dict
+    assert snapshot['key_snippet_id_counter'] == 2
+
+def test_evict_removes_lowest_priority_oldest_records():
+    """Test that eviction follows (priority, timestamp) through inserts, deletions and bulk replaces."""
+    store = MemoryStore()
+    facts = store.key_facts
+    for index, priority in enumerate([1, 0, 2, 0, 1]):
+        facts.add(Fact(f"fact {index}", priority, index))
+    del facts[2]
+    assert [(entry_id, fact.content) for entry_id, fact in facts.evict(3)] == [(4, 'fact 3')]
+    assert sorted(facts) == [1, 3, 5]
+
+    facts.add(Fact('newest', 0, 10))
+    assert [entry_id for entry_id, _ in facts.evict(3)] == [6]
+
+    store['key_facts'] = {index: {'content': str(index), 'priority': index % 3, 'timestamp': index} for index in range(100)}
+    evicted = facts.evict(10)
+    assert len(evicted) == 90 and len(facts) == 10
+    assert all(fact.priority == 2 for fact in facts.values())
+
+def test_rendering_formats_only_changed_entries():
+    """Test that entries are formatted once until they change, and renders are reused while the version holds."""
+    store = MemoryStore()
+    facts = store.key_facts
+    formatted = []
+
+    def formatter(fact_id, fact):
+        formatted.append(fact_id)
+        return f"#{fact_id} {fact.content}"
+
+    for content in ('a', 'b', 'c'):
+        facts.add(Fact(content, 1, content))
+    assert facts.rendered_text(formatter, "\n") == "#1 a\n#2 b\n#3 c"
+    version = facts.version
+    assert facts.rendered(formatter) is facts.rendered(formatter)
+    assert facts.rendered_text(formatter, "\n") == "#1 a\n#2 b\n#3 c" and facts.version == version
+    assert formatted == [1, 2, 3]
+
+    facts[2] = Fact('B', 1, 'b')
+    del facts[1]
+    facts.add(Fact('d', 1, 'd'))
+    assert facts.version > version
+    assert [text for _, _, text in facts.rendered(formatter)] == ['#2 B', '#3 c', '#4 d']
+    assert sorted(formatted[3:]) == [2, 4]
+
+    facts.evict(2)
+    store['key_facts'] = dict(facts)
+    assert facts.rendered_text(formatter, "\n") == "#3 c\n#4 d"
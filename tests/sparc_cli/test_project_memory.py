@@ -0,0 +1,111 @@
+import copy
+
+import pytest
+from git import Repo
+
+from sparc_cli.project_memory import ProjectMemory, load_project_memory, save_project_memory
+from sparc_cli.tools.memory import _global_memory
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project directory with two files, as the working directory."""
+    (tmp_path / "auth.py").write_text("def login(): pass\n")
+    (tmp_path / "billing.py").write_text("def charge(): pass\n")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def memory():
+    """Global memory holding a few findings, restored afterwards."""
+    saved = copy.deepcopy(_global_memory)
+    _global_memory.clear()
+    _global_memory.update({
+        'config': {},
+        'research_notes': [],
+        'key_facts': {
+            1: {'content': 'auth.py handles login', 'priority': 2, 'timestamp': 't1'},
+            2: {'content': 'The project uses no framework', 'priority': 1, 'timestamp': 't2'},
+        },
+        'key_fact_id_counter': 3,
+        'key_snippets': {
+            1: {'filepath': 'billing.py', 'line_number': 1, 'snippet': 'def charge(): pass',
+                'description': None, 'priority': 1, 'timestamp': 't3'},
+        },
+        'key_snippet_id_counter': 2,
+        'related_files': {1: 'auth.py', 2: 'billing.py'},
+        'related_file_id_counter': 3,
+    })
+    yield _global_memory
+    _global_memory.clear()
+    _global_memory.update(saved)
+
+def _loaded(entries):
+    return (
+        [fact['content'] for fact in entries['key_facts'].values()],
+        [snippet['filepath'] for snippet in entries['key_snippets'].values()],
+        list(entries['related_files'].values()),
+    )
+
+def test_entries_are_dropped_when_their_files_change(project, memory):
+    """Test that entries stay valid while their files are unchanged and are dropped once they change."""
+    store = ProjectMemory(str(project / "project_memory.db"))
+    assert store.save(memory) == 5
+    assert _loaded(store.load()) == (
+        ['auth.py handles login', 'The project uses no framework'], ['billing.py'], ['auth.py', 'billing.py']
+    )
+
+    (project / "billing.py").write_text("def charge(amount): pass\n")
+    # The snippet depends on billing.py, and the fact naming no file on every related file
+    assert _loaded(store.load()) == (['auth.py handles login'], [], ['auth.py'])
+
+    (project / "auth.py").unlink()
+    assert _loaded(store.load()) == ([], [], [])
+
+def test_new_session_starts_with_saved_memory(project, memory):
+    """Test that saved findings are merged into the memory of a later session, unless disabled."""
+    save_project_memory()
+    _global_memory['key_facts'] = {}
+    _global_memory['related_files'] = {}
+
+    _global_memory['config'] = {'project_memory': False}
+    assert load_project_memory() == {}
+    assert len(_global_memory['key_facts']) == 0
+
+    _global_memory['config'] = {}
+    added = load_project_memory()
+    assert added['key_facts'] == 2 and added['key_snippets'] == 0 and added['related_files'] == 2
+    assert [fact['content'] for fact in _global_memory['key_facts'].values()] == [
+        'auth.py handles login', 'The project uses no framework'
+    ]
+    assert (project / ".sparc" / "project_memory.db").exists()
+
+def test_deleted_entries_are_removed_from_the_store(project, memory):
+    """Test that entries a session loaded and then deleted from its memory are not loaded again."""
+    save_project_memory()
+    _global_memory['key_facts'] = {}
+    _global_memory['related_files'] = {}
+    load_project_memory()
+    wrong = next(fact_id for fact_id, fact in _global_memory['key_facts'].items() if 'framework' in fact['content'])
+    del _global_memory.key_facts[wrong]
+    save_project_memory()
+
+    _global_memory['key_facts'] = {}
+    load_project_memory()
+    assert [fact['content'] for fact in _global_memory['key_facts'].values()] == ['auth.py handles login']
+
+def test_facts_without_files_hold_for_their_commit(project, memory):
+    """Test that facts of a session without related files are only kept for the commit they were found at."""
+    _global_memory['related_files'] = {}
+    _global_memory['key_snippets'] = {}
+    store = ProjectMemory(str(project / "project_memory.db"))
+    # Outside a repository nothing could tell whether they still hold
+    assert store.save(memory) == 0
+
+    repo = Repo.init(project)
+    repo.index.add(["auth.py"])
+    repo.index.commit("initial")
+    assert store.save(memory) == 2
+    assert len(store.load()['key_facts']) == 2
+    repo.index.add(["billing.py"])
+    repo.index.commit("billing")
+    assert store.load()['key_facts'] == {}
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import httpx
+import pytest
+from langchain_core.caches import InMemoryCache
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import sparc_cli.rate_limit as rate_limit
+from sparc_cli.rate_limit import (
+    CircuitBreaker,
+    HostRateLimiter,
+    RateLimitScheduler,
+    _parse_reset,
+    backoff_delay,
+    is_transient_error,
+    retry_after_from_error
+)
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def test_backoff_delay_is_capped_and_jittered():
+    """Test that delays stay below the cap, vary, and respect retry-after."""
+    delays = [backoff_delay(30, cap=60) for _ in range(50)]
+    assert all(0 <= d <= 60 for d in delays)
+    assert len(set(delays)) > 1
+    assert backoff_delay(0, retry_after=5) >= 5
+    assert backoff_delay(0, retry_after=3600, cap=60) == 60
+
+def test_parse_reset():
+    """Test parsing of duration and timestamp reset headers."""
+    assert _parse_reset("6m0s", 100.0) == 460.0
+    assert _parse_reset("20ms", 100.0) == pytest.approx(100.02)
+    assert _parse_reset("1970-01-01T00:02:00Z", 0.0) == 120.0
+    assert _parse_reset("soon", 0.0) is None
+
+def test_bucket_follows_headers():
+    """Test that an exhausted request limit delays the next request until a token refills."""
+    scheduler = RateLimitScheduler()
+    scheduler.update_from_headers("api.example.com", httpx.Headers({
+        "anthropic-ratelimit-requests-limit": "600",
+        "anthropic-ratelimit-requests-remaining": "0"
+    }))
+    waited = scheduler.acquire("api.example.com")
+    assert 0.05 < waited < 0.5
+    # Other hosts are not affected
+    assert scheduler.acquire("api.other.com") < 0.05
+
+def test_retry_after_blocks_host():
+    """Test that a retry-after header holds back the host's requests."""
+    scheduler = RateLimitScheduler()
+    scheduler.update_from_headers("api.example.com", httpx.Headers({"retry-after": "0.2"}))
+    assert scheduler.acquire("api.example.com") >= 0.15
+
+def test_circuit_breaker(monkeypatch):
+    """Test that repeated transient failures open the circuit until a probe succeeds."""
+    monkeypatch.setattr(rate_limit, 'CIRCUIT_FAILURE_THRESHOLD', 2)
+    breaker = CircuitBreaker(cooldown=10)
+    breaker.on_failure(0)
+    assert breaker.wait_time(0) == 0
+    breaker.on_failure(0)
+    assert breaker.is_open and breaker.wait_time(5) == 5
+
+    # After the cooldown one probe goes through, others wait for its outcome
+    assert breaker.wait_time(10) == 0
+    breaker.on_send(10)
+    assert breaker.wait_time(11) > 0
+    breaker.on_failure(12)
+    assert breaker.open_until == 32
+
+    breaker.on_success()
+    assert not breaker.is_open and breaker.wait_time(12) == 0
+
+def test_only_transient_failures_count():
+    """Test that client errors do not open the circuit."""
+    scheduler = RateLimitScheduler()
+    for _ in range(rate_limit.CIRCUIT_FAILURE_THRESHOLD):
+        scheduler.record_failure("api.example.com", StatusError(400))
+    assert not scheduler.is_circuit_open("api.example.com")
+    for _ in range(rate_limit.CIRCUIT_FAILURE_THRESHOLD):
+        scheduler.record_failure("api.example.com", StatusError(529))
+    assert scheduler.is_circuit_open("api.example.com")
+
+def test_cache_hits_bypass_the_scheduler(monkeypatch):
+    """Test that replayed responses neither wait for an open circuit nor close it."""
+    scheduler = RateLimitScheduler()
+    monkeypatch.setattr(rate_limit, '_scheduler', scheduler)
+    model = FakeListChatModel(responses=["a"], cache=InMemoryCache(), rate_limiter=HostRateLimiter("api.example.com"))
+    assert model.invoke("hi").content == "a"
+    for _ in range(rate_limit.CIRCUIT_FAILURE_THRESHOLD):
+        scheduler.record_response("api.example.com", 529)
+    assert not model.rate_limiter.acquire(blocking=False)
+
+    assert model.invoke("hi").content == "a"
+    assert scheduler.is_circuit_open("api.example.com")
+    scheduler.record_response("api.example.com", 200)
+    assert not scheduler.is_circuit_open("api.example.com")
+    assert model.rate_limiter.acquire(blocking=False)
+
+def test_root_agent_goes_first():
+    """Test that waiting requests are admitted in order of agent depth."""
+    scheduler = RateLimitScheduler()
+    scheduler.update_from_headers("api.example.com", httpx.Headers({"retry-after": "0.2"}))
+    order = []
+
+    def request(depth):
+        scheduler.acquire("api.example.com", depth)
+        order.append(depth)
+
+    threads = [threading.Thread(target=request, args=(depth,)) for depth in (3, 2, 1)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+    assert order == [1, 2, 3]
+
+def test_error_helpers():
+    """Test classification of provider errors and their retry-after header."""
+    assert is_transient_error(StatusError(429))
+    assert not is_transient_error(StatusError(401))
+    assert not is_transient_error(ValueError())
+
+    error = StatusError(429)
+    error.response = httpx.Response(429, headers={"retry-after": "7"})
+    assert retry_after_from_error(error) == 7.0
+    assert retry_after_from_error(ValueError()) is None
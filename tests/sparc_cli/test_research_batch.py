@@ -0,0 +1,104 @@
+import copy
+from datetime import datetime
+
+import pytest
+
+import sparc_cli.tools.agent as agent_tools
+import sparc_cli.ledger as ledger_module
+from sparc_cli.ledger import UsageEntry, UsageLedger, usage_scope
+from sparc_cli.research_batch import run_research_batch
+from sparc_cli.tools.agent import request_research_batch
+from sparc_cli.tools.memory import _global_memory, MemoryPriority
+
+def _fact(content):
+    return {'content': content, 'priority': MemoryPriority.MEDIUM, 'timestamp': datetime.now().isoformat()}
+
+def _echo_worker(job):
+    """Worker used in place of a research agent: records one fact per query."""
+    return {
+        'query': job['query'],
+        'success': True,
+        'reason': None,
+        'completion_message': '',
+        'key_facts': {job['memory']['key_fact_id_counter']: _fact(f"fact about {job['query']}")},
+        'key_snippets': {},
+        'related_files': {},
+        'research_notes': [],
+    }
+
+@pytest.fixture
+def memory():
+    """Run with a clean copy of global memory, restoring it afterwards."""
+    saved = copy.deepcopy(_global_memory)
+    _global_memory.update({
+        'key_facts': {1: _fact("known")},
+        'key_fact_id_counter': 2,
+        'key_snippets': {},
+        'key_snippet_id_counter': 1,
+        'related_files': {},
+        'related_file_id_counter': 1,
+        'research_notes': [],
+        'agent_depth': 1,
+        'work_log': [],
+        'config': {'cowboy_mode': True, 'max_parallel_research': 2}
+    })
+    yield _global_memory
+    _global_memory.clear()
+    _global_memory.update(saved)
+
+def test_run_research_batch():
+    """Test that every query is researched by a worker and results keep query order."""
+    results = run_research_batch(["auth", "billing", "logging"], {'key_fact_id_counter': 1}, max_workers=2, worker=_echo_worker)
+    assert [r['query'] for r in results] == ["auth", "billing", "logging"]
+    assert results[1]['key_facts'] == {1: results[1]['key_facts'][1]}
+    assert results[1]['key_facts'][1]['content'] == "fact about billing"
+
+def _usage_worker(job):
+    """Worker that reports one model call, attributed to the scope it was started in."""
+    return {**_echo_worker(job), 'usage': [UsageEntry(job['usage_scope'], 'anthropic', 'claude', input_tokens=10)]}
+
+def test_run_research_batch_merges_usage(monkeypatch):
+    """Test that model usage of the workers is added to the parent's ledger under the batch's scope."""
+    ledger = UsageLedger()
+    monkeypatch.setattr(ledger_module, '_ledger', ledger)
+    with usage_scope("research"), usage_scope("request_research_batch"):
+        results = run_research_batch(["auth", "billing"], {'key_fact_id_counter': 1}, max_workers=2, worker=_usage_worker)
+    assert all('usage' not in result for result in results)
+    summary = ledger.summary()
+    assert list(summary['by_scope']) == ["research > request_research_batch"]
+    assert summary['total']['input_tokens'] == 20
+
+def test_request_research_batch_merges_findings(memory, monkeypatch):
+    """Test that findings of parallel agents are merged into memory without duplicates."""
+    def fake_batch(queries, snapshot, *, max_workers):
+        assert max_workers == 2
+        return [
+            {**_echo_worker({'query': query, 'memory': snapshot}),
+             'key_facts': {2: _fact("known"), 3: _fact("shared")},
+             'research_notes': [{'content': f"note on {query}", 'priority': MemoryPriority.MEDIUM,
+                                 'timestamp': datetime.now().isoformat()}]}
+            for query in queries
+        ]
+    monkeypatch.setattr(agent_tools, 'run_research_batch', fake_batch)
+
+    result = request_research_batch.invoke({"queries": ["auth", " auth ", "billing", ""]})
+
+    assert result['success']
+    assert [r['query'] for r in result['query_results']] == ["auth", "billing"]
+    assert [f['content'] for f in memory['key_facts'].values()] == ["known", "shared"]
+    assert [n['content'] for n in memory['research_notes']] == ["note on auth", "note on billing"]
+
+def test_worker_runs_research_with_the_parent_config(memory, monkeypatch):
+    """Test that a research worker passes the parent's run config on to its agent."""
+    import sparc_cli.agent_utils as agent_utils
+    import sparc_cli.llm as llm_module
+    from sparc_cli.research_batch import _run_research_in_worker
+
+    configs = []
+    monkeypatch.setattr(llm_module, 'get_llm', lambda provider, model: (provider, model))
+    monkeypatch.setattr(agent_utils, 'run_research_agent', lambda query, model, **kwargs: configs.append((model, kwargs['config'])))
+    snapshot = memory.to_dict()
+    snapshot['config'] = {'provider': 'openai', 'model': 'gpt-4o', 'output_mode': 'plain', 'async_agents': True}
+    result = _run_research_in_worker({'query': 'auth', 'memory': snapshot, 'usage_scope': ()})
+    assert result['success']
+    assert configs == [(('openai', 'gpt-4o'), snapshot['config'])]
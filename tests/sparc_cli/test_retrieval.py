@@ -0,0 +1,49 @@
+from sparc_cli.memory_store import Fact
+from sparc_cli.retrieval import BM25Index, tokenize
+from sparc_cli.session import Session, use_session
+from sparc_cli.tools.memory import _global_memory, get_relevant_memory_items
+
+def test_bm25_ranks_matching_documents_and_follows_removals():
+    """Test that documents sharing rarer query terms rank first, and removed ones are no longer found."""
+    assert tokenize("Call get_memory_value in authService.py") == [
+        'call', 'get', 'memory', 'value', 'get_memory_value', 'auth', 'service', 'py', 'authservice.py'
+    ]
+    index = BM25Index()
+    index.add('auth', "Login is handled by auth_service, which checks the session token")
+    index.add('billing', "Billing charges the card and writes an invoice")
+    index.add('logging', "Logging writes every request to the log file")
+    ranked = index.search("how does the login token check work", 3)
+    assert [key for key, _ in ranked] == ['auth']
+
+    index.add('auth', "Authentication is delegated to an external provider")
+    assert index.search("login token", 3) == []
+    index.remove('billing')
+    assert 'billing' not in index and len(index) == 2
+    assert [key for key, _ in index.search("writes", 3)] == ['logging']
+
+def test_prompts_get_the_relevant_facts_within_budget():
+    """Test that only the top-k facts relevant to the task are selected, in memory order and within budget."""
+    with use_session(Session()):
+        facts = _global_memory.key_facts
+        facts.add(Fact("The CLI entry point is sparc_cli/__main__.py", 1, 't1'))
+        facts.add(Fact("Billing invoices are rendered with Jinja templates", 1, 't2'))
+        facts.add(Fact("Retries of billing charges use exponential backoff", 1, 't3'))
+        facts.add(Fact("Tests run with pytest", 3, 't4'))
+
+        selected = get_relevant_memory_items('key_facts', "Fix the billing invoice template", top_k=2, max_tokens=0)
+        assert [text.splitlines()[-1] for text, _ in selected] == [
+            "Billing invoices are rendered with Jinja templates",
+            "Retries of billing charges use exponential backoff",
+        ]
+
+        # Entries added, changed and removed since the last search are ranked too
+        del facts[2]
+        facts[3] = Fact("Invoices are emailed after each charge", 1, 't3')
+        selected = get_relevant_memory_items('key_facts', "Fix the billing invoice template", top_k=2, max_tokens=0)
+        assert [text.splitlines()[-1] for text, _ in selected] == [
+            "Invoices are emailed after each charge", "Tests run with pytest"
+        ]
+
+        # The budget only leaves room for one fact
+        assert len(get_relevant_memory_items('key_facts', "billing invoice", top_k=3, max_tokens=20)) == 1
+        assert len(get_relevant_memory_items('key_facts', "billing invoice", top_k=0, max_tokens=0)) == 3
@@ -0,0 +1,131 @@
+import os
+import pytest
+from git import Repo
+import sparc_cli.tool_cache as tool_cache
+from sparc_cli.scheduler import (
+    build_task_waves,
+    snapshot_working_tree,
+    create_task_worktree,
+    collect_worktree_patch,
+    apply_patch,
+    remove_task_worktree,
+    run_wave_in_worktrees
+)
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """Create a git repository with one commit and an uncommitted change."""
+    repo = Repo.init(tmp_path)
+    (tmp_path / "a.py").write_text("a = 1\n")
+    (tmp_path / "b.py").write_text("b = 1\n")
+    repo.index.add(["a.py", "b.py"])
+    repo.index.commit("initial")
+    # Uncommitted edit and untracked file must be visible to task worktrees
+    (tmp_path / "a.py").write_text("a = 2\n")
+    (tmp_path / "c.py").write_text("c = 1\n")
+    return repo
+
+def _append_marker_worker(job):
+    """Worker used in place of an implementation agent: edits the task's file."""
+    path = os.path.join(job['worktree'], job['task'])
+    with open(path, 'a') as f:
+        f.write(f"# task {job['task_id']}\n")
+    return {
+        'task_id': job['task_id'],
+        'success': True,
+        'reason': None,
+        'completion_message': '',
+        'patch': collect_worktree_patch(job['worktree'], job['snapshot']),
+        'key_facts': {},
+        'key_snippets': {},
+        'related_files': {},
+    }
+
+def test_build_task_waves_independent_tasks():
+    """Test that tasks with disjoint files share a wave."""
+    waves = build_task_waves([1, 2, 3], {1: ["a.py"], 2: ["b.py"], 3: ["c.py"]}, {})
+    assert waves == [[1, 2, 3]]
+
+def test_build_task_waves_file_conflict():
+    """Test that tasks touching the same file run in separate waves, in ID order."""
+    waves = build_task_waves([1, 2, 3], {1: ["a.py"], 2: ["./a.py", "b.py"], 3: ["c.py"]}, {})
+    assert waves == [[1, 3], [2]]
+
+def test_build_task_waves_dependencies():
+    """Test that dependent tasks run after their dependencies."""
+    waves = build_task_waves(
+        [1, 2, 3],
+        {1: ["a.py"], 2: ["b.py"], 3: ["c.py"]},
+        {1: [3], 2: [], 3: []}
+    )
+    assert waves == [[2, 3], [1]]
+
+def test_build_task_waves_undeclared_files_run_alone():
+    """Test that tasks without declared files are serialized."""
+    waves = build_task_waves([1, 2, 3], {1: ["a.py"], 2: [], 3: ["c.py"]}, {})
+    assert waves == [[1], [2], [3]]
+
+def test_build_task_waves_ignores_unknown_dependencies():
+    """Test that dependencies on deleted tasks do not block scheduling."""
+    waves = build_task_waves([2], {2: ["b.py"]}, {2: [1]})
+    assert waves == [[2]]
+
+def test_build_task_waves_cycle():
+    """Test that circular dependencies are reported."""
+    with pytest.raises(ValueError):
+        build_task_waves([1, 2], {1: ["a.py"], 2: ["b.py"]}, {1: [2], 2: [1]})
+
+def test_worktree_patch_roundtrip(git_repo, monkeypatch):
+    """Test that changes made in a task worktree are applied back to the main tree."""
+    root = git_repo.working_tree_dir
+    snapshot = snapshot_working_tree(git_repo)
+
+    # The snapshot must not move HEAD or stage anything
+    assert git_repo.head.commit.message == "initial"
+    assert not git_repo.index.diff("HEAD")
+
+    worktree = create_task_worktree(git_repo, snapshot, 1)
+    try:
+        assert open(os.path.join(worktree, "a.py")).read() == "a = 2\n"
+        assert os.path.exists(os.path.join(worktree, "c.py"))
+        with open(os.path.join(worktree, "b.py"), "w") as f:
+            f.write("b = 2\n")
+        with open(os.path.join(worktree, "d.py"), "w") as f:
+            f.write("d = 1\n")
+        patch = collect_worktree_patch(worktree, snapshot)
+    finally:
+        remove_task_worktree(git_repo, worktree)
+
+    assert not os.path.exists(worktree)
+    monkeypatch.setattr(tool_cache, '_cache', tool_cache.ToolResultCache())
+    tool_cache.get_tool_cache().store("search", "state", "result")
+    apply_patch(git_repo, patch)
+    # Cached reads and searches of the main tree are stale now
+    assert len(tool_cache.get_tool_cache()) == 0
+    assert open(os.path.join(root, "a.py")).read() == "a = 2\n"
+    assert open(os.path.join(root, "b.py")).read() == "b = 2\n"
+    assert open(os.path.join(root, "d.py")).read() == "d = 1\n"
+
+def test_apply_empty_patch(git_repo):
+    """Test that an empty patch is a no-op."""
+    apply_patch(git_repo, "")
+    assert open(os.path.join(git_repo.working_tree_dir, "b.py")).read() == "b = 1\n"
+
+@pytest.mark.timeout(120)
+def test_run_wave_in_worktrees(git_repo):
+    """Test that a wave runs concurrently and every task's changes are merged."""
+    root = git_repo.working_tree_dir
+    results = run_wave_in_worktrees(
+        [1, 2],
+        {1: "a.py", 2: "b.py"},
+        {},
+        repo_path=root,
+        max_workers=2,
+        worker=_append_marker_worker
+    )
+
+    assert [r['task_id'] for r in results] == [1, 2]
+    assert all(r['success'] for r in results)
+    assert open(os.path.join(root, "a.py")).read() == "a = 2\n# task 1\n"
+    assert open(os.path.join(root, "b.py")).read() == "b = 1\n# task 2\n"
+    assert git_repo.git.worktree('list').count('\n') == 0
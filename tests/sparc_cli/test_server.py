@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import pytest
+
+from sparc_cli.server import JobServer, JobStore, is_loopback_host
+
+pytestmark = pytest.mark.timeout(180)
+
+def _traced_job(job):
+    """Job used in place of an agent run: sleeps if asked to, writes one span and reports its process."""
+    task = job['task']
+    if task['message'] == 'sleep':
+        time.sleep(60)
+    with open(job['trace_path'], 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'name': 'agent', 'kind': 'agent'}) + '\n')
+    return {'id': task['id'], 'success': task['message'] != 'fail', 'error': None, 'pid': os.getpid()}
+
+def _serve(tmp_path, scenario, **kwargs):
+    async def run():
+        server = JobServer(str(tmp_path), workers=1, run_job=_traced_job, **kwargs)
+        host, port = await server.start('127.0.0.1', 0)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://{host}:{port}", timeout=60) as client:
+                return await scenario(client)
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+async def _wait(client, job_id):
+    while (job := (await client.get(f"/jobs/{job_id}")).json())['status'] in ('queued', 'running'):
+        await asyncio.sleep(0.05)
+    return job
+
+def test_jobs_run_on_a_warm_worker_and_stream_events(tmp_path):
+    """Test that jobs are run one after another by the same worker process and their events are streamed."""
+    async def scenario(client):
+        first = await client.post("/jobs", json={"id": "a", "message": "work"})
+        assert first.status_code == 202
+        async with client.stream("GET", "/jobs/a/events") as response:
+            body = "".join([chunk async for chunk in response.aiter_text()])
+        second = (await client.post("/jobs", json={"message": "fail"})).json()
+        return (await _wait(client, 'a'), await _wait(client, second['id']), body,
+                await client.post("/jobs", json={"id": "a", "message": "again"}))
+
+    first, second, events, duplicate = _serve(tmp_path, scenario)
+    assert (first['status'], second['status']) == ('succeeded', 'failed')
+    assert first['result']['pid'] == second['result']['pid'] != os.getpid()
+    assert 'event: span' in events and '"status": "succeeded"' in events
+    assert duplicate.status_code == 409
+    assert os.path.exists(tmp_path / ".sparc" / "server" / "a.trace.jsonl")
+
+def test_cancel_running_job_restarts_worker(tmp_path):
+    """Test that cancelling a running job stops it and the worker takes the next job."""
+    async def scenario(client):
+        await client.post("/jobs", json={"id": "slow", "message": "sleep"})
+        while (await client.get("/jobs/slow")).json()['status'] != 'running':
+            await asyncio.sleep(0.05)
+        cancelled = (await client.delete("/jobs/slow")).json()
+        await client.post("/jobs", json={"id": "next", "message": "work"})
+        return cancelled, await _wait(client, 'slow'), await _wait(client, 'next')
+
+    cancelled, slow, following = _serve(tmp_path, scenario)
+    assert cancelled['status'] == slow['status'] == 'cancelled'
+    assert following['status'] == 'succeeded'
+
+def test_requests_need_the_token(tmp_path):
+    """Test that requests without the server's bearer token are refused."""
+    async def scenario(client):
+        return (await client.get("/health"),
+                await client.get("/health", headers={'Authorization': 'Bearer secret'}),
+                await client.post("/jobs", json={"id": "x"}, headers={'Authorization': 'Bearer secret'}),
+                await client.post("/jobs", json={"id": "../../x", "message": "m"},
+                                  headers={'Authorization': 'Bearer secret'}))
+
+    refused, health, invalid, escaping = _serve(tmp_path, scenario, token='secret')
+    assert refused.status_code == 401
+    assert health.json()['workers'] == 1
+    assert invalid.status_code == 400 and 'needs a message' in invalid.json()['error']
+    assert escaping.status_code == 400 and not os.path.exists(tmp_path / ".sparc" / "x.log")
+
+def test_public_interfaces_need_a_token(tmp_path):
+    """Test that the server only listens beyond loopback when requests need a token."""
+    assert is_loopback_host('127.0.0.1') and is_loopback_host('::1') and is_loopback_host('localhost')
+    assert not is_loopback_host('0.0.0.0') and not is_loopback_host('example.com')
+    server = JobServer(str(tmp_path), workers=1, run_job=_traced_job)
+    with pytest.raises(ValueError, match="SPARC_SERVER_TOKEN"):
+        asyncio.run(server.start('0.0.0.0', 0))
+
+def test_store_requeues_interrupted_jobs(tmp_path):
+    """Test that jobs left running by a stopped server are queued again."""
+    store = JobStore(str(tmp_path / "server.db"))
+    for job_id in ('a', 'b', 'c'):
+        store.add({'id': job_id, 'message': 'm'})
+    store.set_status('a', 'running')
+    store.set_status('c', 'succeeded', {'id': 'c', 'success': True})
+    assert store.requeue_interrupted() == ['a', 'b']
+    assert store.get('c')['result'] == {'id': 'c', 'success': True}
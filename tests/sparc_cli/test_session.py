@@ -0,0 +1,73 @@
+import asyncio
+import copy
+import threading
+
+import sparc_cli.agent_utils as agent_utils
+import sparc_cli.tools.expert as expert
+from sparc_cli.session import Session, current_session, use_session
+from sparc_cli.tools.expert import emit_expert_context, expert_context
+from sparc_cli.tools.memory import _global_memory, emit_key_facts
+
+def test_concurrent_threads_keep_their_own_memory():
+    """Test that agents on threads of one process each write to the memory of their own session."""
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def run(name):
+        with use_session(Session()) as session:
+            barrier.wait()
+            emit_key_facts.invoke({'facts': [f"{name} fact"]})
+            emit_expert_context.invoke({'context': f"{name} context"})
+            barrier.wait()
+            results[name] = (
+                [fact['content'] for fact in _global_memory['key_facts'].values()],
+                list(expert_context['text']),
+                session.memory['key_fact_id_counter'],
+            )
+
+    default_facts = len(_global_memory['key_facts'])
+    threads = [threading.Thread(target=run, args=(name,)) for name in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {'a': (['a fact'], ['a context'], 2), 'b': (['b fact'], ['b context'], 2)}
+    assert len(_global_memory['key_facts']) == default_facts
+
+def test_interrupts_and_agent_loop_follow_the_session():
+    """Test that an interrupt stops only its own session's section, also on the shared agent loop."""
+    session = Session()
+    with use_session(session), agent_utils.InterruptibleSection():
+        other = Session()
+        with use_session(other), agent_utils.InterruptibleSection():
+            agent_utils._request_interrupt(None, None)
+            assert agent_utils._interrupt_requested()
+        assert not agent_utils._interrupt_requested()
+
+        async def in_loop():
+            _global_memory['agent_depth'] = 3
+            return current_session()
+
+        assert agent_utils.run_on_agent_loop(in_loop()) is session
+        assert session.memory['agent_depth'] == 3
+
+def test_module_level_memory_copies_the_session_memory():
+    """Test that copies of the module-level memory are of the current session's memory."""
+    with use_session(Session()) as session:
+        _global_memory['config'] = {'provider': 'openai'}
+        saved = copy.deepcopy(_global_memory)
+        _global_memory.clear()
+        assert 'config' not in session.memory
+        _global_memory.update(saved)
+        assert session.memory['config'] == {'provider': 'openai'}
+        assert _global_memory.key_facts is session.memory.key_facts
+
+def test_expert_model_follows_the_session_config(monkeypatch):
+    """Test that each session, such as each server job, gets the expert model its own config names."""
+    monkeypatch.setattr(expert, 'get_llm', lambda provider, model, expert: (provider, model))
+    for provider, model in (('openai', 'o1'), ('anthropic', 'claude')):
+        with use_session(Session()):
+            _global_memory['config'] = {'expert_provider': provider, 'expert_model': model}
+            assert expert.get_model() == (provider, model)
+            assert expert.get_model() is expert.get_model()
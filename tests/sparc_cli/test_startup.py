@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+import pytest
+
+# Seconds `import sparc_cli.__main__` may take, as reported by -X importtime
+IMPORT_TIME_BUDGET = 1.0
+
+HEAVY_MODULES = (
+    'langgraph', 'langchain_openai', 'langchain_anthropic', 'openai', 'anthropic',
+    'playwright', 'sympy', 'numpy', 'fuzzywuzzy', 'git'
+)
+
+def _run_python(code):
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+
+def test_cli_import_skips_heavy_dependencies():
+    """Test that importing the CLI entry point loads none of the agents' heavy dependencies."""
+    result = _run_python(
+        "import sys, sparc_cli.__main__\n"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    assert result.stdout.split() == []
+
+def test_cli_import_time_budget():
+    """Test that importing the CLI entry point stays within its import time budget."""
+    result = _run_python("import sparc_cli.__main__")
+    cumulative = [
+        int(line.split('|')[1]) for line in result.stderr.splitlines()
+        if line.startswith('import time:') and line.rstrip().endswith('| sparc_cli.__main__')
+    ]
+    assert cumulative, result.stderr
+    assert cumulative[0] / 1e6 <= IMPORT_TIME_BUDGET
+
+@pytest.mark.parametrize('name', ['read_file_tool', 'scrape_url_tool', 'request_research', 'CalculatorTool'])
+def test_registered_tools_resolve(name):
+    """Test that registered tools resolve from the lazy registry, to the same object as the tools package exports."""
+    from sparc_cli import tools
+    from sparc_cli.tool_configs import get_tool
+
+    tool = get_tool(name)
+    assert tool is get_tool(name)
+    if name in tools.__all__:
+        assert getattr(tools, name) is tool
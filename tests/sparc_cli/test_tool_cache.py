@@ -0,0 +1,121 @@
+import os
+
+import pytest
+from git import Repo
+from langchain_core.tools import tool
+
+import sparc_cli.tool_cache as tool_cache
+from sparc_cli.tool_cache import (
+    ToolResultCache,
+    cached_tool_result,
+    git_status_fingerprint,
+    invalidates_tool_cache,
+    path_fingerprint,
+    tree_fingerprint
+)
+from sparc_cli.tools.memory import _global_memory
+
+calls = []
+
+@tool
+@cached_tool_result(lambda args: path_fingerprint(args['filepath']))
+def read(filepath: str, verbose: bool = True) -> dict:
+    """Read a file."""
+    calls.append(filepath)
+    with open(filepath) as f:
+        return {"content": f.read()}
+
+@tool
+@invalidates_tool_cache
+def shell(command: str) -> str:
+    """Run a command."""
+    return command
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    """Give each test an empty cache with caching enabled."""
+    fresh = ToolResultCache()
+    monkeypatch.setattr(tool_cache, '_cache', fresh)
+    monkeypatch.setitem(_global_memory, 'config', {})
+    calls.clear()
+    return fresh
+
+def test_repeated_call_is_served_from_cache(tmp_path, cache):
+    """Test that an identical call with unchanged inputs does not run the tool again."""
+    path = tmp_path / "a.txt"
+    path.write_text("one")
+    assert read.invoke({"filepath": str(path)}) == {"content": "one"}
+    assert read.invoke({"filepath": str(path), "verbose": True}) == {"content": "one"}
+    assert calls == [str(path)]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_changed_file_is_read_again(tmp_path):
+    """Test that a change to the file's mtime or size invalidates its cached read."""
+    path = tmp_path / "a.txt"
+    path.write_text("one")
+    read.invoke({"filepath": str(path)})
+    path.write_text("longer")
+    os.utime(path, ns=(1, 1))
+    assert read.invoke({"filepath": str(path)}) == {"content": "longer"}
+    assert len(calls) == 2
+
+def test_write_tools_clear_the_cache(tmp_path, cache):
+    """Test that running a tool that may write files drops all cached results."""
+    path = tmp_path / "a.txt"
+    path.write_text("one")
+    read.invoke({"filepath": str(path)})
+    shell.invoke({"command": "true"})
+    assert len(cache) == 0
+    read.invoke({"filepath": str(path)})
+    assert len(calls) == 2
+
+def test_cache_can_be_disabled(tmp_path, monkeypatch):
+    """Test that the tool runs every time when the tool cache is turned off."""
+    monkeypatch.setitem(_global_memory, 'config', {'tool_cache': False})
+    path = tmp_path / "a.txt"
+    path.write_text("one")
+    read.invoke({"filepath": str(path)})
+    read.invoke({"filepath": str(path)})
+    assert len(calls) == 2
+
+def test_cache_evicts_least_recently_used():
+    """Test that the cache keeps at most max_entries results, dropping the oldest lookups first."""
+    cache = ToolResultCache(max_entries=2)
+    cache.store("a", 1, "A")
+    cache.store("b", 1, "B")
+    assert cache.lookup("a", 1) == (True, "A")
+    cache.store("c", 1, "C")
+    assert cache.lookup("b", 1) == (False, None)
+    assert cache.lookup("a", 1) == (True, "A")
+
+def test_git_status_fingerprint(tmp_path):
+    """Test that the repository fingerprint follows commits, staging and unstaged edits, also from subdirectories."""
+    assert git_status_fingerprint(str(tmp_path)) is None
+    repo = Repo.init(tmp_path)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.py").write_text("a = 1\n")
+    repo.index.add(["sub/a.py"])
+    repo.index.commit("initial")
+    subdir = str(tmp_path / "sub")
+
+    clean = git_status_fingerprint(subdir)
+    assert git_status_fingerprint(subdir) == clean
+    (tmp_path / "sub" / "a.py").write_text("a = 2\n")
+    edited = git_status_fingerprint(subdir)
+    assert edited != clean
+    # A further edit of an already modified file
+    (tmp_path / "sub" / "a.py").write_text("a = 33\n")
+    assert git_status_fingerprint(subdir) != edited
+    edited = git_status_fingerprint(subdir)
+    (tmp_path / "sub" / "new.py").write_text("b = 1\n")
+    assert git_status_fingerprint(subdir) != edited
+
+def test_tree_fingerprint_covers_the_listed_depth(tmp_path):
+    """Test that the tree fingerprint changes with entries anywhere within max_depth, and only there."""
+    (tmp_path / "sub" / "deep").mkdir(parents=True)
+    listed = tree_fingerprint(str(tmp_path), 2)
+    (tmp_path / "sub" / "deep" / "c.py").write_text("c = 1\n")
+    assert tree_fingerprint(str(tmp_path), 2) == listed
+    (tmp_path / "sub" / "new2.py").write_text("b = 1\n")
+    assert tree_fingerprint(str(tmp_path), 2) != listed
+    assert tree_fingerprint(str(tmp_path / "missing"), 2) is None
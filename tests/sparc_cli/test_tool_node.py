@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from sparc_cli.agent_utils import run_on_agent_loop
+from sparc_cli.tool_node import ConcurrentToolNode, _batches
+
+events = []
+running = {'now': 0, 'max': 0}
+lock = threading.Lock()
+
+def _track(name):
+    with lock:
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+        events.append(f"start {name}")
+    time.sleep(0.05)
+    with lock:
+        running['now'] -= 1
+        events.append(f"end {name}")
+    return name
+
+@tool
+def read(path: str) -> str:
+    """Read a file."""
+    return _track(path)
+
+@tool
+def write(path: str) -> str:
+    """Write a file."""
+    return _track(path)
+
+def _message(*calls):
+    return {"messages": [AIMessage(content="", tool_calls=[
+        {"name": name, "args": {"path": path}, "id": f"call-{i}"} for i, (name, path) in enumerate(calls)
+    ])]}
+
+def _reset():
+    events.clear()
+    running.update(now=0, max=0)
+
+def test_batches():
+    """Test that consecutive read-only calls are grouped and other calls run alone."""
+    calls = [{"name": name} for name in ["read", "read", "write", "read", "write", "write"]]
+    assert [[c["name"] for c in batch] for batch in _batches(calls, {"read"})] == [
+        ["read", "read"], ["write"], ["read"], ["write"], ["write"]
+    ]
+
+def test_reads_run_concurrently_within_limit():
+    """Test that read-only calls overlap up to the concurrency limit."""
+    _reset()
+    node = ConcurrentToolNode([read, write], max_concurrency=2, concurrent_tools={"read"})
+    result = node.invoke(_message(("read", "a"), ("read", "b"), ("read", "c")))
+    assert [m.content for m in result["messages"]] == ["a", "b", "c"]
+    assert running['max'] == 2
+
+def test_writes_run_exclusively_in_order():
+    """Test that a mutating call never overlaps another call."""
+    _reset()
+    node = ConcurrentToolNode([read, write], max_concurrency=4, concurrent_tools={"read"})
+    result = node.invoke(_message(("read", "a"), ("write", "b"), ("read", "c")))
+    assert [m.content for m in result["messages"]] == ["a", "b", "c"]
+    assert events == ["start a", "end a", "start b", "end b", "start c", "end c"]
+
+def test_async_reads_run_concurrently():
+    """Test that the async path runs read-only calls concurrently under the limit."""
+    _reset()
+    node = ConcurrentToolNode([read, write], max_concurrency=3, concurrent_tools={"read"})
+    result = asyncio.run(node.ainvoke(_message(*[("read", str(i)) for i in range(5)], ("write", "w"))))
+    assert [m.content for m in result["messages"]] == ["0", "1", "2", "3", "4", "w"]
+    assert running['max'] == 3
+    assert events[-2:] == ["start w", "end w"]
+
+def test_agent_loop_is_shared():
+    """Test that coroutines from different threads run on one event loop."""
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    loops = []
+    thread = threading.Thread(target=lambda: loops.append(run_on_agent_loop(current_loop())))
+    thread.start()
+    thread.join()
+    assert run_on_agent_loop(current_loop()) is loops[0]
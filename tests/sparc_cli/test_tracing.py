@@ -0,0 +1,99 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import create_react_agent
+
+import sparc_cli.tracing as tracing
+from sparc_cli.agent_utils import run_agent_with_retry
+from sparc_cli.tools.memory import _global_memory
+from sparc_cli.tracing import Tracer, agent_span, get_tracer, to_chrome_trace
+
+class ToolCallingModel(FakeMessagesListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+@pytest.fixture
+def trace_path(tmp_path, monkeypatch):
+    """Enable tracing to a temporary file for the test."""
+    path = str(tmp_path / "trace.jsonl")
+    monkeypatch.setattr(tracing, '_tracer', None)
+    monkeypatch.setitem(_global_memory, 'config', {'trace_path': path})
+    yield path
+    if tracing._tracer is not None:
+        tracing._tracer.close()
+
+def test_spans_nest_and_are_written_as_jsonl(trace_path):
+    """Test that spans opened inside an agent span are its children and reach the file."""
+    with agent_span("research", depth=1):
+        with agent_span("expert", depth=2):
+            pass
+    records = Tracer(trace_path).records()
+    assert [r['name'] for r in records] == ["expert", "research"]
+    expert, research = records
+    assert expert['parent_id'] == research['span_id']
+    assert research['parent_id'] is None
+    assert expert['duration'] >= 0
+
+def test_tracing_is_off_without_path(monkeypatch):
+    """Test that no tracer is opened unless a trace path is configured."""
+    monkeypatch.setattr(tracing, '_tracer', None)
+    monkeypatch.setitem(_global_memory, 'config', {})
+    assert get_tracer() is None
+    with agent_span("research"):
+        pass
+
+def test_agent_run_records_llm_tool_and_sub_agent_spans(trace_path):
+    """Test that model calls, tool calls and sub-agents are traced under their agent."""
+    @tool
+    def research(query: str) -> str:
+        """Run a sub-agent."""
+        child = create_react_agent(FakeMessagesListChatModel(responses=[AIMessage(content="found")]), [],
+                                   checkpointer=MemorySaver())
+        run_agent_with_retry(child, query, {"agent_name": "child", "configurable": {"thread_id": "child"}})
+        return "x" * 10
+
+    usage = {"input_tokens": 100, "output_tokens": 7, "total_tokens": 107, "input_token_details": {"cache_read": 60}}
+    parent = create_react_agent(ToolCallingModel(responses=[
+        AIMessage(content="", tool_calls=[{"name": "research", "args": {"query": "q"}, "id": "1"}], usage_metadata=usage),
+        AIMessage(content="done", usage_metadata=usage)
+    ]), [research], checkpointer=MemorySaver())
+    run_agent_with_retry(parent, "task", {"agent_name": "parent", "configurable": {"thread_id": "parent"}})
+
+    records = get_tracer().records()
+    by_kind = {}
+    for record in records:
+        by_kind.setdefault(record['kind'], []).append(record)
+    agents = {r['name']: r for r in by_kind['agent']}
+    assert agents['parent']['parent_id'] is None
+    assert agents['child']['parent_id'] == agents['parent']['span_id']
+    assert agents['child']['depth'] == 2
+
+    [tool_span] = by_kind['tool']
+    assert tool_span['name'] == "research"
+    assert tool_span['parent_id'] == agents['parent']['span_id']
+    assert tool_span['attributes']['output_bytes'] == 10
+
+    parent_llm = [r for r in by_kind['llm'] if r['parent_id'] == agents['parent']['span_id']]
+    assert len(parent_llm) == 2
+    assert parent_llm[0]['attributes']['tokens_in'] == 100
+    assert parent_llm[0]['attributes']['tokens_out'] == 7
+    assert parent_llm[0]['attributes']['cached_tokens'] == 60
+    assert any(r['parent_id'] == agents['child']['span_id'] for r in by_kind['llm'])
+
+def test_chrome_trace_conversion():
+    """Test that spans become complete events in microseconds, ordered by start time."""
+    records = [
+        {'name': 'b', 'kind': 'tool', 'span_id': '2', 'parent_id': '1', 'depth': 1, 'start': 2.0,
+         'duration': 0.5, 'pid': 1, 'thread': 9, 'attributes': {'output_bytes': 3}},
+        {'name': 'a', 'kind': 'agent', 'span_id': '1', 'parent_id': None, 'depth': 1, 'start': 1.0,
+         'duration': 2.0, 'pid': 1, 'thread': 9, 'attributes': {}},
+    ]
+    events = to_chrome_trace(records)['traceEvents']
+    assert [e['name'] for e in events] == ['a', 'b']
+    assert events[1]['ph'] == 'X'
+    assert events[1]['ts'] == 2e6
+    assert events[1]['dur'] == 5e5
+    assert events[1]['args']['output_bytes'] == 3
+    assert events[1]['args']['parent_id'] == '1'
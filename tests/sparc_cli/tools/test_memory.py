@@ -1,3 +1,4 @@
+import copy
 import pytest
 from datetime import datetime, timedelta
 from sparc_cli.tools.memory import (
@@ -19,6 +20,12 @@ from sparc_cli.tools.memory import (
     task_completed,
     plan_implementation_completed,
     one_shot_completed,
+    swap_task_order,
+    merge_memory_entries,
+    memory_entries_since,
+    get_memory_items,
+    add_eviction_hook,
+    remove_eviction_hook,
     MemoryPriority,
     MEMORY_LIMITS
 )
@@ -32,6 +39,8 @@ def setup_function():
         'research_notes': [],
         'plans': [],
         'tasks': {},
+        'task_files': {},
+        'task_dependencies': {},
         'task_completed': False,
         'completion_message': '',
         'task_id_counter': 1,
@@ -255,3 +264,98 @@ def test_completion_flags():
     one_shot_completed("One-shot done")
     assert _global_memory['task_completed'] is True
     assert _global_memory['completion_message'] == "One-shot done"
+
+def test_emit_task_files_and_dependencies():
+    """Test that tasks record their declared files and dependencies."""
+    emit_task.invoke({"task": "first", "files": ["a.py"]})
+    emit_task.invoke({"task": "second", "files": ["b.py"], "depends_on": [1]})
+
+    assert _global_memory['task_files'] == {1: ["a.py"], 2: ["b.py"]}
+    assert _global_memory['task_dependencies'] == {1: [], 2: [1]}
+
+    # Metadata follows the task when the order is swapped
+    swap_task_order.invoke({"id1": 1, "id2": 2})
+    assert _global_memory['tasks'] == {1: "second", 2: "first"}
+    assert _global_memory['task_files'] == {1: ["b.py"], 2: ["a.py"]}
+    assert _global_memory['task_dependencies'] == {1: [2], 2: []}
+
+    delete_tasks.invoke({"task_ids": [1]})
+    assert 1 not in _global_memory['task_files']
+    assert 1 not in _global_memory['task_dependencies']
+
+def test_merge_memory_entries():
+    """Test merging entries recorded by another agent with deduplication."""
+    emit_key_facts.invoke({"facts": ["known fact"]})
+    emit_related_files.invoke({"files": ["a.py"]})
+
+    snippet = {
+        'filepath': 'b.py',
+        'line_number': 3,
+        'snippet': 'b = 1',
+        'description': None,
+        'priority': MemoryPriority.MEDIUM,
+        'timestamp': datetime.now().isoformat()
+    }
+    added = merge_memory_entries(
+        key_facts={
+            5: {'content': 'known fact', 'priority': MemoryPriority.MEDIUM, 'timestamp': datetime.now().isoformat()},
+            6: {'content': 'new fact', 'priority': MemoryPriority.HIGH, 'timestamp': datetime.now().isoformat()}
+        },
+        key_snippets={7: snippet, 8: dict(snippet)},
+        related_files={3: "a.py", 4: "b.py"}
+    )
+
+    assert added == {'key_facts': 1, 'key_snippets': 1, 'related_files': 1, 'research_notes': 0}
+    assert [f['content'] for f in _global_memory['key_facts'].values()] == ["known fact", "new fact"]
+    assert sorted(_global_memory['key_facts']) == [1, 2]
+    assert list(_global_memory['key_snippets']) == [1]
+    assert _global_memory['related_files'] == {1: "a.py", 2: "b.py"}
+
+def test_get_memory_items():
+    """Test that memory entries are returned individually with their priorities."""
+    emit_key_facts.invoke({"facts": ["first fact"], "priority": MemoryPriority.LOW})
+    emit_key_facts.invoke({"facts": ["second fact"], "priority": MemoryPriority.HIGH})
+    emit_research_notes.invoke({"notes": "a note"})
+
+    assert get_memory_items('key_facts') == [
+        ("## 🔑 Key Fact #1\n\nfirst fact", MemoryPriority.LOW),
+        ("## 🔑 Key Fact #2\n\nsecond fact", MemoryPriority.HIGH)
+    ]
+    assert get_memory_items('research_notes') == [("a note", MemoryPriority.MEDIUM)]
+    # Joined items match the combined memory value
+    assert get_memory_value('key_facts') == "\n\n".join(text for text, _ in get_memory_items('key_facts'))
+
+def test_memory_entries_since():
+    """Test that only entries recorded after a snapshot are returned."""
+    emit_key_facts.invoke({"facts": ["old fact"]})
+    emit_research_notes.invoke({"notes": "old note"})
+    snapshot = copy.deepcopy(dict(_global_memory))
+
+    emit_key_facts.invoke({"facts": ["new fact"]})
+    emit_related_files.invoke({"files": ["a.py"]})
+    emit_research_notes.invoke({"notes": "new note"})
+
+    entries = memory_entries_since(snapshot)
+    assert [f['content'] for f in entries['key_facts'].values()] == ["new fact"]
+    assert list(entries['related_files'].values()) == ["a.py"]
+    assert entries['key_snippets'] == {}
+    assert [n['content'] for n in entries['research_notes']] == ["new note"]
+
+def test_eviction_hook_receives_evicted_items(monkeypatch):
+    """Test that items evicted by memory limits are reported to hooks and notes keep their order."""
+    monkeypatch.setitem(MEMORY_LIMITS, 'research_notes', 2)
+    monkeypatch.setitem(MEMORY_LIMITS, 'key_facts', 1)
+    evicted = []
+    hook = lambda memory_type, items: evicted.append((memory_type, [(item_id, item['content']) for item_id, item in items]))
+    add_eviction_hook(hook)
+    try:
+        emit_research_notes.invoke({"notes": "first", "priority": MemoryPriority.HIGH})
+        emit_research_notes.invoke({"notes": "second", "priority": MemoryPriority.LOW})
+        emit_research_notes.invoke({"notes": "third", "priority": MemoryPriority.MEDIUM})
+        emit_key_facts.invoke({"facts": ["old fact"], "priority": MemoryPriority.HIGH})
+        emit_key_facts.invoke({"facts": ["minor fact"], "priority": MemoryPriority.LOW})
+    finally:
+        remove_eviction_hook(hook)
+
+    assert evicted == [('research_notes', [(None, "second")]), ('key_facts', [(2, "minor fact")])]
+    assert [note['content'] for note in _global_memory['research_notes']] == ["first", "third"]